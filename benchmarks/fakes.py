@@ -0,0 +1,380 @@
+import hashlib
+import itertools
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+# ── Synthetic fleet ──
+
+# Distinctive series name in each FLEET_QUERIES template -> metric name
+SERIES_METRICS = (
+    ("node_memory_MemAvailable_bytes", "memory_percent"),
+    ("node_cpu_seconds_total", "cpu_percent"),
+    ("node_filesystem_avail_bytes", "disk_percent"),
+    ("apache_workers", "apache_busy_workers_percent"),
+    ("apache_accesses_total", "apache_requests_per_sec"),
+    ("pg_stat_database_numbackends", "postgres_active_connections_percent"),
+    ("pg_stat_database_deadlocks", "postgres_deadlocks_per_min"),
+)
+
+# Metric -> (typical low, typical high) for a healthy exporter
+HEALTHY_RANGES = {
+    "memory_percent": (20, 70),
+    "cpu_percent": (5, 60),
+    "disk_percent": (30, 75),
+    "apache_busy_workers_percent": (5, 50),
+    "apache_requests_per_sec": (10, 300),
+    "postgres_active_connections_percent": (10, 60),
+    "postgres_deadlocks_per_min": (0, 0.5),
+}
+
+# Values of a "hot" minion: memory and CPU above the critical thresholds
+HOT_VALUES = {"memory_percent": 97.0, "cpu_percent": 96.0}
+
+_INSTANCE_MATCHER = re.compile(r'instance=~"((?:[^"\\]|\\.)*)"')
+
+
+def minion_name(i):
+    return f"bench-{i:05d}"
+
+
+def fleet_minions(count):
+    """Settings entries for `count` synthetic minions.
+
+    Every minion has a node exporter; every fourth one also runs Apache
+    and every fourth (offset by two) PostgreSQL.
+    """
+    minions = []
+    for i in range(count):
+        name = minion_name(i)
+        minion = {"id": name, "instance": f"{name}:9100"}
+        if i % 4 == 0:
+            minion["apache_instance"] = f"{name}:9117"
+        if i % 4 == 2:
+            minion["postgres_instance"] = f"{name}:9187"
+        minions.append(minion)
+    return minions
+
+
+def _unit(*parts):
+    """Deterministic pseudo-random number in [0, 1) for the given parts."""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+def parse_instances(query):
+    """Instances named by the first `instance=~"..."` matcher of a query.
+
+    Reverses prometheus_client._instance_matcher(): undo the doubled
+    backslashes of the PromQL string, split the alternation, unescape.
+    """
+    match = _INSTANCE_MATCHER.search(query)
+    if not match:
+        return []
+    regex = match.group(1).replace("\\\\", "\\")
+    return [re.sub(r"\\(.)", r"\1", part) for part in re.split(r"(?<!\\)\|", regex)]
+
+
+class SyntheticFleet:
+    """Deterministic metric values for a fleet of synthetic minions.
+
+    Each (metric, instance) gets a stable level inside its healthy range
+    plus a slow daily wave. Every 1/`hot_ratio`-th minion, starting with
+    the first, has memory and CPU pinned above the critical thresholds.
+    """
+
+    def __init__(self, hot_ratio=0.01):
+        self.stride = max(1, round(1 / hot_ratio)) if hot_ratio > 0 else 0
+
+    def is_hot(self, host):
+        index = host.rsplit("-", 1)[-1]
+        return bool(self.stride) and index.isdigit() and int(index) % self.stride == 0
+
+    def value(self, metric_name, instance, timestamp):
+        host = instance.rsplit(":", 1)[0]
+        if metric_name in HOT_VALUES and self.is_hot(host):
+            return HOT_VALUES[metric_name]
+        low, high = HEALTHY_RANGES[metric_name]
+        level = low + (high - low) * _unit(metric_name, instance)
+        wave = math.sin(2 * math.pi * (timestamp / 86400 + _unit("phase", instance)))
+        return max(0.0, level + 0.05 * (high - low) * wave)
+
+
+# ── HTTP stand-ins ──
+
+class FakeServer:
+    """Threaded HTTP server that counts requests per endpoint.
+
+    Args:
+        latency: seconds to sleep before answering each request
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def reset(self):
+        with self._lock:
+            self.calls = Counter()
+
+    def handle(self, method, path, query, body):
+        """Return (status, JSON-serialisable body, extra headers)."""
+        raise NotImplementedError
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self, method):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if server.latency:
+                    time.sleep(server.latency)
+                status, payload, headers = server.handle(
+                    method, url.path, parse_qs(url.query), body
+                )
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, host="127.0.0.1", port=0):
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FakePrometheus(FakeServer):
+    """/api/v1/query and /api/v1/query_range over a SyntheticFleet.
+
+    Only the fleet queries of prometheus_client.FLEET_QUERIES are
+    understood; any other query returns an empty vector. Also accepts
+    AlertManager's POST /api/v2/alerts, so one server covers both.
+    """
+
+    def __init__(self, fleet, latency=0.0):
+        super().__init__(latency)
+        self.fleet = fleet
+        self.alerts_received = 0
+
+    @staticmethod
+    def _metric_for(query):
+        return next((metric for series, metric in SERIES_METRICS if series in query), None)
+
+    def handle(self, method, path, query, body):
+        if path == "/api/v2/alerts" and method == "POST":
+            self.count("alertmanager")
+            with self._lock:
+                self.alerts_received += len(json.loads(body or b"[]"))
+            return 200, {}, {}
+        if path not in ("/api/v1/query", "/api/v1/query_range"):
+            return 404, {"status": "error", "error": "not found"}, {}
+
+        kind = "query" if path.endswith("query") else "query_range"
+        self.count(kind)
+        promql = (query.get("query") or [""])[0]
+        metric_name = self._metric_for(promql)
+        instances = parse_instances(promql) if metric_name else []
+        if kind == "query":
+            now = time.time()
+            result = [
+                {
+                    "metric": {"instance": instance},
+                    "value": [now, str(self.fleet.value(metric_name, instance, now))],
+                }
+                for instance in instances
+            ]
+            return 200, {"status": "success", "data": {"resultType": "vector", "result": result}}, {}
+
+        start = _timestamp(query["start"][0])
+        end = _timestamp(query["end"][0])
+        step = float(query["step"][0].rstrip("s"))
+        points = [start + n * step for n in range(int((end - start) // step) + 1)]
+        result = [
+            {
+                "metric": {"instance": instance},
+                "values": [[t, str(self.fleet.value(metric_name, instance, t))] for t in points],
+            }
+            for instance in instances
+        ]
+        return 200, {"status": "success", "data": {"resultType": "matrix", "result": result}}, {}
+
+
+def _timestamp(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+PS_OUTPUT = (
+    "USER PID %CPU %MEM VSZ RSS TTY STAT START TIME COMMAND\n"
+    "postgres 2101 88.2 41.0 4194304 3355443 ? Rs 09:12 120:01 postgres: autovacuum worker\n"
+    "wwwrun 1733 6.1 9.4 812344 770120 ? S 09:10 10:42 /usr/sbin/httpd-prefork\n"
+    "root 1 0.0 0.1 171232 12044 ? Ss 09:00 0:03 /usr/lib/systemd/systemd\n"
+)
+LOG_OUTPUT = "\n".join(
+    f"Oct 18 09:{m:02d}:00 host postgres[2101]: LOG: checkpoint complete" for m in range(20)
+)
+
+
+class FakeSaltAPI(FakeServer):
+    """rest_cherrypy-compatible /login, POST / and GET /jobs/<jid>.
+
+    `local` lowstates answer straight away, `local_async` ones return a
+    jid whose results are served from /jobs. /events answers 404 so the
+    client falls back to polling.
+    """
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self._jids = itertools.count(1)
+        self._jobs = {}
+
+    @staticmethod
+    def output(fun, arg):
+        if fun == "cmd.run":
+            cmd = (arg or [""])[0]
+            if cmd.startswith("ps "):
+                return PS_OUTPUT
+            if "journalctl" in cmd or "log" in cmd:
+                return LOG_OUTPUT
+            return "ok"
+        if fun == "disk.usage":
+            return {"/": {"capacity": "71%", "used": "35651584", "available": "14680064"}}
+        return True
+
+    def _run(self, lowstate):
+        tgt = lowstate.get("tgt")
+        targets = tgt if isinstance(tgt, list) else [tgt]
+        return {minion: self.output(lowstate.get("fun"), lowstate.get("arg")) for minion in targets}
+
+    def handle(self, method, path, query, body):
+        if path == "/login":
+            self.count("login")
+            token = hashlib.sha1(str(time.time()).encode()).hexdigest()
+            return 200, {"return": [{"token": token}]}, {"Set-Cookie": f"session_id={token}"}
+        if path == "/" and method == "POST":
+            self.count("run")
+            returns = []
+            for lowstate in json.loads(body or b"[]"):
+                if lowstate.get("client") == "local_async":
+                    jid = f"2026{next(self._jids):016d}"
+                    with self._lock:
+                        self._jobs[jid] = self._run(lowstate)
+                    returns.append({"jid": jid, "minions": list(self._jobs[jid])})
+                else:
+                    returns.append(self._run(lowstate))
+            return 200, {"return": returns}, {}
+        if path.startswith("/jobs/"):
+            self.count("jobs")
+            with self._lock:
+                returned = self._jobs.pop(path[len("/jobs/"):], {})
+            return 200, {"return": [returned]}, {}
+        return 404, {"return": []}, {}
+
+
+# ── Scripted LLM ──
+
+_CALL = re.compile(r'^CALL (\w+) with minion_id="([^"]+)"', re.MULTILINE)
+
+ANSWER = (
+    "**Root Cause:** autovacuum worker (PID 2101) is using 88% CPU and 41% memory.\n\n"
+    "**Key Evidence:**\n"
+    "- get_top_cpu_processes: postgres autovacuum at 88.2% CPU\n"
+    "- get_top_memory_processes: the same process holds 3.2 GiB RSS\n\n"
+    "**Remediation:**\n"
+    "1. Check pg_stat_progress_vacuum for the table being vacuumed\n"
+    "2. Lower autovacuum_work_mem if memory pressure persists\n\n"
+    "**Urgency:** Medium"
+)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic chat model for the ReAct loop.
+
+    For its first `tool_turns` turns it calls the first mandatory tool
+    named in the scenario prompt; then it answers with a fixed analysis
+    in the system prompt's format. Token usage is estimated from the
+    message sizes (4 characters per token).
+    """
+
+    tool_turns: int = 1
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(m.content) for m in messages if m.type == "human")
+        turns = sum(1 for m in messages if isinstance(m, ToolMessage))
+        call = _CALL.search(prompt)
+        if call and turns < self.tool_turns:
+            message = AIMessage(
+                content="",
+                tool_calls=[{
+                    "name": call.group(1),
+                    "args": {"minion_id": call.group(2)},
+                    "id": f"call_{turns}",
+                }],
+            )
+        else:
+            message = AIMessage(content=ANSWER)
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(ANSWER) // 4 if message.content else 20
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
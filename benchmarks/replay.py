@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import yaml
+
+from uyuni_ai_agent import fixtures
+from uyuni_ai_agent.config import config_manager
+from uyuni_ai_agent.logging_config import setup_logging
+from uyuni_ai_agent.react_agent import agent_runtime, investigate, investigate_incident
+from uyuni_ai_agent.salt_api import salt_client
+
+INVESTIGATORS = {f.__name__: f for f in (investigate, investigate_incident)}
+
+METRICS = ("llm_turns", "prompt_tokens", "output_tokens", "salt_calls", "prometheus_calls", "seconds")
+
+
+def _output_tokens(store, digest):
+    if digest is None:
+        return 0
+    usage = store.load_json(digest).get("data", {}).get("usage_metadata") or {}
+    return usage.get("output_tokens", 0)
+
+
+def summarize(store, exchanges, seconds):
+    """Per-investigation numbers from index entries or replay log records.
+
+    Prompt tokens are estimated from the request size (4 characters per
+    token) on both sides, so recorded and replayed runs compare like for
+    like; output tokens are what the provider reported when recording.
+    """
+    stats = dict.fromkeys(METRICS, 0)
+    for exchange in exchanges:
+        if exchange["kind"] == "llm":
+            stats["llm_turns"] += 1
+            stats["prompt_tokens"] += exchange.get("request_chars", 0) // 4
+            stats["output_tokens"] += _output_tokens(store, exchange.get("object"))
+        elif exchange["kind"] == "salt":
+            stats["salt_calls"] += 1
+        elif exchange["kind"] == "prometheus":
+            stats["prometheus_calls"] += 1
+    stats["seconds"] = round(seconds, 3)
+    return stats
+
+
+def replay(store):
+    """Re-run every recorded investigation against the store, in order.
+
+    Returns one dict per investigation with its recorded and replayed
+    numbers, the replay's misses and any error it raised.
+    """
+    results = []
+    investigations = [e for e in store.entries if e["kind"] == "investigation"]
+    for entry in investigations:
+        args = pickle.loads(store.get(entry["object"]))
+        investigator = INVESTIGATORS[entry["investigator"]]
+        # Every investigation starts cold, as it would have in production
+        salt_client.cache.clear()
+        logged = len(store.log)
+        error = None
+        started = time.perf_counter()
+        with store.investigation(entry["investigator"], args, recorded_id=entry["id"]):
+            try:
+                investigator(*args)
+            except Exception as e:
+                error = str(e)
+        elapsed = time.perf_counter() - started
+        served = store.log[logged:]
+        recorded = [e for e in store.entries if e.get("investigation") == entry["id"]
+                    and e["kind"] != "investigation"]
+        results.append({
+            "id": entry["id"],
+            "investigator": entry["investigator"],
+            "recorded": summarize(store, recorded, entry["elapsed"]),
+            "replayed": summarize(store, [e for e in served if e["served"]], elapsed),
+            "misses": sum(1 for e in served if not e["matched"]),
+            "error": error,
+        })
+    return results
+
+
+def replay_settings(path, workdir):
+    """Copy the settings at `path` into `workdir` with the analysis cache off.
+
+    A cache hit would skip the LLM (and report no turns or tokens), and
+    replayed analyses must not end up in the live cache.
+    """
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    config["analysis_cache"] = dict(config.get("analysis_cache") or {}, enabled=False)
+    settings_path = os.path.join(workdir, "settings.yaml")
+    with open(settings_path, "w") as f:
+        yaml.safe_dump(config, f)
+    return settings_path
+
+
+def format_table(results):
+    header = ["id", "investigator"] + [f"{m} rec/replay" for m in METRICS] + ["misses"]
+    rows = [header]
+    totals = {side: dict.fromkeys(METRICS, 0) for side in ("recorded", "replayed")}
+    for r in results:
+        row = [str(r["id"]), r["investigator"]]
+        for metric in METRICS:
+            row.append(f"{r['recorded'][metric]:g}/{r['replayed'][metric]:g}")
+            for side in totals:
+                totals[side][metric] += r[side][metric]
+        row.append(str(r["misses"]) + (" (error)" if r["error"] else ""))
+        rows.append(row)
+    rows.append(["total", ""] + [
+        f"{totals['recorded'][m]:g}/{totals['replayed'][m]:g}" for m in METRICS
+    ] + [str(sum(r["misses"] for r in results))])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay investigations recorded with `main --record DIR` and compare "
+                    "LLM turns, tokens, Salt calls and wall-clock with the recording."
+    )
+    parser.add_argument("fixtures", help="directory written by --record")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply recorded latencies (0 = replay without waiting)")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args(argv)
+
+    setup_logging(level="ERROR")
+    with tempfile.TemporaryDirectory(prefix="uyuni-replay-") as workdir:
+        config_manager.path = replay_settings(config_manager.path, workdir)
+        config_manager.refresh()
+        store = fixtures.open_store(args.fixtures, replay=True, scale=args.scale)
+        agent_runtime.llm_factory = fixtures.FixtureChatModel.factory(store)
+        agent_runtime.reset()
+        try:
+            results = replay(store)
+        finally:
+            fixtures.close_store()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
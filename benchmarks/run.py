@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+from benchmarks.fakes import FakePrometheus, FakeSaltAPI, SyntheticFleet, fleet_minions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS_PATH = os.path.join(REPO_ROOT, "config", "settings.yaml")
+
+STAGES = ("tick", "ingest", "detect", "intelligence", "action")
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a list of samples; 0.0 when empty."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def bench_settings(args, minions, prometheus_url, salt_url, data_dir):
+    """settings.yaml for one run: the repo's thresholds, the fakes' URLs."""
+    with open(SETTINGS_PATH) as f:
+        config = yaml.safe_load(f) or {}
+    config["prometheus"] = {"url": prometheus_url}
+    config["alertmanager"] = dict(
+        config.get("alertmanager") or {},
+        url=prometheus_url,
+        flush_interval_seconds=0.5,
+        spill_path=os.path.join(data_dir, "alertmanager_spill.jsonl"),
+    )
+    config["salt_api"] = dict(
+        config.get("salt_api") or {},
+        url=salt_url,
+        password="bench",
+        use_events=False,
+        job_poll_interval_seconds=0.1,
+    )
+    config["minions"] = fleet_minions(minions)
+    config["logging"] = {"level": "ERROR"}
+    config["alerting"] = dict(config.get("alerting") or {}, for_seconds=0)
+    config["polling"] = dict(config.get("polling") or {}, interval_seconds=args.interval)
+    config["history"] = dict(
+        config.get("history") or {},
+        path=os.path.join(data_dir, "history.npy"),
+        retention_seconds=int(args.history_hours * 3600),
+    )
+    config["forecast"] = dict(
+        config.get("forecast") or {}, window_seconds=int(args.history_hours * 3600)
+    )
+    config["analysis_cache"] = dict(
+        config.get("analysis_cache") or {},
+        path=os.path.join(data_dir, "analysis_cache.sqlite"),
+    )
+    config["telemetry"] = {"enabled": False}
+    return config
+
+
+# ── Worker (one agent process per fleet size) ──
+
+def _record(histogram, samples, label):
+    """Keep every observation of a telemetry histogram, keyed by `label`."""
+    observe = histogram.observe
+
+    def recording(value, **labels):
+        samples.setdefault(labels.get(label, "tick"), []).append(value)
+        observe(value, **labels)
+
+    histogram.observe = recording
+
+
+def run_worker(settings_path, output_path, ticks):
+    """Run main.run() against the fakes and write its measurements as JSON."""
+    from uyuni_ai_agent.config import config_manager
+    from uyuni_ai_agent.logging_config import setup_logging
+
+    config_manager.path = settings_path
+    setup_logging(level="ERROR")
+
+    from benchmarks.fakes import ScriptedChatModel
+    from uyuni_ai_agent import main, telemetry
+    from uyuni_ai_agent.react_agent import agent_runtime
+
+    agent_runtime.llm_factory = lambda llm_cfg: ScriptedChatModel()
+    agent_runtime.reset()
+
+    samples = {}
+    _record(telemetry.stage_seconds, samples, "stage")
+    _record(telemetry.tick_seconds, samples, "stage")
+
+    started = time.perf_counter()
+    stats = main.run(max_ticks=ticks)
+    elapsed = time.perf_counter() - started
+
+    tick_times = samples.get("tick", [])
+    result = {
+        "ticks": stats.ticks,
+        "skipped": stats.skipped,
+        "elapsed": elapsed,
+        # Sustainable rate: back-to-back ticks, ignoring the interval wait
+        "ticks_per_sec": len(tick_times) / sum(tick_times) if tick_times else 0.0,
+        "stages": {
+            stage: {
+                "count": len(samples.get(stage, [])),
+                "p50": percentile(samples.get(stage, []), 50),
+                "p99": percentile(samples.get(stage, []), 99),
+            }
+            for stage in STAGES
+        },
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    with open(output_path, "w") as f:
+        json.dump(result, f)
+
+
+# ── Driver ──
+
+def run_size(args, minions, prometheus, salt, workdir):
+    """Benchmark one fleet size in a fresh interpreter; returns its results."""
+    data_dir = os.path.join(workdir, str(minions))
+    os.makedirs(data_dir, exist_ok=True)
+    settings_path = os.path.join(data_dir, "settings.yaml")
+    output_path = os.path.join(data_dir, "result.json")
+    with open(settings_path, "w") as f:
+        yaml.safe_dump(bench_settings(args, minions, prometheus.url, salt.url, data_dir), f)
+
+    prometheus.reset()
+    salt.reset()
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--worker", settings_path, output_path,
+         "--ticks", str(args.ticks)],
+        cwd=REPO_ROOT, check=True,
+    )
+    with open(output_path) as f:
+        result = json.load(f)
+
+    ticks = max(1, result["ticks"])
+    calls = {f"prometheus.{k}": v for k, v in prometheus.calls.items()}
+    calls.update({f"salt.{k}": v for k, v in salt.calls.items()})
+    result["minions"] = minions
+    result["http_calls"] = calls
+    result["http_calls_per_tick"] = sum(calls.values()) / ticks
+    return result
+
+
+def format_table(results):
+    header = ["minions", "ticks/s"]
+    header += [f"{stage} p50/p99 ms" for stage in STAGES]
+    header += ["HTTP/tick", "peak RSS MiB"]
+    rows = [header]
+    for r in results:
+        row = [str(r["minions"]), f"{r['ticks_per_sec']:.2f}"]
+        for stage in STAGES:
+            s = r["stages"][stage]
+            row.append(f"{s['p50'] * 1000:.1f}/{s['p99'] * 1000:.1f}" if s["count"] else "-")
+        row += [f"{r['http_calls_per_tick']:.1f}", f"{r['peak_rss_mib']:.0f}"]
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the agent end to end against local Prometheus, Salt API "
+                    "and LLM stand-ins and report its throughput and latency."
+    )
+    parser.add_argument("--minions", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="fleet sizes to benchmark")
+    parser.add_argument("--ticks", type=int, default=5, help="ticks per fleet size")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="polling.interval_seconds for the run")
+    parser.add_argument("--hot-ratio", type=float, default=0.01,
+                        help="fraction of minions with memory and CPU above critical")
+    parser.add_argument("--salt-latency", type=float, default=0.05,
+                        help="seconds the fake Salt API waits before each response")
+    parser.add_argument("--prometheus-latency", type=float, default=0.0,
+                        help="seconds the fake Prometheus waits before each response")
+    parser.add_argument("--history-hours", type=float, default=6,
+                        help="history.retention_seconds (in hours) to backfill")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    parser.add_argument("--worker", nargs=2, metavar=("SETTINGS", "OUTPUT"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.ticks)
+        return 0
+
+    prometheus = FakePrometheus(SyntheticFleet(args.hot_ratio), args.prometheus_latency).start()
+    salt = FakeSaltAPI(args.salt_latency).start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="uyuni-bench-") as workdir:
+            for minions in args.minions:
+                results.append(run_size(args, minions, prometheus, salt, workdir))
+                if not args.json:
+                    print(f"{minions} minions: done", file=sys.stderr)
+    finally:
+        prometheus.stop()
+        salt.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+from uyuni_ai_agent.alert_lifecycle import AlertTracker
+from uyuni_ai_agent.anomaly_detector import AlertSeverity, Anomaly
+from uyuni_ai_agent.config import AlertingSettings
+from uyuni_ai_agent.metrics_snapshot import MinionMetrics
+
+CFG = AlertingSettings()
+
+
+def _disk(minion_id):
+    return Anomaly(minion_id, "disk", 96.0, 95.0, AlertSeverity.CRITICAL, f"disk on {minion_id}")
+
+
+def test_alert_of_removed_minion_resolves():
+    tracker = AlertTracker()
+    anomaly = _disk("a")
+    tracker.update([anomaly], {}, CFG, now=0.0, minion_ids={"a"})
+    tracker.mark_notified(anomaly, now=0.0)
+
+    # No data is a gap while the minion is configured...
+    result = tracker.update([], {}, CFG, now=60.0, minion_ids={"a"})
+    assert result.resolved == []
+    # ...and resolves the alert once it is removed from the config
+    result = tracker.update([], {}, CFG, now=120.0, minion_ids=set())
+    assert [s.anomaly.minion_id for s in result.resolved] == ["a"]
+    assert tracker.states == {}
+
+
+def test_alert_not_queued_is_selected_again():
+    tracker = AlertTracker()
+    result = tracker.update([_disk("a")], {}, CFG, now=0.0)
+    assert len(result.investigate) == 1
+
+    # Never marked notified (the queue dropped it): investigated next tick
+    result = tracker.update([_disk("a")], {}, CFG, now=60.0)
+    assert len(result.investigate) == 1
+    tracker.mark_notified(result.investigate[0], now=60.0)
+    result = tracker.update([_disk("a")], {}, CFG, now=120.0)
+    assert result.investigate == [] and result.suppressed == 1
+
+
+def test_pending_alert_restarts_when_it_clears():
+    tracker = AlertTracker()
+    cfg = AlertingSettings(for_seconds=120)
+    # Just below the threshold, but within the hysteresis band
+    dipped = {"a": MinionMetrics("a", "a:9100", disk_percent=94.0)}
+
+    tracker.update([_disk("a")], {}, cfg, now=0.0)
+    tracker.update([], dipped, cfg, now=60.0)
+    assert tracker.states == {}
+    # A spike after the dip is a new pending alert, not a firing one
+    result = tracker.update([_disk("a")], {}, cfg, now=150.0)
+    assert result.investigate == [] and result.pending == 1
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import requests
+
+from uyuni_ai_agent import alert_manager
+from uyuni_ai_agent.alert_manager import AlertSender
+from uyuni_ai_agent.config import AlertmanagerSettings
+
+
+class FlakySession:
+    """Accepts the first `ok` POSTs, then refuses connections.
+
+    Records what the spill file held while each POST was in flight.
+    """
+
+    def __init__(self, ok, spill_path):
+        self.ok = ok
+        self.spill_path = spill_path
+        self.posted = []
+        self.on_disk = []
+
+    def post(self, url, json, timeout):
+        self.on_disk.append(AlertSender._read_spill(self.spill_path))
+        if len(self.posted) >= self.ok:
+            raise requests.ConnectionError("refused")
+        self.posted.append(json)
+        return SimpleNamespace(status_code=200, text="")
+
+
+def _sender(monkeypatch, tmp_path, ok):
+    cfg = AlertmanagerSettings(
+        url="http://am", batch_size=2, max_retries=0, spill_path=str(tmp_path / "spill.jsonl"),
+    )
+    monkeypatch.setattr(alert_manager, "get_settings", lambda: SimpleNamespace(alertmanager=cfg))
+    sender = AlertSender()
+    sender.session = FlakySession(ok, cfg.spill_path)
+    return sender, cfg
+
+
+def _alert(n):
+    return {"labels": {"alertname": f"a{n}"}}
+
+
+def test_spilled_alerts_stay_on_disk_until_delivered(monkeypatch, tmp_path):
+    sender, cfg = _sender(monkeypatch, tmp_path, ok=0)
+    for n in range(3):
+        sender.enqueue(_alert(n))
+    sender.flush()
+    assert sender._read_spill(cfg.spill_path) == [_alert(0), _alert(1), _alert(2)]
+
+    # The first replayed batch is delivered, then the connection fails again
+    sender.session = FlakySession(1, cfg.spill_path)
+    sender.enqueue(_alert(3))
+    sender.flush()
+    assert sender.session.posted == [[_alert(0), _alert(1)]]
+    # Still on disk while being sent, so a crash mid-replay loses nothing
+    assert sender.session.on_disk[0] == [_alert(0), _alert(1), _alert(2)]
+    assert sender._read_spill(cfg.spill_path) == [_alert(2), _alert(3)]
+
+    sender.session = FlakySession(10, cfg.spill_path)
+    sender.flush()
+    assert sender.session.posted == [[_alert(2), _alert(3)]]
+    assert sender._read_spill(cfg.spill_path) == []
+
+
+class RejectingSession:
+    def post(self, url, json, timeout):
+        return SimpleNamespace(status_code=400, text="bad alert")
+
+
+def test_rejected_alerts_are_dropped_not_sent(monkeypatch, tmp_path):
+    sender, cfg = _sender(monkeypatch, tmp_path, ok=0)
+    sender.session = RejectingSession()
+    for n in range(3):
+        sender.enqueue(_alert(n))
+
+    assert sender.flush().startswith("Error: AlertManager rejected 3")
+    assert sender.sent == 0 and sender.dropped == 3
+    # Retrying a rejected payload won't help: it is not spilled either
+    assert sender._read_spill(cfg.spill_path) == []
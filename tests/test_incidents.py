@@ -0,0 +1,60 @@
+from uyuni_ai_agent.anomaly_detector import AlertSeverity, Anomaly
+from uyuni_ai_agent.config import CorrelationSettings
+from uyuni_ai_agent.incidents import FLEET, Correlator
+from uyuni_ai_agent.investigation_queue import InvestigationQueue
+
+CFG = CorrelationSettings(window_seconds=300, fleet_min_minions=3)
+
+
+def _disk(minion_id):
+    return Anomaly(minion_id, "disk", 96.0, 95.0, AlertSeverity.CRITICAL, f"disk on {minion_id}")
+
+
+def _memory(minion_id):
+    return Anomaly(minion_id, "memory", 97.0, 95.0, AlertSeverity.CRITICAL, f"memory on {minion_id}")
+
+
+def test_symptom_on_separate_ticks_forms_fleet_incident():
+    correlator = Correlator()
+    incidents = []
+    for tick, minion_id in enumerate(["a", "b", "c", "d"]):
+        incidents, _ = correlator.correlate([_disk(minion_id)], {}, CFG, now=60.0 * tick)
+
+    assert [i.key for i in incidents] == [(FLEET, "disk")]
+    assert sorted(incidents[0].minion_ids) == ["a", "b", "c", "d"]
+    # The per-minion incidents were folded into the fleet one
+    assert list(correlator.incidents) == [(FLEET, "disk")]
+
+
+def test_symptom_below_fleet_size_stays_per_minion():
+    correlator = Correlator()
+    correlator.correlate([_disk("a")], {}, CFG, now=0.0)
+    incidents, shrunk = correlator.correlate([_disk("b")], {}, CFG, now=60.0)
+
+    assert [i.key for i in incidents] == [("b", "incident")]
+    assert shrunk == {}
+    assert sorted(correlator.incidents) == [("a", "incident"), ("b", "incident")]
+
+
+def test_pending_per_minion_jobs_follow_members_into_fleet_incident():
+    correlator = Correlator()
+    queue = InvestigationQueue(handler=None, max_size=10)
+    incidents, _ = correlator.correlate(
+        [_disk("a"), _memory("a"), _disk("b")], {}, CFG, now=0.0
+    )
+    for incident in incidents:
+        queue.submit(incident, incident.metrics)
+
+    # The symptom spreads on the next tick, before the workers got to it
+    incidents, shrunk = correlator.correlate([_disk("c")], {}, CFG, now=60.0)
+    for key, incident in shrunk.items():
+        queue.revise(key, incident, incident.metrics if incident else None)
+    for incident in incidents:
+        queue.submit(incident, incident.metrics)
+
+    assert [i.key for i in incidents] == [(FLEET, "disk")]
+    assert sorted(shrunk) == [("a", "incident"), ("b", "incident")]
+    pending = {key: job.anomaly for key, job in queue._pending.items()}
+    # b's job is withdrawn; a's is left with the anomaly not in the fleet
+    assert sorted(pending) == [("a", "incident"), (FLEET, "disk")]
+    assert [x.metric_name for x in pending[("a", "incident")].anomalies] == ["memory"]
@@ -0,0 +1,207 @@
+import contextvars
+import logging
+import threading
+import time
+
+from langgraph.errors import GraphRecursionError
+
+from uyuni_ai_agent.config import get_settings
+from uyuni_ai_agent.tools.compaction import estimate_tokens, truncate_to_budget
+
+logger = logging.getLogger(__name__)
+
+# Tokens an older tool output is cut down to once the history is compacted
+SUMMARY_TOKENS = 60
+# Tool outputs quoted in a partial analysis
+PARTIAL_EVIDENCE = 4
+
+
+class PartialAnalysis(str):
+    """A best-effort analysis from an investigation stopped by its budget."""
+
+    def __new__(cls, text, reason):
+        analysis = super().__new__(cls, text)
+        analysis.reason = reason
+        return analysis
+
+
+def message_text(message):
+    """A message's text. Some LLMs (Gemini) return content as a list of blocks."""
+    content = message.content
+    if isinstance(content, list):
+        text_parts = []
+        for block in content:
+            if isinstance(block, dict) and "text" in block:
+                text_parts.append(block["text"])
+            elif isinstance(block, str):
+                text_parts.append(block)
+        return "\n".join(text_parts)
+    return content
+
+
+# ── History compaction ──
+
+def compact_history(messages, token_limit, keep_recent):
+    """Shrink older tool outputs once the conversation passes `token_limit`.
+
+    Tool messages are summarized oldest first, each to its head and tail
+    within SUMMARY_TOKENS, until the estimate fits; the `keep_recent`
+    newest tool outputs are always left intact. Returns a new list; the
+    agent's stored history is not modified.
+    """
+    total = sum(estimate_tokens(str(m.content)) for m in messages)
+    if total <= token_limit:
+        return messages
+    tool_indexes = [i for i, m in enumerate(messages) if m.type == "tool"]
+    older = tool_indexes[:-keep_recent] if keep_recent else tool_indexes
+    compacted = list(messages)
+    for i in older:
+        message = messages[i]
+        content = str(message.content)
+        summary = (
+            f"[earlier {message.name or 'tool'} output, compacted]\n"
+            + truncate_to_budget(content, SUMMARY_TOKENS)
+        )
+        if len(summary) >= len(content):
+            continue
+        compacted[i] = message.model_copy(update={"content": summary})
+        total -= estimate_tokens(content) - estimate_tokens(summary)
+        if total <= token_limit:
+            break
+    return compacted
+
+
+def compaction_hook(state):
+    """pre_model_hook for create_react_agent: compact what the model sees."""
+    cfg = get_settings().investigation
+    return {
+        "llm_input_messages": compact_history(
+            state["messages"], cfg.history_token_limit, cfg.keep_tool_messages
+        )
+    }
+
+
+# ── Budgets ──
+
+def _usage(messages):
+    """Return (LLM turns, tool calls, tokens) used so far."""
+    turns = calls = tokens = 0
+    for message in messages:
+        if message.type != "ai":
+            continue
+        turns += 1
+        calls += len(getattr(message, "tool_calls", None) or [])
+        usage = getattr(message, "usage_metadata", None) or {}
+        tokens += usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    return turns, calls, tokens
+
+
+def exhausted(messages, cfg):
+    """Which budget stops the agent before its next step, or None.
+
+    Checked after every graph step: once the model has answered without
+    tool calls the run is complete; otherwise the next model call (or
+    the tool calls it just asked for) must fit the turn, token and tool
+    call budgets.
+    """
+    last = messages[-1] if messages else None
+    if last is not None and last.type == "ai" and not getattr(last, "tool_calls", None):
+        return None
+    turns, calls, tokens = _usage(messages)
+    if turns >= cfg.max_turns:
+        return f"{turns} LLM turns"
+    if tokens >= cfg.max_tokens:
+        return f"{tokens} tokens"
+    if calls > cfg.max_tool_calls:
+        return f"{calls} tool calls"
+    return None
+
+
+def run_bounded(agent, inputs, cfg, max_concurrency=None):
+    """Run the agent within the investigation budgets.
+
+    The graph is streamed on a helper thread so the caller gets control
+    back at the deadline even while an LLM or Salt call is outstanding;
+    the helper stops at its next step. The recursion limit is a backstop
+    for the turn budget.
+
+    Args:
+        agent: compiled ReAct graph
+        inputs: the graph input ({"messages": [...]})
+        cfg: InvestigationSettings
+        max_concurrency: tool calls of one turn run at once (None = the
+            executor's default)
+
+    Returns:
+        (messages, reason): the conversation so far, and the budget that
+        stopped it or None if the agent finished.
+    """
+    outcome = {"messages": [], "reason": None, "error": None}
+    stop = threading.Event()
+    done = threading.Event()
+
+    def work():
+        try:
+            for state in agent.stream(
+                inputs,
+                config={
+                    "recursion_limit": 3 * cfg.max_turns + 2,
+                    "max_concurrency": max_concurrency,
+                },
+                stream_mode="values",
+            ):
+                outcome["messages"] = state["messages"]
+                outcome["reason"] = exhausted(state["messages"], cfg)
+                if outcome["reason"] or stop.is_set():
+                    break
+        except GraphRecursionError:
+            outcome["reason"] = "the recursion limit"
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    started = time.monotonic()
+    # Copy the context so per-investigation state (fixtures) follows the run
+    context = contextvars.copy_context()
+    threading.Thread(
+        target=context.run, args=(work,), name="investigation-run", daemon=True
+    ).start()
+    if not done.wait(cfg.deadline_seconds):
+        stop.set()
+        return list(outcome["messages"]), f"the {cfg.deadline_seconds:g}s deadline"
+    if outcome["error"] is not None:
+        raise outcome["error"]
+    logger.debug("agent run took %.1fs", time.monotonic() - started)
+    return outcome["messages"], outcome["reason"]
+
+
+def partial_analysis(messages, reason):
+    """Best-effort analysis in the system prompt's format from a stopped run."""
+    evidence = []
+    for message in reversed(messages):
+        if message.type == "tool" and len(evidence) < PARTIAL_EVIDENCE:
+            lines = [line.strip() for line in str(message.content).splitlines() if line.strip()]
+            first = lines[0][:160] if lines else "(no output)"
+            evidence.insert(0, f"- {message.name or 'tool'}: {first}")
+    reasoning = next(
+        (message_text(m).strip() for m in reversed(messages)
+         if m.type == "ai" and message_text(m).strip()),
+        "",
+    )
+    parts = [
+        f"**Root Cause:** Not determined: the investigation stopped after {reason}.",
+        "",
+        "**Key Evidence:**",
+    ]
+    parts += evidence or ["- Only the prefetched evidence was gathered."]
+    if reasoning:
+        parts += ["", f"Last reasoning: {reasoning[:600]}"]
+    parts += [
+        "",
+        "**Remediation:**",
+        "1. Review the evidence above and continue the investigation manually",
+        "",
+        "**Urgency:** Unknown (investigation incomplete)",
+    ]
+    return PartialAnalysis("\n".join(parts), reason)
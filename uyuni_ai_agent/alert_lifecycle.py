@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field, replace
+from typing import List, Optional
+
+from uyuni_ai_agent.anomaly_detector import RULES, Anomaly, AlertSeverity
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_ORDER = {
+    AlertSeverity.INFO: 0,
+    AlertSeverity.WARNING: 1,
+    AlertSeverity.CRITICAL: 2,
+}
+
+# Anomaly metric name -> MinionMetrics field, for hysteresis checks on
+# alerts that no longer cross their threshold.
+METRIC_FIELDS = {metric_name: field_name for field_name, _, metric_name, _, _ in RULES}
+
+PENDING = "pending"
+FIRING = "firing"
+
+
+def fingerprint(minion_id, metric_name, severity):
+    """Stable identity of an alert: (minion, metric, severity)."""
+    raw = f"{minion_id}|{metric_name}|{severity.value}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+@dataclass
+class AlertState:
+    """Lifecycle state of one (minion, metric) alert."""
+    anomaly: Anomaly
+    status: str
+    first_seen: float
+    last_seen: float
+    last_notified: Optional[float] = None
+    last_notified_value: Optional[float] = None
+
+    @property
+    def fingerprint(self):
+        a = self.anomaly
+        return fingerprint(a.minion_id, a.metric_name, a.severity)
+
+
+@dataclass
+class LifecycleResult:
+    """What the tracker decided for one tick."""
+    investigate: List[Anomaly] = field(default_factory=list)
+    resolved: List[AlertState] = field(default_factory=list)
+    pending: int = 0
+    suppressed: int = 0
+
+
+class AlertTracker:
+    """Alert lifecycle between detection and investigation.
+
+    Mirrors Prometheus alerting semantics: a new anomaly stays pending
+    until it has held for `for_seconds`, then fires and is investigated;
+    one that clears while pending starts over.
+    A firing alert is re-investigated only when it escalates, when its
+    value moves by more than `significant_change_ratio` since the last
+    notification, or after `renotify_seconds`. It resolves once the value
+    drops below its threshold by more than `hysteresis_ratio`, so values
+    hovering around a threshold don't flap.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.states = {}  # (minion_id, metric_name) -> AlertState
+
+    def update(self, anomalies, snapshot, settings, now=None, minion_ids=None):
+        """Advance the lifecycle with one tick's anomalies.
+
+        Anomalies selected for investigation are not marked notified here;
+        call mark_notified() once the investigation has actually been queued.
+
+        Args:
+            anomalies: Anomaly list from check_snapshot()
+            snapshot: the MetricsSnapshot they were detected on
+            settings: AlertingSettings
+            minion_ids: IDs of the configured minions; alerts of any other
+                minion (removed from the config) resolve. None = all kept.
+
+        Returns:
+            LifecycleResult with anomalies to investigate and alerts that
+            resolved on this tick.
+        """
+        now = self.clock() if now is None else now
+        result = LifecycleResult()
+        seen = set()
+
+        for anomaly in anomalies:
+            key = (anomaly.minion_id, anomaly.metric_name)
+            seen.add(key)
+            state = self.states.get(key)
+
+            if state is None:
+                state = AlertState(anomaly, PENDING, first_seen=now, last_seen=now)
+                self.states[key] = state
+            else:
+                old = state.anomaly
+                rank, old_rank = SEVERITY_ORDER[anomaly.severity], SEVERITY_ORDER[old.severity]
+                if rank < old_rank and anomaly.current_value >= old.threshold * (1 - settings.hysteresis_ratio):
+                    # Dipped just below the higher threshold: hold the severity
+                    anomaly = replace(anomaly, threshold=old.threshold, severity=old.severity)
+                elif rank != old_rank and state.status == FIRING:
+                    # Severity changed: the old fingerprint resolves and the
+                    # new one is notified straight away
+                    result.resolved.append(AlertState(
+                        old, FIRING, state.first_seen, now,
+                        state.last_notified, state.last_notified_value,
+                    ))
+                    state.last_notified = None
+                state.anomaly = anomaly
+                state.last_seen = now
+
+            if state.status == PENDING:
+                if now - state.first_seen < settings.for_seconds:
+                    result.pending += 1
+                    continue
+                state.status = FIRING
+
+            if self._should_notify(state, now, settings):
+                result.investigate.append(anomaly)
+            else:
+                result.suppressed += 1
+
+        for key, state in list(self.states.items()):
+            if key in seen:
+                continue
+            if state.status == PENDING:
+                # Like Prometheus, a pending alert must hold continuously
+                # for `for_seconds`: it restarts once its condition clears
+                del self.states[key]
+                continue
+            # A minion removed from the config resolves its alerts
+            if minion_ids is None or key[0] in minion_ids:
+                record = snapshot.get(key[0])
+                if record is None:
+                    # No data for the minion this tick; don't resolve on a gap
+                    continue
+                value = getattr(record, METRIC_FIELDS.get(key[1], ""), None)
+                threshold = state.anomaly.threshold
+                if value is not None and value >= threshold * (1 - settings.hysteresis_ratio):
+                    state.last_seen = now
+                    continue
+            del self.states[key]
+            if state.status == FIRING and state.last_notified is not None:
+                result.resolved.append(state)
+
+        if result.investigate or result.resolved:
+            logger.debug(
+                "lifecycle: %d to investigate, %d resolved, %d pending, %d suppressed",
+                len(result.investigate), len(result.resolved),
+                result.pending, result.suppressed,
+            )
+        return result
+
+    def mark_notified(self, anomaly, now=None):
+        """Record that an anomaly's investigation was queued.
+
+        Re-notify suppression counts from here, so an anomaly the queue
+        dropped is selected again on the next tick.
+        """
+        state = self.states.get((anomaly.minion_id, anomaly.metric_name))
+        if state is None:
+            return
+        state.last_notified = self.clock() if now is None else now
+        state.last_notified_value = anomaly.current_value
+
+    @staticmethod
+    def _should_notify(state, now, settings):
+        if state.last_notified is None:
+            return True
+        if now - state.last_notified >= settings.renotify_seconds:
+            return True
+        previous = state.last_notified_value
+        if not previous or settings.significant_change_ratio <= 0:
+            return False
+        change = abs(state.anomaly.current_value - previous)
+        return change >= abs(previous) * settings.significant_change_ratio
@@ -1,27 +1,52 @@
-import requests
 import datetime
+import json
+import logging
+import os
+import random
+import threading
+
+import requests
+
+from uyuni_ai_agent.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Retrying these can succeed; other 4xx responses mean a bad payload
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# "source" label of every alert the agent sends
+ALERT_SOURCE = "ai-bot"
+
+
+def _rfc3339(dt):
+    """Format a datetime as UTC RFC 3339. Naive datetimes are taken as local time."""
+    return dt.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
-from uyuni_ai_agent.config import load_config
 
 # Ref: https://prometheus.io/docs/alerting/latest/alerts_api/
-def send_to_alertmanager(summary, description, severity="info", minion_id="", metric_name=""):
-    """Send an enriched alert to AlertManager.
-    
+def build_alert(summary, description, severity="info", minion_id="", metric_name="",
+                starts_at=None, ends_at=None, cached_at=None, triage_rule=None):
+    """Build one alert object for the /api/v2/alerts payload.
+
     Args:
         summary: one-line summary of the issue
         description: full AI-generated root cause analysis
         severity: alert severity (info, warning, critical)
         minion_id: the affected minion
         metric_name: the metric that triggered the alert
+        starts_at: datetime the alert started; defaults to now
+        ends_at: datetime at which the alert resolved; marks the alert
+            with the same labels as resolved
+        cached_at: datetime the analysis was first written, when it was
+            reused from the analysis cache; added as an annotation
+        triage_rule: name of the triage rule that wrote the analysis, if
+            any; added as an annotation
     """
-    config = load_config()
-    URL = f"{config['alertmanager']['url']}/api/v2/alerts"
-
-    payload = [{
+    alert = {
         "labels": {
             "alertname": "AIAgentResponse",
             "severity": severity,
-            "source": "ai-bot",
+            "source": ALERT_SOURCE,
             "minion": minion_id,
             "metric": metric_name,
         },
@@ -29,14 +54,256 @@ def send_to_alertmanager(summary, description, severity="info", minion_id="", me
             "summary": summary,
             "description": description
         },
-        "startsAt": datetime.datetime.now().isoformat() + "Z"
-    }]
-
-    try:
-        response = requests.post(URL, json=payload)
-        if response.status_code == 200:
-            return "Success: Message routed through Alertmanager."
-        else:
-            return f"Error: {response.status_code} - {response.text}"
-    except Exception as e:
-        return f"Connection Failed: {str(e)}"
+        "startsAt": _rfc3339(starts_at or datetime.datetime.now(datetime.timezone.utc)),
+    }
+    if ends_at is not None:
+        alert["endsAt"] = _rfc3339(ends_at)
+    if cached_at is not None:
+        alert["annotations"]["analysis_cached_at"] = _rfc3339(cached_at)
+    if triage_rule is not None:
+        alert["annotations"]["triage_rule"] = triage_rule
+    return alert
+
+
+class AlertSender:
+    """Buffers alerts and delivers them to AlertManager in batched POSTs.
+
+    Alerts are queued with enqueue() and sent by a background thread every
+    `alertmanager.flush_interval_seconds` (or as soon as a full batch is
+    waiting) over one keep-alive session. A failed batch is retried with
+    jittered exponential backoff; if AlertManager stays unreachable the
+    batch is appended to an on-disk spill file and replayed ahead of new
+    alerts on the next successful flush.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sent = 0
+        self.spilled = 0
+        self.dropped = 0
+
+    # ── Buffering ──
+
+    def enqueue(self, alert):
+        """Queue one alert for the next flush."""
+        with self._lock:
+            self._buffer.append(alert)
+            full = len(self._buffer) >= get_settings().alertmanager.batch_size
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush_soon(self):
+        """Wake the background flusher without waiting for its interval."""
+        self._wake.set()
+
+    # ── Delivery ──
+
+    def _post(self, url, batch, cfg):
+        """POST one batch with bounded, jittered retries.
+
+        Returns (delivered, error): (True, None) once AlertManager accepted
+        the batch, (False, None) if it rejected it for good (the alerts are
+        dropped) and (False, error) if it stayed unreachable.
+        """
+        error = None
+        for attempt in range(cfg.max_retries + 1):
+            if attempt:
+                # Full jitter: spreads retries from many agents after an outage
+                delay = random.uniform(0, cfg.retry_backoff_seconds * 2 ** (attempt - 1))
+                if self._stop.wait(delay):
+                    break
+            try:
+                response = self.session.post(url, json=batch, timeout=cfg.timeout_seconds)
+            except requests.RequestException as e:
+                error = f"Connection Failed: {str(e)}"
+                continue
+            if response.status_code == 200:
+                return True, None
+            error = f"Error: {response.status_code} - {response.text}"
+            if response.status_code not in RETRYABLE_STATUS:
+                # AlertManager rejected the payload; retrying or spilling won't help
+                logger.error("AlertManager rejected %d alerts: %s", len(batch), error)
+                self.dropped += len(batch)
+                return False, None
+        return False, error
+
+    def send(self, alerts, replayed=0):
+        """Send alerts now, in batches. Undelivered alerts are spilled to disk.
+
+        Args:
+            alerts: alerts to send
+            replayed: how many leading alerts were read from the spill
+                file; they stay in it until they have been delivered
+
+        Returns a status string for logging.
+        """
+        cfg = get_settings().alertmanager
+        url = f"{cfg.url}/api/v2/alerts"
+        rejected = 0
+        for start in range(0, len(alerts), cfg.batch_size):
+            batch = alerts[start:start + cfg.batch_size]
+            delivered, error = self._post(url, batch, cfg)
+            if error is not None:
+                if start and replayed:
+                    self._rewrite_spill(alerts[min(start, replayed):replayed], cfg)
+                self._spill(alerts[max(start, replayed):], cfg)
+                return f"{error} ({len(alerts) - start} alerts spilled to disk)"
+            if delivered:
+                self.sent += len(batch)
+            else:
+                rejected += len(batch)
+        if replayed:
+            self._rewrite_spill([], cfg)
+        if rejected:
+            return f"Error: AlertManager rejected {rejected} of {len(alerts)} alerts"
+        return "Success: Message routed through Alertmanager."
+
+    def flush(self):
+        """Send everything buffered plus anything spilled by earlier failures."""
+        with self._flush_lock:
+            with self._lock:
+                alerts, self._buffer = self._buffer, []
+            spilled = self._read_spill(get_settings().alertmanager.spill_path)
+            if spilled:
+                logger.info("alertmanager: replaying %d spilled alerts", len(spilled))
+            alerts = spilled + alerts
+            if not alerts:
+                return None
+            result = self.send(alerts, replayed=len(spilled))
+            logger.debug("alertmanager: flushed %d alerts: %s", len(alerts), result)
+            return result
+
+    # ── Spill file ──
+
+    def _spill(self, alerts, cfg):
+        """Append undelivered alerts to the spill file, keeping the newest."""
+        if not alerts:
+            return
+        spilled = self._read_spill(cfg.spill_path) + alerts
+        overflow = len(spilled) - cfg.spill_max_alerts
+        if overflow > 0:
+            logger.warning("alertmanager: spill file full, dropping %d oldest alerts", overflow)
+            spilled = spilled[overflow:]
+            self.dropped += overflow
+        try:
+            self._write_spill(cfg.spill_path, spilled)
+            self.spilled += len(alerts)
+            logger.warning(
+                "alertmanager: unreachable, %d alerts spilled to %s",
+                len(spilled), cfg.spill_path,
+            )
+        except OSError as e:
+            logger.error("alertmanager: could not write spill file: %s", e)
+            self.dropped += len(alerts)
+
+    @staticmethod
+    def _read_spill(path):
+        try:
+            with open(path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.error("alertmanager: unreadable spill file %s: %s", path, e)
+            return []
+
+    @staticmethod
+    def _write_spill(path, alerts):
+        """Atomically replace the spill file's contents; remove it when empty."""
+        if not alerts:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for alert in alerts:
+                f.write(json.dumps(alert) + "\n")
+        os.replace(tmp_path, path)
+
+    def _rewrite_spill(self, alerts, cfg):
+        """Keep only the replayed alerts that are still undelivered."""
+        try:
+            self._write_spill(cfg.spill_path, alerts)
+        except OSError as e:
+            # Delivered alerts stay in the file and are sent again later
+            logger.error("alertmanager: could not rewrite spill file: %s", e)
+
+    # ── Background flusher ──
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(get_settings().alertmanager.flush_interval_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("alertmanager: flush failed: %s", e, exc_info=True)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background flusher thread."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="alertmanager", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the flusher and send whatever is still buffered."""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self._stop.clear()
+        self.flush()
+
+
+# Shared instance; main.run() starts its background flusher
+alert_sender = AlertSender()
+
+
+def send_to_alertmanager(summary, description, severity="info", minion_id="", metric_name="",
+                         starts_at=None, ends_at=None, cached_at=None, triage_rule=None):
+    """Send an enriched alert to AlertManager.
+
+    While the background flusher is running the alert is buffered and goes
+    out with the next batch; otherwise it is sent straight away.
+
+    Args:
+        summary: one-line summary of the issue
+        description: full AI-generated root cause analysis
+        severity: alert severity (info, warning, critical)
+        minion_id: the affected minion
+        metric_name: the metric that triggered the alert
+        starts_at: datetime the alert started; defaults to now
+        ends_at: datetime at which the alert resolved; marks the alert
+            with the same labels as resolved
+        cached_at: datetime the analysis was first written, when it was
+            reused from the analysis cache
+        triage_rule: name of the triage rule that wrote the analysis, if any
+    """
+    alert = build_alert(
+        summary, description, severity, minion_id, metric_name, starts_at, ends_at, cached_at,
+        triage_rule,
+    )
+    if alert_sender.running:
+        alert_sender.enqueue(alert)
+        return "Queued: alert will be sent with the next AlertManager batch."
+    return alert_sender.send([alert])
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from uyuni_ai_agent.salt_api import NO_RESPONSE
+
+logger = logging.getLogger(__name__)
+
+# ── Evidence normalization ──
+
+# Applied in order; each turns a volatile token into a stable placeholder
+_NORMALIZERS = (
+    # 2026-10-18T02:00:01.123Z, 2026-10-18 02:00:01+02:00
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?\b"), "<time>"),
+    # syslog/journal: Oct 18 02:00:01
+    (re.compile(r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) +\d{1,2} \d{2}:\d{2}(?::\d{2})?\b"), "<time>"),
+    # clock times and ps START/TIME columns: 02:00, 120:01, 1:02:03
+    (re.compile(r"\b\d{1,4}:\d{2}(?::\d{2})?(?:\.\d+)?\b"), "<time>"),
+    # hashes, container IDs, addresses
+    (re.compile(r"\b(?:0x[0-9a-fA-F]+|[0-9a-f]{12,})\b"), "<hex>"),
+)
+# 3.2G, 512M, 10 KiB -> the unit alone, i.e. a 1024x bucket
+_SIZE = re.compile(r"\b\d+(?:\.\d+)?\s?([KMGTP])(?:i?B)?\b")
+# Remaining numbers (PIDs, byte counts, percentages) -> their digit count
+_NUMBER = re.compile(r"\b(\d+)(?:\.\d+)?\b")
+_SPACES = re.compile(r"[ \t]+")
+
+
+def normalize_evidence(text):
+    """Strip volatile fields from tool output so repeat incidents hash alike.
+
+    Timestamps become <time>, hex IDs <hex>, sizes with a unit keep only
+    the unit (<G>), and other numbers keep only their magnitude (<n4>
+    for a 4-digit PID or byte count).
+    """
+    text = str(text)
+    for pattern, placeholder in _NORMALIZERS:
+        text = pattern.sub(placeholder, text)
+    text = _SIZE.sub(lambda m: f"<{m.group(1)}>", text)
+    text = _NUMBER.sub(lambda m: f"<n{len(m.group(1))}>", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def _failed(output):
+    output = str(output)
+    return output == NO_RESPONSE or output.startswith("Salt API call failed")
+
+
+def evidence_key(kind, severity, minion_id, evidence):
+    """Cache key for an investigation, or None if its evidence can't be trusted.
+
+    Args:
+        kind: anomaly metric name (or an incident's metric names)
+        severity: severity value
+        minion_id: the investigated minion ("fleet" for fleet incidents)
+        evidence: list of (tool_name, output) pairs, or a dict
+            minion_id -> such a list
+
+    Returns None when there is no evidence or a Salt call in it failed.
+    """
+    groups = evidence if isinstance(evidence, dict) else {minion_id: evidence}
+    if not any(groups.values()):
+        return None
+    normalized = []
+    for group_minion in sorted(groups):
+        for tool_name, output in groups[group_minion]:
+            if _failed(output):
+                return None
+            normalized.append([group_minion, tool_name, normalize_evidence(output)])
+    payload = json.dumps([kind, severity, minion_id, normalized], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# ── Persistent cache ──
+
+class CachedAnalysis(str):
+    """An analysis served from the cache; `cached_at` is when it was written."""
+
+    def __new__(cls, text, cached_at):
+        analysis = super().__new__(cls, text)
+        analysis.cached_at = cached_at
+        return analysis
+
+
+@dataclass
+class AnalysisCacheStats:
+    """Counters for the analysis cache."""
+    hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    evictions: int = 0
+
+
+class AnalysisCache:
+    """Root-cause analyses keyed by evidence_key(), persisted in SQLite.
+
+    Entries expire `ttl_seconds` after they were written (0 = never) and
+    the least recently used ones are evicted beyond `max_entries`. The
+    database path comes from the settings passed to each call, so a
+    reload that moves it takes effect on the next lookup.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = None
+        self._path = None
+        self._stats = AnalysisCacheStats()
+
+    def _connect(self, path):
+        """Return the connection for `path`. Caller holds the lock."""
+        if self._conn is not None and self._path == path:
+            return self._conn
+        if self._conn is not None:
+            self._conn.close()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " key TEXT PRIMARY KEY, kind TEXT, minion_id TEXT, analysis TEXT NOT NULL,"
+            " created_at REAL NOT NULL, used_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS analyses_used_at ON analyses (used_at)")
+        conn.commit()
+        self._conn, self._path = conn, path
+        return conn
+
+    def get(self, key, cfg):
+        """Return the CachedAnalysis for `key`, or None if absent or expired."""
+        now = self.clock()
+        with self._lock:
+            conn = self._connect(cfg.path)
+            row = conn.execute(
+                "SELECT analysis, created_at FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and cfg.ttl_seconds and row[1] <= now - cfg.ttl_seconds:
+                conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            if row is None:
+                self._stats.misses += 1
+                return None
+            conn.execute(
+                "UPDATE analyses SET used_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            conn.commit()
+            self._stats.hits += 1
+        return CachedAnalysis(row[0], row[1])
+
+    def put(self, key, kind, minion_id, analysis, cfg):
+        """Store an analysis, then drop expired and least recently used entries."""
+        now = self.clock()
+        with self._lock:
+            conn = self._connect(cfg.path)
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses"
+                " (key, kind, minion_id, analysis, created_at, used_at, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, kind, minion_id, str(analysis), now, now),
+            )
+            evicted = 0
+            if cfg.ttl_seconds:
+                evicted += conn.execute(
+                    "DELETE FROM analyses WHERE created_at <= ?", (now - cfg.ttl_seconds,)
+                ).rowcount
+            (count,) = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()
+            if count > cfg.max_entries:
+                evicted += conn.execute(
+                    "DELETE FROM analyses WHERE key IN"
+                    " (SELECT key FROM analyses ORDER BY used_at LIMIT ?)",
+                    (count - cfg.max_entries,),
+                ).rowcount
+            conn.commit()
+            self._stats.stored += 1
+            self._stats.evictions += evicted
+
+    def stats(self):
+        """Return a point-in-time copy of the counters."""
+        with self._lock:
+            return AnalysisCacheStats(**vars(self._stats))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn, self._path = None, None
+
+
+# Shared instance used by the investigation workers
+analysis_cache = AnalysisCache()
@@ -2,16 +2,9 @@ from dataclasses import dataclass
 from typing import List
 from enum import Enum
 
-from uyuni_ai_agent.prometheus_client import (
-    get_memory_usage_percent,
-    get_cpu_usage_percent,
-    get_disk_usage_percent,
-    get_apache_busy_workers_percent,
-    get_apache_requests_per_sec,
-    get_postgres_active_connections_percent,
-    get_postgres_deadlocks_per_min,
-)
-from uyuni_ai_agent.config import load_config
+from uyuni_ai_agent.prometheus_client import get_all_metrics
+from uyuni_ai_agent.metrics_snapshot import MetricsSnapshot, MinionMetrics
+from uyuni_ai_agent.config import get_settings
 
 
 class AlertSeverity(Enum):
@@ -30,113 +23,113 @@ class Anomaly:
     description: str
 
 
-def _check_threshold(value, thresholds, minion_id, metric_name, label):
+@dataclass
+class ForecastAnomaly(Anomaly):
+    """A metric trending towards exhaustion before it crosses a threshold.
+
+    current_value is the fitted current level and threshold the capacity
+    it is heading for.
+    """
+    time_to_exhaustion: float = 0.0  # seconds
+    rate_per_hour: float = 0.0
+
+
+def format_duration(seconds):
+    """Render a duration compactly, e.g. 3h40m, 2d4h, 25m."""
+    minutes = max(0, int(seconds // 60))
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d{hours}h"
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    return f"{minutes}m"
+
+
+# Threshold rules evaluated against every MinionMetrics record:
+# (snapshot field, path into the `thresholds` config, anomaly metric name,
+#  description label, unit). Fields that are None (exporter not
+# configured for the minion) are skipped.
+RULES = (
+    ("memory_percent", ("memory",), "memory", "Memory usage", "%"),
+    ("cpu_percent", ("cpu",), "cpu", "CPU usage", "%"),
+    ("disk_percent", ("disk",), "disk", "Disk usage", "%"),
+    ("apache_busy_workers_percent", ("apache", "busy_workers_percent"),
+     "apache_busy_workers", "Apache busy workers", "%"),
+    ("apache_requests_per_sec", ("apache", "requests_per_sec"),
+     "apache_requests", "Apache requests/sec", ""),
+    ("postgres_active_connections_percent", ("postgres", "active_connections_percent"),
+     "postgres_connections", "PostgreSQL active connections", "%"),
+    ("postgres_deadlocks_per_min", ("postgres", "deadlocks_per_min"),
+     "postgres_deadlocks", "PostgreSQL deadlocks/min", ""),
+)
+
+
+def _check_threshold(value, thresholds, minion_id, metric_name, label, unit=""):
     """Check a value against warning/critical thresholds. Returns Anomaly or None."""
     if value >= thresholds.get("critical", float("inf")):
         return Anomaly(
             minion_id, metric_name, value,
             thresholds["critical"],
             AlertSeverity.CRITICAL,
-            f"{label} at {value:.1f}"
+            f"{label} at {value:.1f}{unit}"
         )
     elif value >= thresholds.get("warning", float("inf")):
         return Anomaly(
             minion_id, metric_name, value,
             thresholds["warning"],
             AlertSeverity.WARNING,
-            f"{label} at {value:.1f}"
+            f"{label} at {value:.1f}{unit}"
         )
     return None
 
 
+def _resolve_thresholds(thresholds, path):
+    """Walk a path like ("apache", "busy_workers_percent") into the config."""
+    node = thresholds
+    for key in path:
+        node = node.get(key, {}) if isinstance(node, dict) else {}
+    return node
+
+
+def check_snapshot(snapshot, thresholds):
+    """Evaluate every threshold rule against a MetricsSnapshot in one pass.
+
+    Pure function: no Prometheus or config I/O, so the result depends only
+    on its arguments. Returns a list of Anomaly objects, grouped by minion
+    in snapshot order. Empty list means the whole fleet is healthy.
+    """
+    rules = [
+        (field, _resolve_thresholds(thresholds, path), metric_name, label, unit)
+        for field, path, metric_name, label, unit in RULES
+    ]
+    anomalies = []
+    for minion in snapshot:
+        for field, rule_thresholds, metric_name, label, unit in rules:
+            value = getattr(minion, field)
+            if value is None:
+                continue
+            anomaly = _check_threshold(
+                value, rule_thresholds, minion.minion_id, metric_name, label, unit
+            )
+            if anomaly:
+                anomalies.append(anomaly)
+    return anomalies
+
+
 def check_all_metrics(instance, minion_id, apache_instance=None, postgres_instance=None):
     """Check all metrics for an instance against thresholds.
     Returns a list of Anomaly objects. Empty list means healthy.
 
     Apache and PostgreSQL checks are skipped if their exporter
-    instances are not provided.
+    instances are not provided. Queries Prometheus for this one minion;
+    the polling loop uses check_snapshot() on the fleet snapshot instead.
     """
-    config = load_config()
-    thresholds = config["thresholds"]
-    anomalies = []
-
-    # ── Node Exporter Checks ──
-
-    # Memory check
-    mem_usage = get_memory_usage_percent(instance)
-    anomaly = _check_threshold(
-        mem_usage, thresholds["memory"], minion_id,
-        "memory", f"Memory usage at {mem_usage:.1f}%"
-    )
-    if anomaly:
-        anomalies.append(anomaly)
-
-    # CPU check
-    cpu_usage = get_cpu_usage_percent(instance)
-    anomaly = _check_threshold(
-        cpu_usage, thresholds["cpu"], minion_id,
-        "cpu", f"CPU usage at {cpu_usage:.1f}%"
-    )
-    if anomaly:
-        anomalies.append(anomaly)
-
-    # Disk check
-    disk_usage = get_disk_usage_percent(instance)
-    anomaly = _check_threshold(
-        disk_usage, thresholds["disk"], minion_id,
-        "disk", f"Disk usage at {disk_usage:.1f}%"
+    metrics = get_all_metrics(
+        instance,
+        apache_instance=apache_instance,
+        postgres_instance=postgres_instance,
     )
-    if anomaly:
-        anomalies.append(anomaly)
-
-    # ── Apache Exporter Checks ──
-
-    if apache_instance:
-        apache_thresholds = thresholds.get("apache", {})
-
-        busy_pct = get_apache_busy_workers_percent(apache_instance)
-        anomaly = _check_threshold(
-            busy_pct,
-            apache_thresholds.get("busy_workers_percent", {}),
-            minion_id, "apache_busy_workers",
-            f"Apache busy workers at {busy_pct:.1f}%"
-        )
-        if anomaly:
-            anomalies.append(anomaly)
-
-        rps = get_apache_requests_per_sec(apache_instance)
-        anomaly = _check_threshold(
-            rps,
-            apache_thresholds.get("requests_per_sec", {}),
-            minion_id, "apache_requests",
-            f"Apache requests/sec at {rps:.1f}"
-        )
-        if anomaly:
-            anomalies.append(anomaly)
-
-    # ── PostgreSQL Exporter Checks ──
-
-    if postgres_instance:
-        pg_thresholds = thresholds.get("postgres", {})
-
-        conn_pct = get_postgres_active_connections_percent(postgres_instance)
-        anomaly = _check_threshold(
-            conn_pct,
-            pg_thresholds.get("active_connections_percent", {}),
-            minion_id, "postgres_connections",
-            f"PostgreSQL active connections at {conn_pct:.1f}%"
-        )
-        if anomaly:
-            anomalies.append(anomaly)
-
-        deadlocks = get_postgres_deadlocks_per_min(postgres_instance)
-        anomaly = _check_threshold(
-            deadlocks,
-            pg_thresholds.get("deadlocks_per_min", {}),
-            minion_id, "postgres_deadlocks",
-            f"PostgreSQL deadlocks/min at {deadlocks:.1f}"
-        )
-        if anomaly:
-            anomalies.append(anomaly)
-
-    return anomalies
+    record = MinionMetrics.from_dict(minion_id, instance, metrics)
+    snapshot = MetricsSnapshot(minions={minion_id: record})
+    return check_snapshot(snapshot, get_settings().thresholds)
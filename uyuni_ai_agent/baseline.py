@@ -0,0 +1,239 @@
+import logging
+import time
+import warnings
+
+import numpy as np
+
+from uyuni_ai_agent.anomaly_detector import (
+    RULES, AlertSeverity, Anomaly, check_snapshot,
+)
+from uyuni_ai_agent.alert_lifecycle import SEVERITY_ORDER
+from uyuni_ai_agent.history_store import FIELDS, history_store
+
+logger = logging.getLogger(__name__)
+
+# Scales a median absolute deviation to a normal-equivalent std deviation
+MAD_TO_SIGMA = 1.4826
+# Floor on the spread, relative to max(|baseline|, 1), so perfectly flat
+# series don't turn every wobble into an infinite z-score
+MIN_SIGMA_RATIO = 0.02
+# Slots either side of the same time of day pooled into the seasonal median
+SEASONAL_HALF_WIDTH = 1
+
+
+class BaselineDetector:
+    """Flags metrics that deviate from their own history.
+
+    The fleet's history comes from the local HistoryStore as one float32
+    array of shape (minions, metrics, time), NaN where there was no
+    sample. From it, every (minion, metric) gets in one vectorized pass:
+
+    - a seasonal median: the values at the same time of day in previous
+      seasons, used as the expected value once `min_seasons` are known;
+    - an EWMA level, the fallback expectation for young series;
+    - a MAD-based robust spread of the season-over-season differences.
+
+    Each tick, the current snapshot is scored as z = (value - expected) /
+    spread, and z above `z_warning` / `z_critical` is an anomaly. All
+    metrics here are "higher is worse", so only upward deviations count.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.minion_ids = ()
+        self.index = {}
+        self.history = None
+        self.start = 0.0
+        self.step = 0.0
+        self.level = None
+        self.spread = None
+        self.refreshed_at = None
+
+    # ── History ──
+
+    def needs_refresh(self, store, now, cfg):
+        return (
+            self.history is None
+            or store.minion_ids != self.minion_ids
+            or store.step != self.step
+            or now - self.refreshed_at >= cfg.refresh_seconds
+        )
+
+    def refresh(self, store, cfg, now=None):
+        """Refit the baselines from the local history store's window."""
+        began = time.perf_counter()
+        now = self.clock() if now is None else now
+        self.start, self.history = store.window(now)
+        self.step = store.step
+        self.minion_ids = store.minion_ids
+        self.index = dict(store.index)
+        self._fit(cfg)
+        self.refreshed_at = now
+        logger.debug(
+            "baseline: fitted %s history in %.1fms",
+            "x".join(map(str, self.history.shape)), (time.perf_counter() - began) * 1000,
+        )
+
+    def _fit(self, cfg):
+        history = self.history
+        valid = ~np.isnan(history)
+        # Spread of what the seasonal model can't predict: differences
+        # between a sample and the same slot one season earlier (or the
+        # previous slot while history is shorter than a season). The
+        # difference of two samples has sqrt(2) times their noise.
+        lag = int(round(cfg.season_seconds / self.step)) if cfg.season_seconds else 0
+        if not 0 < lag < history.shape[2] - 1:
+            lag = 1
+        diffs = history[:, :, lag:] - history[:, :, :-lag]
+        with warnings.catch_warnings():
+            # Series with no samples at all produce all-NaN slices
+            warnings.simplefilter("ignore", RuntimeWarning)
+            median = np.nanmedian(diffs, axis=2)
+            mad = np.nanmedian(np.abs(diffs - median[..., None]), axis=2)
+        self.spread = (MAD_TO_SIGMA * mad / np.sqrt(2)).astype(np.float32)
+
+        # EWMA over the time axis in closed form: newest sample weight 1,
+        # each older one (1 - alpha) times the next, NaNs skipped
+        weights = (1 - cfg.ewma_alpha) ** np.arange(
+            history.shape[2] - 1, -1, -1, dtype=np.float32
+        )
+        total = np.where(valid, history, 0) @ weights
+        norm = valid.astype(np.float32) @ weights
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.level = np.where(norm > 0, total / norm, np.nan).astype(np.float32)
+
+    # ── Scoring ──
+
+    def _current(self, snapshot):
+        """Current values as a (minions, metrics) array, NaN where absent."""
+        current = np.full((len(self.minion_ids), len(FIELDS)), np.nan, dtype=np.float32)
+        for record in snapshot:
+            i = self.index.get(record.minion_id)
+            if i is None:
+                continue
+            for k, field in enumerate(FIELDS):
+                value = getattr(record, field)
+                if value is not None:
+                    current[i, k] = value
+        return current
+
+    def score(self, snapshot, cfg, now=None):
+        """Score a snapshot against the baselines.
+
+        Returns (current, expected, spread, z) arrays of shape
+        (minions, metrics). The EWMA level is advanced with the current
+        values after scoring.
+        """
+        now = snapshot.timestamp if now is None else now
+        current = self._current(snapshot)
+
+        expected = self.level
+        span = self.history.shape[2] * self.step
+        seasons = int(span // cfg.season_seconds) if cfg.season_seconds else 0
+        if seasons:
+            offsets = np.arange(-SEASONAL_HALF_WIDTH, SEASONAL_HALF_WIDTH + 1)
+            past = now - np.arange(1, seasons + 1) * cfg.season_seconds
+            slots = (np.rint((past - self.start) / self.step)[:, None] + offsets).ravel()
+            slots = slots[(slots >= 0) & (slots < self.history.shape[2])].astype(np.int64)
+            if slots.size:
+                window = self.history[:, :, slots]
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    seasonal = np.nanmedian(window, axis=2)
+                # Average samples per season slot group ~ seasons with data
+                known = (~np.isnan(window)).sum(axis=2) / offsets.size
+                expected = np.where(known >= cfg.min_seasons, seasonal, self.level)
+
+        spread = np.maximum(
+            self.spread, MIN_SIGMA_RATIO * np.maximum(np.abs(expected), 1)
+        )
+        with np.errstate(invalid="ignore"):
+            z = (current - expected) / spread
+
+        alpha = cfg.ewma_alpha
+        self.level = np.where(
+            np.isnan(current), self.level,
+            np.where(np.isnan(self.level), current, alpha * current + (1 - alpha) * self.level),
+        ).astype(np.float32)
+        return current, expected, spread, z
+
+    def check(self, snapshot, cfg, now=None):
+        """Find every (minion, metric) that is off its baseline.
+
+        Returns (anomalies, unscored) where unscored is the set of
+        (minion_id, metric_name) that have a current value but no history
+        to compare it against.
+        """
+        current, expected, spread, z = self.score(snapshot, cfg, now)
+        unscored = {
+            (self.minion_ids[i], RULES[k][2])
+            for i, k in np.argwhere(~np.isnan(current) & np.isnan(expected))
+        }
+        with np.errstate(invalid="ignore"):
+            hits = np.argwhere(z >= cfg.z_warning)
+        anomalies = []
+        for i, k in hits:
+            _, _, metric_name, label, unit = RULES[k]
+            critical = z[i, k] >= cfg.z_critical
+            limit = cfg.z_critical if critical else cfg.z_warning
+            value, base = float(current[i, k]), float(expected[i, k])
+            anomalies.append(Anomaly(
+                self.minion_ids[i], metric_name, value,
+                base + limit * float(spread[i, k]),
+                AlertSeverity.CRITICAL if critical else AlertSeverity.WARNING,
+                f"{label} at {value:.1f}{unit}, {z[i, k]:.1f} deviations above "
+                f"its baseline of {base:.1f}{unit}",
+            ))
+        return anomalies, unscored
+
+
+def _merge(*anomaly_lists):
+    """Keep the most severe anomaly per (minion, metric), first-seen order."""
+    merged = {}
+    for anomalies in anomaly_lists:
+        for anomaly in anomalies:
+            key = (anomaly.minion_id, anomaly.metric_name)
+            kept = merged.get(key)
+            if kept is None or SEVERITY_ORDER[anomaly.severity] > SEVERITY_ORDER[kept.severity]:
+                merged[key] = anomaly
+    return list(merged.values())
+
+
+# Shared instance; its history persists across ticks
+baseline_detector = BaselineDetector()
+
+
+def detect_anomalies(snapshot, settings):
+    """Run the configured detection mode over a snapshot.
+
+    - static:   warning/critical thresholds only (check_snapshot)
+    - baseline: deviations from each series' own baseline only
+    - hybrid:   baseline deviations, plus static criticals, which always fire
+
+    Series without history (new minions, failed backfills) fall back to
+    static thresholds, so a baseline outage never silences alerting.
+    """
+    cfg = settings.detection
+    static = check_snapshot(snapshot, settings.thresholds)
+    if cfg.mode == "static":
+        return static
+
+    detector = baseline_detector
+    if history_store.values is not None:
+        now = detector.clock()
+        if detector.needs_refresh(history_store, now, cfg):
+            try:
+                detector.refresh(history_store, cfg, now)
+            except Exception as e:
+                logger.error("Baseline refresh failed: %s", e, exc_info=True)
+    if detector.history is None:
+        return static
+
+    deviations, unscored = detector.check(snapshot, cfg)
+    fallback = [
+        a for a in static
+        if a.minion_id not in detector.index or (a.minion_id, a.metric_name) in unscored
+    ]
+    if cfg.mode == "hybrid":
+        fallback += [a for a in static if a.severity == AlertSeverity.CRITICAL]
+    return _merge(fallback, deviations)
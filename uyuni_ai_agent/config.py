@@ -1,31 +1,669 @@
 import os
 import logging
+import re
+import signal
+import string
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
 import yaml
 
 logger = logging.getLogger(__name__)
 
+CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "config",
+    "settings.yaml"
+)
 
-def load_config():
-    """Load settings from config/settings.yaml"""
-    config_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        "config",
-        "settings.yaml"
+DEFAULT_ALERT_SPILL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "alertmanager_spill.jsonl"
+)
+
+
+# ── Typed Sections ──
+
+@dataclass(frozen=True)
+class PrometheusSettings:
+    url: str
+
+
+@dataclass(frozen=True)
+class AlertmanagerSettings:
+    url: str
+    batch_size: int = 100
+    flush_interval_seconds: float = 5.0
+    timeout_seconds: float = 10.0
+    max_retries: int = 3
+    retry_backoff_seconds: float = 0.5
+    spill_path: str = DEFAULT_ALERT_SPILL_PATH
+    spill_max_alerts: int = 10000
+
+
+@dataclass(frozen=True)
+class SaltAPISettings:
+    url: str
+    username: str
+    password: str = ""
+    eauth: str = "file"
+    cache_ttl_seconds: float = 30.0
+    cache_max_entries: int = 512
+    async_jobs: bool = True
+    use_events: bool = True
+    job_timeout_seconds: float = 120.0
+    job_poll_interval_seconds: float = 2.0
+
+
+@dataclass(frozen=True)
+class MinionSettings:
+    id: str
+    instance: str
+    apache_instance: Optional[str] = None
+    postgres_instance: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class LLMSettings:
+    provider: str
+    model: str
+    api_key: str = ""
+
+
+@dataclass(frozen=True)
+class PollingSettings:
+    interval_seconds: int = 60
+    max_concurrency: int = 8
+
+
+@dataclass(frozen=True)
+class InvestigationSettings:
+    workers: int = 2
+    max_queue_size: int = 100
+    prefetch: bool = True
+    max_turns: int = 8
+    max_tool_calls: int = 12
+    max_tokens: int = 60000
+    deadline_seconds: float = 180.0
+    history_token_limit: int = 6000
+    keep_tool_messages: int = 2
+
+
+@dataclass(frozen=True)
+class AlertingSettings:
+    for_seconds: float = 0
+    hysteresis_ratio: float = 0.05
+    renotify_seconds: float = 3600
+    significant_change_ratio: float = 0.1
+
+
+DEFAULT_HISTORY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "history.npy"
+)
+
+DEFAULT_ANALYSIS_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "analysis_cache.sqlite"
+)
+
+DETECTION_MODES = ("static", "baseline", "hybrid")
+
+
+@dataclass(frozen=True)
+class DetectionSettings:
+    mode: str = "static"
+    season_seconds: float = 86400
+    refresh_seconds: float = 900
+    min_seasons: int = 3
+    ewma_alpha: float = 0.3
+    z_warning: float = 3.5
+    z_critical: float = 6.0
+
+
+@dataclass(frozen=True)
+class HistorySettings:
+    enabled: bool = True
+    path: str = DEFAULT_HISTORY_PATH
+    step_seconds: int = 600
+    retention_seconds: int = 7 * 86400
+
+
+@dataclass(frozen=True)
+class ForecastSettings:
+    enabled: bool = True
+    window_seconds: float = 6 * 3600
+    min_samples: int = 6
+    min_rate_per_hour: float = 0.1
+    warning_hours: float = 24
+    critical_hours: float = 4
+
+
+@dataclass(frozen=True)
+class CorrelationSettings:
+    enabled: bool = True
+    window_seconds: float = 300
+    fleet_min_minions: int = 3
+    fleet_max_minions: int = 5
+
+
+@dataclass(frozen=True)
+class WebhookSettings:
+    host: str = "0.0.0.0"
+    port: int = 9095
+    path: str = "/alerts"
+    dedupe_seconds: float = 3600
+    max_pending: int = 1000
+    alertname_metrics: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class TelemetrySettings:
+    enabled: bool = True
+    host: str = "0.0.0.0"
+    port: int = 9096
+
+
+@dataclass(frozen=True)
+class AnalysisCacheSettings:
+    enabled: bool = True
+    path: str = DEFAULT_ANALYSIS_CACHE_PATH
+    ttl_seconds: float = 3 * 86400
+    max_entries: int = 1000
+
+
+# Fields every triage template can use besides its patterns' named groups
+TRIAGE_FIELDS = ("minion_id", "metric", "value", "severity", "count")
+URGENCIES = ("Low", "Medium", "High", "Critical")
+
+
+@dataclass(frozen=True)
+class TriageCondition:
+    tool: str
+    pattern: re.Pattern
+    min_matches: int = 1
+
+
+@dataclass(frozen=True)
+class TriageRule:
+    name: str
+    metrics: Tuple[str, ...]
+    conditions: Tuple[TriageCondition, ...]
+    root_cause: str
+    evidence: Tuple[str, ...]
+    remediation: Tuple[str, ...]
+    urgency: str
+
+
+@dataclass(frozen=True)
+class TriageSettings:
+    enabled: bool = True
+    rules: Tuple[TriageRule, ...] = ()
+
+
+@dataclass(frozen=True)
+class ToolsSettings:
+    compaction: bool = True
+    token_budget: int = 600
+    token_budgets: dict = field(default_factory=dict)
+    max_parallel_calls: int = 4
+    per_minion_concurrency: int = 2
+    call_timeout_seconds: float = 90.0
+    call_timeouts: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Validated, read-only view of settings.yaml.
+
+    `raw` keeps the parsed YAML (with env overrides applied) for sections
+    that have no typed counterpart.
+    """
+    prometheus: PrometheusSettings
+    alertmanager: AlertmanagerSettings
+    salt_api: SaltAPISettings
+    minions: Tuple[MinionSettings, ...]
+    thresholds: dict
+    llm: LLMSettings
+    polling: PollingSettings
+    investigation: InvestigationSettings
+    alerting: AlertingSettings
+    tools: ToolsSettings
+    detection: DetectionSettings
+    history: HistorySettings
+    forecast: ForecastSettings
+    correlation: CorrelationSettings
+    webhook: WebhookSettings
+    telemetry: TelemetrySettings
+    analysis_cache: AnalysisCacheSettings
+    triage: TriageSettings
+    log_level: Optional[str]
+    raw: dict
+
+
+def _section(config, name):
+    section = config.get(name)
+    if not isinstance(section, dict):
+        raise ValueError(f"config: missing or invalid '{name}' section")
+    return section
+
+
+def _require(section, name, key):
+    value = section.get(key)
+    if value in (None, ""):
+        raise ValueError(f"config: '{name}.{key}' is required")
+    return value
+
+
+def _validate_thresholds(thresholds, path="thresholds"):
+    """Every leaf must be a number and warning must not exceed critical."""
+    for key, value in thresholds.items():
+        if isinstance(value, dict):
+            _validate_thresholds(value, f"{path}.{key}")
+        elif not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"config: '{path}.{key}' must be a number")
+    warning, critical = thresholds.get("warning"), thresholds.get("critical")
+    if warning is not None and critical is not None and warning > critical:
+        raise ValueError(f"config: '{path}' warning is above critical")
+
+
+def _positive_int(section, name, key, default):
+    value = section.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError(f"config: '{name}.{key}' must be a positive integer")
+    return value
+
+
+def _non_negative(section, name, key, default):
+    value = section.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+        raise ValueError(f"config: '{name}.{key}' must be a non-negative number")
+    return value
+
+
+def _positive(section, name, key, default):
+    value = section.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+        raise ValueError(f"config: '{name}.{key}' must be a positive number")
+    return value
+
+
+def _template_fields(template, name, allowed):
+    """Check a triage template's {fields} against the ones it can use."""
+    try:
+        fields = [f for _, f, _, _ in string.Formatter().parse(template) if f is not None]
+    except ValueError as e:
+        raise ValueError(f"config: '{name}' is not a valid template: {e}")
+    for field_name in fields:
+        if field_name not in allowed:
+            raise ValueError(f"config: '{name}' uses unknown field {{{field_name}}}")
+    return template
+
+
+def _parse_triage_rules(rules):
+    """Validate triage.rules into TriageRule objects, in the order given."""
+    if not isinstance(rules, list):
+        raise ValueError("config: 'triage.rules' must be a list")
+    parsed = []
+    for i, rule in enumerate(rules):
+        name = f"triage.rules[{i}]"
+        if not isinstance(rule, dict):
+            raise ValueError(f"config: '{name}' must be a mapping")
+        conditions = rule.get("match")
+        if not isinstance(conditions, list) or not conditions:
+            raise ValueError(f"config: '{name}.match' must be a non-empty list")
+        parsed_conditions, allowed = [], set(TRIAGE_FIELDS)
+        for j, condition in enumerate(conditions):
+            cname = f"{name}.match[{j}]"
+            if not isinstance(condition, dict):
+                raise ValueError(f"config: '{cname}' must be a mapping")
+            try:
+                pattern = re.compile(_require(condition, cname, "pattern"), re.MULTILINE)
+            except re.error as e:
+                raise ValueError(f"config: '{cname}.pattern' is not a valid regex: {e}")
+            allowed.update(pattern.groupindex)
+            parsed_conditions.append(TriageCondition(
+                tool=_require(condition, cname, "tool"),
+                pattern=pattern,
+                min_matches=_positive_int(condition, cname, "min_matches", 1),
+            ))
+        metrics = rule.get("metrics") or []
+        evidence = rule.get("evidence") or []
+        remediation = rule.get("remediation")
+        if not isinstance(metrics, list) or not isinstance(evidence, list):
+            raise ValueError(f"config: '{name}.metrics' and '.evidence' must be lists")
+        if not isinstance(remediation, list) or not remediation:
+            raise ValueError(f"config: '{name}.remediation' must be a non-empty list")
+        urgency = rule.get("urgency", "Medium")
+        if urgency not in URGENCIES:
+            raise ValueError(f"config: '{name}.urgency' must be one of {', '.join(URGENCIES)}")
+        parsed.append(TriageRule(
+            name=str(_require(rule, name, "name")),
+            metrics=tuple(str(m) for m in metrics),
+            conditions=tuple(parsed_conditions),
+            root_cause=_template_fields(
+                _require(rule, name, "root_cause"), f"{name}.root_cause", allowed
+            ),
+            evidence=tuple(
+                _template_fields(str(t), f"{name}.evidence[{j}]", allowed)
+                for j, t in enumerate(evidence)
+            ),
+            remediation=tuple(
+                _template_fields(str(t), f"{name}.remediation[{j}]", allowed)
+                for j, t in enumerate(remediation)
+            ),
+            urgency=urgency,
+        ))
+    return tuple(parsed)
+
+
+def parse_settings(config):
+    """Validate a raw settings dict into a Settings object.
+
+    Raises ValueError describing the first invalid field.
+    """
+    prometheus = _section(config, "prometheus")
+    alertmanager = _section(config, "alertmanager")
+    salt_api = _section(config, "salt_api")
+    llm = _section(config, "llm")
+    polling = config.get("polling") or {}
+
+    minions = config.get("minions")
+    if not isinstance(minions, list):
+        raise ValueError("config: 'minions' must be a list")
+    parsed_minions = []
+    for i, minion in enumerate(minions):
+        if not isinstance(minion, dict):
+            raise ValueError(f"config: 'minions[{i}]' must be a mapping")
+        parsed_minions.append(MinionSettings(
+            id=_require(minion, f"minions[{i}]", "id"),
+            instance=_require(minion, f"minions[{i}]", "instance"),
+            apache_instance=minion.get("apache_instance"),
+            postgres_instance=minion.get("postgres_instance"),
+        ))
+
+    thresholds = config.get("thresholds") or {}
+    _validate_thresholds(thresholds)
+
+    interval = polling.get("interval_seconds", 60)
+    if not isinstance(interval, (int, float)) or interval <= 0:
+        raise ValueError("config: 'polling.interval_seconds' must be positive")
+    investigation = config.get("investigation") or {}
+    alerting = config.get("alerting") or {}
+    tools = config.get("tools") or {}
+    detection = config.get("detection") or {}
+    mode = detection.get("mode", "static")
+    if mode not in DETECTION_MODES:
+        raise ValueError(f"config: 'detection.mode' must be one of {', '.join(DETECTION_MODES)}")
+    alpha = _non_negative(detection, "detection", "ewma_alpha", 0.3)
+    if not 0 < alpha <= 1:
+        raise ValueError("config: 'detection.ewma_alpha' must be in (0, 1]")
+    history = config.get("history") or {}
+    forecast = config.get("forecast") or {}
+    correlation = config.get("correlation") or {}
+    webhook = config.get("webhook") or {}
+    telemetry = config.get("telemetry") or {}
+    analysis_cache = config.get("analysis_cache") or {}
+    triage = config.get("triage") or {}
+    alertname_metrics = webhook.get("alertname_metrics") or {}
+    if not isinstance(alertname_metrics, dict):
+        raise ValueError("config: 'webhook.alertname_metrics' must be a mapping")
+    webhook_path = webhook.get("path", "/alerts")
+    if not isinstance(webhook_path, str) or not webhook_path.startswith("/"):
+        raise ValueError("config: 'webhook.path' must start with '/'")
+    step = _positive_int(history, "history", "step_seconds", 600)
+    retention = _positive_int(history, "history", "retention_seconds", 7 * 86400)
+    if retention < step:
+        raise ValueError("config: 'history.retention_seconds' is shorter than one step")
+    if mode != "static" and not history.get("enabled", True):
+        raise ValueError(f"config: detection.mode '{mode}' needs history.enabled")
+    token_budgets = tools.get("token_budgets") or {}
+    if not isinstance(token_budgets, dict):
+        raise ValueError("config: 'tools.token_budgets' must be a mapping")
+    for name in token_budgets:
+        _positive_int(token_budgets, "tools.token_budgets", name, None)
+    call_timeouts = tools.get("call_timeouts") or {}
+    if not isinstance(call_timeouts, dict):
+        raise ValueError("config: 'tools.call_timeouts' must be a mapping")
+    for name in call_timeouts:
+        _non_negative(call_timeouts, "tools.call_timeouts", name, None)
+
+    return Settings(
+        prometheus=PrometheusSettings(url=_require(prometheus, "prometheus", "url")),
+        alertmanager=AlertmanagerSettings(
+            url=_require(alertmanager, "alertmanager", "url"),
+            batch_size=_positive_int(alertmanager, "alertmanager", "batch_size", 100),
+            flush_interval_seconds=_non_negative(
+                alertmanager, "alertmanager", "flush_interval_seconds", 5.0
+            ),
+            timeout_seconds=_non_negative(alertmanager, "alertmanager", "timeout_seconds", 10.0),
+            max_retries=int(_non_negative(alertmanager, "alertmanager", "max_retries", 3)),
+            retry_backoff_seconds=_non_negative(
+                alertmanager, "alertmanager", "retry_backoff_seconds", 0.5
+            ),
+            spill_path=alertmanager.get("spill_path") or DEFAULT_ALERT_SPILL_PATH,
+            spill_max_alerts=_positive_int(alertmanager, "alertmanager", "spill_max_alerts", 10000),
+        ),
+        salt_api=SaltAPISettings(
+            url=_require(salt_api, "salt_api", "url"),
+            username=_require(salt_api, "salt_api", "username"),
+            password=salt_api.get("password") or "",
+            eauth=salt_api.get("eauth") or "file",
+            cache_ttl_seconds=_non_negative(salt_api, "salt_api", "cache_ttl_seconds", 30.0),
+            cache_max_entries=_positive_int(salt_api, "salt_api", "cache_max_entries", 512),
+            async_jobs=bool(salt_api.get("async_jobs", True)),
+            use_events=bool(salt_api.get("use_events", True)),
+            job_timeout_seconds=_positive(salt_api, "salt_api", "job_timeout_seconds", 120.0),
+            job_poll_interval_seconds=_positive(
+                salt_api, "salt_api", "job_poll_interval_seconds", 2.0
+            ),
+        ),
+        minions=tuple(parsed_minions),
+        thresholds=thresholds,
+        llm=LLMSettings(
+            provider=_require(llm, "llm", "provider"),
+            model=_require(llm, "llm", "model"),
+            api_key=llm.get("api_key") or "",
+        ),
+        polling=PollingSettings(
+            interval_seconds=interval,
+            max_concurrency=_positive_int(polling, "polling", "max_concurrency", 8),
+        ),
+        investigation=InvestigationSettings(
+            workers=_positive_int(investigation, "investigation", "workers", 2),
+            max_queue_size=_positive_int(investigation, "investigation", "max_queue_size", 100),
+            prefetch=bool(investigation.get("prefetch", True)),
+            max_turns=_positive_int(investigation, "investigation", "max_turns", 8),
+            max_tool_calls=_positive_int(investigation, "investigation", "max_tool_calls", 12),
+            max_tokens=_positive_int(investigation, "investigation", "max_tokens", 60000),
+            deadline_seconds=_positive(investigation, "investigation", "deadline_seconds", 180.0),
+            history_token_limit=_positive_int(
+                investigation, "investigation", "history_token_limit", 6000
+            ),
+            keep_tool_messages=int(
+                _non_negative(investigation, "investigation", "keep_tool_messages", 2)
+            ),
+        ),
+        alerting=AlertingSettings(
+            for_seconds=_non_negative(alerting, "alerting", "for_seconds", 0),
+            hysteresis_ratio=_non_negative(alerting, "alerting", "hysteresis_ratio", 0.05),
+            renotify_seconds=_non_negative(alerting, "alerting", "renotify_seconds", 3600),
+            significant_change_ratio=_non_negative(
+                alerting, "alerting", "significant_change_ratio", 0.1
+            ),
+        ),
+        tools=ToolsSettings(
+            compaction=bool(tools.get("compaction", True)),
+            token_budget=_positive_int(tools, "tools", "token_budget", 600),
+            token_budgets=dict(token_budgets),
+            max_parallel_calls=_positive_int(tools, "tools", "max_parallel_calls", 4),
+            per_minion_concurrency=_positive_int(tools, "tools", "per_minion_concurrency", 2),
+            call_timeout_seconds=_non_negative(tools, "tools", "call_timeout_seconds", 90.0),
+            call_timeouts=dict(call_timeouts),
+        ),
+        detection=DetectionSettings(
+            mode=mode,
+            season_seconds=_non_negative(detection, "detection", "season_seconds", 86400),
+            refresh_seconds=_non_negative(detection, "detection", "refresh_seconds", 900),
+            min_seasons=_positive_int(detection, "detection", "min_seasons", 3),
+            ewma_alpha=alpha,
+            z_warning=_non_negative(detection, "detection", "z_warning", 3.5),
+            z_critical=_non_negative(detection, "detection", "z_critical", 6.0),
+        ),
+        history=HistorySettings(
+            enabled=bool(history.get("enabled", True)),
+            path=history.get("path") or DEFAULT_HISTORY_PATH,
+            step_seconds=step,
+            retention_seconds=retention,
+        ),
+        forecast=ForecastSettings(
+            enabled=bool(forecast.get("enabled", True)),
+            window_seconds=_non_negative(forecast, "forecast", "window_seconds", 6 * 3600),
+            min_samples=_positive_int(forecast, "forecast", "min_samples", 6),
+            min_rate_per_hour=_non_negative(forecast, "forecast", "min_rate_per_hour", 0.1),
+            warning_hours=_non_negative(forecast, "forecast", "warning_hours", 24),
+            critical_hours=_non_negative(forecast, "forecast", "critical_hours", 4),
+        ),
+        correlation=CorrelationSettings(
+            enabled=bool(correlation.get("enabled", True)),
+            window_seconds=_non_negative(correlation, "correlation", "window_seconds", 300),
+            fleet_min_minions=_positive_int(correlation, "correlation", "fleet_min_minions", 3),
+            fleet_max_minions=_positive_int(correlation, "correlation", "fleet_max_minions", 5),
+        ),
+        webhook=WebhookSettings(
+            host=str(webhook.get("host", "0.0.0.0")),
+            port=_positive_int(webhook, "webhook", "port", 9095),
+            path=webhook_path,
+            dedupe_seconds=_non_negative(webhook, "webhook", "dedupe_seconds", 3600),
+            max_pending=_positive_int(webhook, "webhook", "max_pending", 1000),
+            alertname_metrics={str(k): str(v) for k, v in alertname_metrics.items()},
+        ),
+        telemetry=TelemetrySettings(
+            enabled=bool(telemetry.get("enabled", True)),
+            host=str(telemetry.get("host", "0.0.0.0")),
+            port=_positive_int(telemetry, "telemetry", "port", 9096),
+        ),
+        analysis_cache=AnalysisCacheSettings(
+            enabled=bool(analysis_cache.get("enabled", True)),
+            path=analysis_cache.get("path") or DEFAULT_ANALYSIS_CACHE_PATH,
+            ttl_seconds=_non_negative(analysis_cache, "analysis_cache", "ttl_seconds", 3 * 86400),
+            max_entries=_positive_int(analysis_cache, "analysis_cache", "max_entries", 1000),
+        ),
+        triage=TriageSettings(
+            enabled=bool(triage.get("enabled", True)),
+            rules=_parse_triage_rules(triage.get("rules") or []),
+        ),
+        log_level=(config.get("logging") or {}).get("level"),
+        raw=config,
     )
-    logger.debug("loading config from: %s", config_path)
-    logger.debug("file exists: %s", os.path.exists(config_path))
-    with open(config_path, "r") as f:
-        config = yaml.safe_load(f)
-    logger.debug("config loaded, keys: %s", list(config.keys()))
-    
+
+
+def _read_config(path):
+    """Read and YAML-parse the settings file, applying env overrides."""
+    logger.debug("loading config from: %s", path)
+    with open(path, "r") as f:
+        config = yaml.safe_load(f) or {}
+
     # Override LLM API key from environment if set
     api_key = os.environ.get("LLM_API_KEY", "")
     if api_key:
-        config["llm"]["api_key"] = api_key
+        config.setdefault("llm", {})["api_key"] = api_key
 
     # Override Salt API password from environment if set
     salt_pw = os.environ.get("SALT_API_PASSWORD", "")
     if salt_pw:
-        config["salt_api"]["password"] = salt_pw
-    
+        config.setdefault("salt_api", {})["password"] = salt_pw
+
     return config
+
+
+# ── Process-wide Cached Config ──
+
+class ConfigManager:
+    """Holds the parsed settings and reloads them when the file changes.
+
+    get() never touches the filesystem. refresh() stats the file and
+    re-parses only when its mtime, inode or size changed, or after a
+    SIGHUP. A file that fails to parse or validate is logged and the
+    previous settings stay in effect.
+    """
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._settings = None
+        self._file_id = None
+        self._reload_requested = False
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def _load(self):
+        settings = parse_settings(_read_config(self.path))
+        self._settings = settings
+        logger.debug("config loaded, keys: %s", list(settings.raw.keys()))
+        return settings
+
+    def get(self):
+        """Return the current Settings, loading them on first use."""
+        settings = self._settings
+        if settings is not None:
+            return settings
+        with self._lock:
+            if self._settings is None:
+                self._file_id = self._stat()
+                self._load()
+            return self._settings
+
+    def refresh(self):
+        """Reload if the file changed or a reload was requested.
+
+        Returns True when new settings were installed.
+        """
+        with self._lock:
+            try:
+                file_id = self._stat()
+            except OSError as e:
+                logger.error("config: cannot stat %s: %s", self.path, e)
+                return False
+            changed = file_id != self._file_id
+            if not (changed or self._reload_requested or self._settings is None):
+                return False
+            # Record the new file identity even if parsing fails, so a broken
+            # file is reported once rather than re-parsed every tick.
+            self._file_id = file_id
+            self._reload_requested = False
+            try:
+                self._load()
+            except Exception as e:
+                logger.error("config: reload failed, keeping previous settings: %s", e)
+                return False
+        logger.info("config: reloaded %s", self.path)
+        return True
+
+    def request_reload(self, *_):
+        """Flag a reload for the next refresh(). Safe to use as a signal handler."""
+        self._reload_requested = True
+
+    def install_sighup_handler(self):
+        """Reload settings on SIGHUP. Must be called from the main thread."""
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self.request_reload)
+
+
+config_manager = ConfigManager()
+
+
+def get_settings():
+    """Return the process-wide validated Settings. No I/O after first load."""
+    return config_manager.get()
+
+
+def load_config():
+    """Return settings.yaml as a dict (cached; see ConfigManager)."""
+    return config_manager.get().raw
@@ -0,0 +1,314 @@
+import contextvars
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.jsonl"
+OBJECTS_DIR = "objects"
+
+# Prometheus query parameters that differ between otherwise identical requests
+VOLATILE_PARAMS = ("start", "end", "time")
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def request_key(kind, request):
+    """Stable hash of one request, used to match it on replay."""
+    return hashlib.sha256(_canonical([kind, request]).encode()).hexdigest()
+
+
+class FixtureStore:
+    """Content-addressed recording of Prometheus, Salt and LLM exchanges.
+
+    Responses are stored once per distinct content as gzipped JSON under
+    objects/<aa>/<sha256>; index.jsonl holds one line per exchange
+    (kind, request hash, response object, elapsed seconds, investigation)
+    and one line per investigation with its pickled arguments.
+
+    When recording, exchange() calls through and stores the response.
+    When replaying, it serves the recorded response for the same request
+    after sleeping `scale` times the recorded latency. Requests are
+    matched by hash, preferring responses recorded by the same
+    investigation and reusing the last one once all are served. An LLM
+    request that matches nothing (its prompt changed) gets the
+    investigation's next recorded LLM response instead.
+
+    Investigation arguments are pickled, so only replay fixtures you
+    recorded yourself.
+
+    Args:
+        path: fixture directory; created when recording
+        replay: serve responses instead of recording them
+        scale: replay latency multiplier (0 = no waiting)
+    """
+
+    def __init__(self, path, replay=False, scale=1.0):
+        self.path = path
+        self.replay = replay
+        self.scale = scale
+        self.entries = []
+        self.log = []  # replay: one dict per exchange served or missed
+        self._lock = threading.Lock()
+        # A ContextVar, so the id follows the run onto the agent's threads
+        self._investigation = contextvars.ContextVar(f"fixtures:{path}", default=None)
+        self._unused = {}  # (kind, key) -> entries not served yet
+        self._last = {}  # (kind, key) -> last entry served
+        self._sequence = {}  # (investigation, kind) -> entries in recorded order
+        self._position = {}  # (investigation, kind) -> responses served so far
+        self._index = None
+        self._load()
+        if not replay:
+            os.makedirs(os.path.join(path, OBJECTS_DIR), exist_ok=True)
+            self._index = open(os.path.join(path, INDEX_FILE), "a")
+        self._next_id = 1 + max(
+            (e["id"] for e in self.entries if e["kind"] == "investigation"), default=0
+        )
+
+    def _load(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            if self.replay:
+                raise FileNotFoundError(f"fixtures: no {INDEX_FILE} in {self.path}")
+            return
+        with open(index_path) as f:
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        for entry in self.entries:
+            if entry["kind"] == "investigation":
+                continue
+            self._unused.setdefault((entry["kind"], entry["key"]), []).append(entry)
+            self._sequence.setdefault((entry.get("investigation"), entry["kind"]), []).append(entry)
+
+    # ── Objects ──
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, OBJECTS_DIR, digest[:2], digest)
+
+    def put(self, data):
+        """Store bytes under their SHA-256 and return it."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest):
+        with gzip.open(self._object_path(digest), "rb") as f:
+            return f.read()
+
+    def load_json(self, digest):
+        return json.loads(self.get(digest))
+
+    def _append(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+            self._index.write(json.dumps(entry) + "\n")
+            self._index.flush()
+
+    # ── Exchanges ──
+
+    @property
+    def current_investigation(self):
+        return self._investigation.get()
+
+    @contextmanager
+    def investigation(self, investigator, args, recorded_id=None):
+        """Tag exchanges made inside the block with one investigation.
+
+        Recording stores `args` so the investigation can be re-run;
+        replaying passes the recorded id instead.
+        """
+        if self.replay:
+            investigation_id, digest = recorded_id, None
+        else:
+            with self._lock:
+                investigation_id, self._next_id = self._next_id, self._next_id + 1
+            digest = self.put(pickle.dumps(args))
+        token = self._investigation.set(investigation_id)
+        started = time.perf_counter()
+        try:
+            yield investigation_id
+        finally:
+            self._investigation.reset(token)
+            if not self.replay:
+                self._append({
+                    "kind": "investigation",
+                    "id": investigation_id,
+                    "investigator": investigator,
+                    "object": digest,
+                    "elapsed": time.perf_counter() - started,
+                })
+
+    def exchange(self, kind, request, send):
+        """Record send()'s response to `request`, or replay it.
+
+        Args:
+            kind: "prometheus", "salt" or "llm"
+            request: JSON-serialisable request, without credentials
+            send: callable performing the real request; its result must
+                be JSON-serialisable
+
+        Returns:
+            the (recorded) response. A recorded failure is raised again
+            as RuntimeError; a request with no recording raises LookupError.
+        """
+        key = request_key(kind, request)
+        investigation = self.current_investigation
+        if self.replay:
+            return self._serve(kind, key, investigation, len(_canonical(request)))
+
+        started = time.perf_counter()
+        entry = {"kind": kind, "key": key, "investigation": investigation,
+                 "request_chars": len(_canonical(request))}
+        try:
+            response = send()
+        except Exception as e:
+            entry.update(error=str(e), elapsed=time.perf_counter() - started)
+            self._append(entry)
+            raise
+        entry.update(
+            object=self.put(_canonical(response).encode()),
+            elapsed=time.perf_counter() - started,
+        )
+        self._append(entry)
+        return response
+
+    def _serve(self, kind, key, investigation, request_chars):
+        with self._lock:
+            unused = self._unused.get((kind, key), [])
+            entry = next((e for e in unused if e.get("investigation") == investigation), None)
+            if entry is None and unused:
+                entry = unused[0]
+            if entry is None:
+                entry = self._last.get((kind, key))
+            matched = entry is not None
+            position = self._position.get((investigation, kind), 0)
+            if entry is None and kind == "llm":
+                sequence = self._sequence.get((investigation, kind), [])
+                entry = sequence[position] if position < len(sequence) else None
+            if entry in unused:
+                unused.remove(entry)
+            if entry is not None:
+                self._last[(kind, key)] = entry
+            self._position[(investigation, kind)] = position + 1
+            record = {"investigation": investigation, "kind": kind, "matched": matched,
+                      "served": entry is not None, "request_chars": request_chars,
+                      "object": entry.get("object") if entry else None}
+            self.log.append(record)
+
+        if entry is None:
+            logger.warning("fixtures: no recorded %s response for %s", kind, key[:12])
+            raise LookupError(f"no recorded {kind} response")
+        if self.scale:
+            time.sleep(entry.get("elapsed", 0.0) * self.scale)
+        if "error" in entry:
+            raise RuntimeError(entry["error"])
+        return self.load_json(entry["object"])
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+
+# Store every exchange goes through; None outside record/replay runs
+active = None
+
+
+def exchange(kind, request, send):
+    """Route one request through the active FixtureStore, if any."""
+    store = active
+    if store is None:
+        return send()
+    return store.exchange(kind, request, send)
+
+
+@contextmanager
+def investigation(investigator, args):
+    """FixtureStore.investigation() on the active store; no-op without one."""
+    store = active
+    if store is None:
+        yield None
+        return
+    with store.investigation(investigator, args) as investigation_id:
+        yield investigation_id
+
+
+def _message_request(message):
+    return {
+        "type": message.type,
+        "content": message.content,
+        "tool_calls": [
+            [call.get("name"), call.get("args")] for call in getattr(message, "tool_calls", None) or []
+        ],
+    }
+
+
+class FixtureChatModel(BaseChatModel):
+    """Chat model that records another model's responses, or replays them.
+
+    Args:
+        store: the FixtureStore
+        inner: the real chat model when recording; None when replaying
+    """
+
+    store: Any
+    inner: Any = None
+    tool_names: List[str] = []
+
+    @classmethod
+    def factory(cls, store, get_llm=None):
+        """llm_factory for AgentRuntime: wraps get_llm(llm_cfg) when recording."""
+        return lambda llm_cfg: cls(
+            store=store, inner=None if store.replay else get_llm(llm_cfg)
+        )
+
+    @property
+    def _llm_type(self):
+        return "fixture"
+
+    def bind_tools(self, tools, **kwargs):
+        inner = self.inner.bind_tools(tools, **kwargs) if self.inner is not None else None
+        names = [getattr(t, "name", str(t)) for t in tools]
+        return self.model_copy(update={"inner": inner, "tool_names": names})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        request = {"messages": [_message_request(m) for m in messages], "tools": self.tool_names}
+        response = self.store.exchange(
+            "llm", request, lambda: message_to_dict(self.inner.invoke(messages, stop=stop)),
+        )
+        message = messages_from_dict([response])[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def open_store(path, replay=False, scale=1.0):
+    """Create a FixtureStore and make it the active one."""
+    global active
+    active = FixtureStore(path, replay=replay, scale=scale)
+    return active
+
+
+def close_store():
+    """Close and deactivate the active FixtureStore."""
+    global active
+    store, active = active, None
+    if store is not None:
+        store.close()
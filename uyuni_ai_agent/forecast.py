@@ -0,0 +1,119 @@
+import logging
+import time
+import warnings
+
+import numpy as np
+
+from uyuni_ai_agent.anomaly_detector import AlertSeverity, ForecastAnomaly, format_duration
+
+logger = logging.getLogger(__name__)
+
+# Both forecast series are percentages of a hard limit
+CAPACITY = 100.0
+
+# Forecast rules: (snapshot field, forecast metric name, the threshold
+# metric it anticipates, description label, what happens at capacity,
+# mandatory investigation steps for prompts/capacity_forecast.md)
+FORECASTS = (
+    ("disk_percent", "disk_forecast", "disk", "Disk", "full", (
+        'CALL get_disk_usage with minion_id="{minion_id}" — confirm which partitions are growing.\n'
+        'CALL find_large_files with minion_id="{minion_id}" — find what is consuming the space.\n'
+        "If a log or a service's data directory is growing, CALL get_service_logs for that "
+        "service to understand why."
+    )),
+    ("postgres_active_connections_percent", "postgres_connections_forecast",
+     "postgres_connections", "PostgreSQL connections", "exhausted", (
+        'CALL get_postgres_connections with minion_id="{minion_id}" — see which database '
+        "and state the connections are accumulating in.\n"
+        'CALL get_postgres_active_queries with minion_id="{minion_id}" — look for '
+        "long-running queries or sessions that are never released.\n"
+        'If connections are piling up "idle in transaction", CALL get_postgres_locks '
+        'with minion_id="{minion_id}" to see what they hold.'
+    )),
+)
+
+FORECAST_STEPS = {metric_name: steps for _, metric_name, _, _, _, steps in FORECASTS}
+
+
+def fit_trends(times, values, min_samples):
+    """Theil-Sen trend for many series at once.
+
+    Args:
+        times: (n,) sample times in seconds
+        values: (series, n) array, NaN where a sample is missing
+        min_samples: series with fewer valid samples get NaN results
+
+    Returns:
+        (slope per second, fitted level at times[-1]) arrays of shape (series,).
+    """
+    i, j = np.triu_indices(len(times), 1)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+        # Series without enough samples produce all-NaN slices
+        warnings.simplefilter("ignore", RuntimeWarning)
+        # Median of every pairwise slope: one outlier (a rotated log, a
+        # restart) can't drag the trend the way it drags least squares
+        slope = np.nanmedian((values[:, j] - values[:, i]) / (times[j] - times[i]), axis=1)
+        level = np.nanmedian(values - slope[:, None] * (times - times[-1]), axis=1)
+    enough = (~np.isnan(values)).sum(axis=1) >= min_samples
+    return np.where(enough, slope, np.nan), np.where(enough, level, np.nan)
+
+
+def forecast_anomalies(store, cfg, active=(), now=None):
+    """Project disk and connection usage to exhaustion for the whole fleet.
+
+    Args:
+        store: the HistoryStore holding recent samples
+        cfg: ForecastSettings
+        active: (minion_id, metric_name) pairs already alerting on the
+            underlying metric; they are investigated anyway and skipped here
+
+    Returns:
+        list of ForecastAnomaly for series reaching capacity within
+        `warning_hours` (CRITICAL within `critical_hours`).
+    """
+    if store.values is None:
+        return []
+    began = time.perf_counter()
+    now = store.clock() if now is None else now
+    start, history = store.window(
+        now, fields=[rule[0] for rule in FORECASTS],
+        length=max(2, int(cfg.window_seconds // store.step)),
+    )
+    n = history.shape[2]
+    times = start + store.step * np.arange(n, dtype=np.float64)
+    values = history.astype(np.float64)
+    minions, rules = values.shape[:2]
+    slope, level = fit_trends(times, values.reshape(minions * rules, n), cfg.min_samples)
+    slope, level = slope.reshape(minions, rules), level.reshape(minions, rules)
+
+    rate = slope * 3600
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tte = (CAPACITY - level) / slope - (now - times[-1])
+        hits = np.argwhere(
+            (rate >= cfg.min_rate_per_hour) & (level < CAPACITY)
+            & (tte <= cfg.warning_hours * 3600)
+        )
+
+    active = set(active)
+    anomalies = []
+    for m, r in hits:
+        _, metric_name, watched, label, outcome, _ = FORECASTS[r]
+        minion_id = store.minion_ids[m]
+        if (minion_id, watched) in active:
+            continue
+        seconds = max(0.0, float(tte[m, r]))
+        current = float(level[m, r])
+        anomalies.append(ForecastAnomaly(
+            minion_id, metric_name, current, CAPACITY,
+            AlertSeverity.CRITICAL if seconds <= cfg.critical_hours * 3600
+            else AlertSeverity.WARNING,
+            f"{label} {outcome} in {format_duration(seconds)} "
+            f"(at {current:.1f}%, rising {rate[m, r]:.1f}%/h)",
+            time_to_exhaustion=seconds,
+            rate_per_hour=float(rate[m, r]),
+        ))
+    logger.debug(
+        "forecast: %d series fitted, %d heading for exhaustion in %.1fms",
+        minions * rules, len(anomalies), (time.perf_counter() - began) * 1000,
+    )
+    return anomalies
@@ -0,0 +1,264 @@
+import datetime
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from uyuni_ai_agent.anomaly_detector import RULES
+from uyuni_ai_agent.prometheus_client import get_fleet_range
+
+logger = logging.getLogger(__name__)
+
+# Axis 1 of the store, in RULES order
+FIELDS = tuple(rule[0] for rule in RULES)
+
+# Slot marker for "never written"
+EMPTY_SLOT = -1
+
+
+class HistoryStore:
+    """Fixed-size ring buffers of recent samples for every (minion, metric).
+
+    All series share one time grid of `samples` slots, `step` seconds
+    apart: the sample for time t lives in slot (t // step) % samples, and
+    a parallel slot array records which absolute step each slot holds, so
+    overwritten or skipped slots read as missing. Lookups are O(1) and
+    memory is exactly minions x metrics x samples float32 values.
+
+    The buffers are numpy memmaps on disk (`<path>`, `<path>.slots.npy`
+    and a `<path>.json` layout file), so a restart resumes from the
+    persisted history and only backfills the gap since the last write.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.path = None
+        self.step = 0
+        self.samples = 0
+        self.minion_ids = ()
+        self.index = {}
+        self.values = None
+        self.slots = None
+        self._needs_backfill = set()
+
+    # ── Layout and persistence ──
+
+    def _layout_path(self):
+        return self.path + ".json"
+
+    def _slots_path(self):
+        return self.path + ".slots.npy"
+
+    def _read_layout(self):
+        try:
+            with open(self._layout_path()) as f:
+                layout = json.load(f)
+            values = np.load(self.path, mmap_mode="r+")
+            slots = np.load(self._slots_path(), mmap_mode="r+")
+        except (OSError, ValueError) as e:
+            if os.path.exists(self._layout_path()):
+                logger.warning("history: ignoring unreadable store at %s: %s", self.path, e)
+            return None
+        if (
+            layout.get("fields") != list(FIELDS)
+            or layout.get("step") != self.step
+            or layout.get("samples") != self.samples
+            or values.shape != (len(layout.get("minions", [])), len(FIELDS), self.samples)
+        ):
+            logger.warning("history: store layout at %s changed, starting fresh", self.path)
+            return None
+        return layout["minions"], values, slots
+
+    def _create(self, minion_ids, previous=None):
+        """Write new memmaps for `minion_ids`, carrying over rows from `previous`."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        shape = (len(minion_ids), len(FIELDS), self.samples)
+        tmp = self.path + ".tmp.npy"
+        values = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=shape)
+        values[:] = np.nan
+        slots = np.full(self.samples, EMPTY_SLOT, dtype=np.int64)
+        kept = set()
+        if previous is not None:
+            old_ids, old_values, old_slots = previous
+            old_index = {minion_id: i for i, minion_id in enumerate(old_ids)}
+            slots[:] = old_slots
+            for i, minion_id in enumerate(minion_ids):
+                j = old_index.get(minion_id)
+                if j is not None:
+                    values[i] = old_values[j]
+                    kept.add(minion_id)
+        values.flush()
+        del values
+        os.replace(tmp, self.path)
+        np.save(self._slots_path(), slots)
+        with open(self._layout_path(), "w") as f:
+            json.dump({
+                "minions": list(minion_ids), "fields": list(FIELDS),
+                "step": self.step, "samples": self.samples,
+            }, f)
+        return set(minion_ids) - kept
+
+    def open(self, path, step, retention, minion_ids):
+        """Open (or create) the store for a minion list.
+
+        Minions new to the store are marked for backfill; so is everyone
+        if the store is new. Rows of minions no longer configured are dropped.
+        """
+        self.path, self.step = path, int(step)
+        self.samples = max(1, int(retention // step))
+        minion_ids = tuple(minion_ids)
+
+        existing = self._read_layout()
+        if existing is None or tuple(existing[0]) != minion_ids:
+            fresh = self._create(minion_ids, existing)
+            existing = self._read_layout()
+        else:
+            fresh = set()
+        self.minion_ids = minion_ids
+        self.index = {minion_id: i for i, minion_id in enumerate(minion_ids)}
+        _, self.values, self.slots = existing
+        self._needs_backfill = fresh
+        logger.info(
+            "history: %d series x %d samples (%.1f MB) at %s",
+            len(minion_ids) * len(FIELDS), self.samples, self.values.nbytes / 2 ** 20, path,
+        )
+
+    def flush(self):
+        if self.values is not None:
+            self.values.flush()
+            self.slots.flush()
+
+    # ── Writes ──
+
+    def _write_series(self, i, k, points):
+        """Write (timestamp, value) points for one series into their slots."""
+        samples = np.asarray(points, dtype=np.float64)
+        steps = (samples[:, 0] // self.step).astype(np.int64)
+        slots = steps % self.samples
+        # Slots being reused for a newer step are cleared for every series
+        newer = self.slots[slots] < steps
+        if newer.any():
+            self.values[:, :, slots[newer]] = np.nan
+            self.slots[slots[newer]] = steps[newer]
+        # Points older than what their slot now holds are dropped
+        ok = self.slots[slots] == steps
+        self.values[i, k, slots[ok]] = samples[ok, 1]
+
+    def record(self, snapshot):
+        """Write a MetricsSnapshot's values into the current slot."""
+        if self.values is None:
+            return
+        step_no = int(snapshot.timestamp // self.step)
+        slot = step_no % self.samples
+        if self.slots[slot] != step_no:
+            self.values[:, :, slot] = np.nan
+            self.slots[slot] = step_no
+        column = self.values[:, :, slot]
+        for record in snapshot:
+            i = self.index.get(record.minion_id)
+            if i is None:
+                continue
+            for k, field in enumerate(FIELDS):
+                value = getattr(record, field)
+                if value is not None:
+                    column[i, k] = value
+        self.flush()
+
+    def backfill(self, minions, executor=None, now=None):
+        """Fill history from Prometheus range queries, once.
+
+        Minions new to the store get the full retention window; the rest
+        only the gap since the newest persisted slot.
+        """
+        now = self.clock() if now is None else now
+        latest = int(self.slots.max()) if self.values is not None else EMPTY_SLOT
+        oldest = now - self.samples * self.step
+        by_start = {}
+        for minion in minions:
+            if minion.id not in self.index:
+                continue
+            if minion.id in self._needs_backfill or latest == EMPTY_SLOT:
+                start = oldest
+            else:
+                start = max(oldest, (latest + 1) * self.step)
+            if now - start >= self.step:
+                by_start.setdefault(start, []).append(minion)
+        self._needs_backfill = set()
+
+        for start, group in by_start.items():
+            logger.info(
+                "history: backfilling %d minions from %s",
+                len(group), datetime.datetime.fromtimestamp(start, datetime.timezone.utc),
+            )
+            fleet = get_fleet_range(
+                group,
+                datetime.datetime.fromtimestamp(start, datetime.timezone.utc),
+                datetime.datetime.fromtimestamp(now, datetime.timezone.utc),
+                self.step,
+                executor=executor,
+            )
+            for k, field in enumerate(FIELDS):
+                for minion_id, points in fleet.get(field, {}).items():
+                    if len(points):
+                        self._write_series(self.index[minion_id], k, points)
+        self.flush()
+
+    # ── Reads ──
+
+    def value_at(self, minion_id, field, timestamp):
+        """O(1) lookup of one sample; None if missing or overwritten."""
+        i = self.index.get(minion_id)
+        if i is None or self.values is None:
+            return None
+        step_no = int(timestamp // self.step)
+        slot = step_no % self.samples
+        if self.slots[slot] != step_no:
+            return None
+        value = self.values[i, FIELDS.index(field), slot]
+        return None if np.isnan(value) else float(value)
+
+    def window(self, now=None, fields=None, length=None):
+        """Return (start, history) for the most recent `length` slots ending at now.
+
+        history is a (minions, metrics, length) float32 array in
+        chronological order, NaN where a slot is missing or stale; start
+        is the timestamp of its first column. `fields` restricts the
+        metrics axis to those snapshot fields, in the given order.
+        Defaults cover every metric and the whole retention window.
+        """
+        now = self.clock() if now is None else now
+        length = self.samples if length is None else min(length, self.samples)
+        last = int(now // self.step)
+        steps = np.arange(last - length + 1, last + 1)
+        slots = steps % self.samples
+        values = self.values
+        if fields is not None:
+            values = values[:, [FIELDS.index(field) for field in fields]]
+        history = values[:, :, slots]
+        history[:, :, self.slots[slots] != steps] = np.nan
+        return float(steps[0] * self.step), history
+
+    def sync(self, cfg, minions, executor=None):
+        """(Re)open the store if the history settings or minion list changed,
+        backfilling whatever is missing. Cheap no-op otherwise.
+        """
+        minion_ids = tuple(minion.id for minion in minions)
+        if (
+            self.values is not None
+            and self.path == cfg.path
+            and self.step == cfg.step_seconds
+            and self.samples == max(1, cfg.retention_seconds // cfg.step_seconds)
+            and self.minion_ids == minion_ids
+        ):
+            return
+        self.open(cfg.path, cfg.step_seconds, cfg.retention_seconds, minion_ids)
+        try:
+            self.backfill(minions, executor=executor)
+        except Exception as e:
+            logger.error("history: backfill failed: %s", e, exc_info=True)
+
+
+# Shared instance; run_tick() syncs it from the `history` settings
+history_store = HistoryStore()
@@ -0,0 +1,228 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+
+from uyuni_ai_agent.alert_lifecycle import SEVERITY_ORDER
+
+logger = logging.getLogger(__name__)
+
+# Pseudo minion ID of incidents spanning several minions
+FLEET = "fleet"
+# Pseudo metric name of incidents grouping one minion's anomalies
+INCIDENT_METRIC = "incident"
+# Minion IDs named in a fleet incident's description
+DESCRIBED_MINIONS = 5
+
+
+def _urgency(anomaly):
+    """Sort key: severity, then how far past its threshold the value is."""
+    overshoot = anomaly.current_value / anomaly.threshold if anomaly.threshold else anomaly.current_value
+    return (SEVERITY_ORDER[anomaly.severity], overshoot)
+
+
+@dataclass
+class Incident:
+    """Correlated anomalies investigated together with one agent run.
+
+    Either several anomalies on one minion (minion_id is that minion,
+    metric_name is "incident"), or one symptom on several minions
+    (minion_id is "fleet", metric_name is the shared metric). Both keep
+    a stable (minion_id, metric_name) identity while the incident grows,
+    so the investigation queue coalesces it like a single anomaly.
+    """
+    minion_id: str
+    metric_name: str
+    anomalies: list
+    metrics: dict  # minion_id -> metrics dict
+    opened_at: float
+    updated_at: float = 0.0
+
+    @property
+    def key(self):
+        return (self.minion_id, self.metric_name)
+
+    @property
+    def fleet(self):
+        return self.minion_id == FLEET
+
+    @property
+    def severity(self):
+        return max((a.severity for a in self.anomalies), key=SEVERITY_ORDER.get)
+
+    @property
+    def minion_ids(self):
+        return list(dict.fromkeys(a.minion_id for a in self.anomalies))
+
+    @property
+    def ranked(self):
+        """Anomalies most urgent first: severity, then largest overshoot."""
+        return sorted(self.anomalies, key=_urgency, reverse=True)
+
+    @property
+    def lead(self):
+        """The anomaly the investigation is anchored on."""
+        return max(self.anomalies, key=_urgency)
+
+    @property
+    def description(self):
+        if self.fleet:
+            minion_ids = self.minion_ids
+            named = ", ".join(minion_ids[:DESCRIBED_MINIONS])
+            if len(minion_ids) > DESCRIBED_MINIONS:
+                named += f" and {len(minion_ids) - DESCRIBED_MINIONS} more"
+            return f"{self.metric_name} on {len(minion_ids)} minions: {named}"
+        metrics = ", ".join(a.metric_name for a in self.anomalies)
+        return f"{len(self.anomalies)} anomalies on {self.minion_id}: {metrics}"
+
+
+class Correlator:
+    """Groups the anomalies selected for investigation into incidents.
+
+    A metric alerting on `fleet_min_minions` or more minions becomes one
+    fleet incident: a shared symptom usually has a shared cause (a
+    database the hosts depend on, a fleet-wide job, a rollout). The
+    remaining anomalies are grouped per minion, since memory, CPU,
+    Apache workers and PostgreSQL connections saturating together on one
+    host are one problem, not four.
+
+    Incidents stay open for `window_seconds` after their last new member,
+    so anomalies that fire a tick or two apart still join the same
+    incident. An incident that gains members is handed out again with
+    all of them; if its previous investigation has not started yet the
+    queue coalesces the two. A per-minion incident whose members move
+    into a fleet incident is handed out as shrunk (or None once empty),
+    so a pending investigation of it can be revised or cancelled.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.incidents = {}  # incident key -> Incident
+        self._owner = {}     # (minion_id, metric_name) -> incident key
+        # Polling ticks and the webhook receiver may both feed it
+        self._lock = threading.Lock()
+
+    def _expire(self, now, cfg):
+        for key, incident in list(self.incidents.items()):
+            if now - incident.updated_at > cfg.window_seconds:
+                self._drop(key)
+
+    def _drop(self, key):
+        incident = self.incidents.pop(key, None)
+        if incident is not None:
+            for anomaly in incident.anomalies:
+                self._owner.pop((anomaly.minion_id, anomaly.metric_name), None)
+
+    def _add(self, key, anomaly, metrics, now):
+        member = (anomaly.minion_id, anomaly.metric_name)
+        owner = self._owner.get(member)
+        if owner is not None and owner != key:
+            # Moved into a fleet incident: no longer investigated on its own
+            self._remove(member)
+        incident = self.incidents.get(key)
+        if incident is None:
+            incident = Incident(key[0], key[1], [], {}, opened_at=now)
+            self.incidents[key] = incident
+        incident.anomalies = [
+            a for a in incident.anomalies if (a.minion_id, a.metric_name) != member
+        ] + [anomaly]
+        incident.metrics[anomaly.minion_id] = metrics
+        incident.updated_at = now
+        self._owner[member] = key
+        return incident
+
+    def _remove(self, member):
+        key = self._owner.pop(member, None)
+        incident = self.incidents.get(key)
+        if incident is None:
+            return
+        incident.anomalies = [
+            a for a in incident.anomalies if (a.minion_id, a.metric_name) != member
+        ]
+        if not incident.anomalies:
+            del self.incidents[key]
+
+    def resolve(self, minion_id, metric_name):
+        """Forget a resolved alert so it is not re-investigated with its incident."""
+        with self._lock:
+            self._remove((minion_id, metric_name))
+
+    def correlate(self, anomalies, metrics_by_minion, cfg, now=None):
+        """Fold one tick's anomalies-to-investigate into incidents.
+
+        Args:
+            anomalies: anomalies selected by the alert lifecycle
+            metrics_by_minion: minion_id -> metrics dict for the prompts
+            cfg: CorrelationSettings
+
+        Returns:
+            (incidents, shrunk): the incidents that gained members, to be
+            investigated, and a dict of incident key -> the per-minion
+            incidents that lost members to a fleet incident (None if none
+            are left), whose pending investigation should be revised.
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            return self._correlate(anomalies, metrics_by_minion, cfg, now)
+
+    def _correlate(self, anomalies, metrics_by_minion, cfg, now):
+        self._expire(now, cfg)
+
+        # Minions per metric, counting members of incidents still open, so
+        # a symptom spreading a tick at a time still forms a fleet incident
+        by_metric = {}
+        for anomaly in anomalies:
+            by_metric.setdefault(anomaly.metric_name, set()).add(anomaly.minion_id)
+        held = []  # (incident key, member) of per-minion incidents
+        for member, key in self._owner.items():
+            if member[1] in by_metric:
+                by_metric[member[1]].add(member[0])
+                if key[0] != FLEET:
+                    held.append((key, member))
+
+        touched = {}
+        shrunk = set()
+        # Earlier anomalies of a symptom that now spans the fleet move over
+        for key, member in held:
+            if len(by_metric[member[1]]) < cfg.fleet_min_minions:
+                continue
+            incident = self.incidents[key]
+            anomaly = next(
+                a for a in incident.anomalies if (a.minion_id, a.metric_name) == member
+            )
+            fleet_key = (FLEET, member[1])
+            shrunk.add(key)
+            touched[fleet_key] = self._add(
+                fleet_key, anomaly, incident.metrics.get(member[0], {}), now
+            )
+        for anomaly in anomalies:
+            if len(by_metric[anomaly.metric_name]) >= cfg.fleet_min_minions:
+                key = (FLEET, anomaly.metric_name)
+            else:
+                key = (anomaly.minion_id, INCIDENT_METRIC)
+            owner = self._owner.get((anomaly.minion_id, anomaly.metric_name))
+            if owner is not None and owner != key:
+                shrunk.add(owner)
+            touched[key] = self._add(
+                key, anomaly, metrics_by_minion.get(anomaly.minion_id, {}), now
+            )
+
+        # Copies, so a worker investigating one never sees it change
+        incidents = [
+            self._copy(i) for key, i in touched.items() if key in self.incidents
+        ]
+        if incidents:
+            logger.debug(
+                "correlation: %d anomalies -> %d incidents (%s)",
+                len(anomalies), len(incidents),
+                "; ".join(incident.description for incident in incidents),
+            )
+        shrunk = {
+            key: self._copy(self.incidents[key]) if key in self.incidents else None
+            for key in shrunk - set(touched)
+        }
+        return incidents, shrunk
+
+    @staticmethod
+    def _copy(incident):
+        return replace(incident, anomalies=list(incident.anomalies), metrics=dict(incident.metrics))
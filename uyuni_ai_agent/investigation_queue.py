@@ -0,0 +1,227 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, replace
+
+from uyuni_ai_agent.anomaly_detector import AlertSeverity
+
+logger = logging.getLogger(__name__)
+
+# Lower rank is investigated first
+SEVERITY_RANK = {
+    AlertSeverity.CRITICAL: 0,
+    AlertSeverity.WARNING: 1,
+    AlertSeverity.INFO: 2,
+}
+
+
+@dataclass
+class InvestigationJob:
+    """A pending investigation. Jobs for the same (minion, metric) coalesce."""
+    anomaly: object
+    metrics: dict
+    enqueued_at: float
+    seq: int
+    cancelled: bool = False
+
+    @property
+    def key(self):
+        return (self.anomaly.minion_id, self.anomaly.metric_name)
+
+    @property
+    def priority(self):
+        """Sort key: severity first, then age (older first)."""
+        return (SEVERITY_RANK.get(self.anomaly.severity, 99), self.enqueued_at, self.seq)
+
+
+@dataclass
+class QueueStats:
+    """Counters and gauges for the investigation queue."""
+    depth: int = 0
+    enqueued: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+    evicted: int = 0
+    completed: int = 0
+    failed: int = 0
+    in_flight: int = 0
+    last_wait: float = 0.0
+    max_wait: float = 0.0
+    total_wait: float = 0.0
+    depth_by_severity: dict = field(default_factory=dict)
+
+    @property
+    def avg_wait(self):
+        done = self.completed + self.failed
+        return self.total_wait / done if done else 0.0
+
+
+class InvestigationQueue:
+    """Bounded priority queue drained by a pool of investigation workers.
+
+    Detection submits anomalies and returns immediately; workers run the
+    slow LLM investigation and alerting in the background. When the queue
+    is full, a new anomaly evicts the lowest-priority pending job if it
+    outranks it, otherwise it is dropped. An anomaly for a (minion, metric)
+    that is already pending replaces the pending one's data instead of
+    adding a second job.
+
+    Args:
+        handler: callable(anomaly, metrics) run by the workers
+        max_size: maximum number of pending jobs
+        workers: number of worker threads
+    """
+
+    def __init__(self, handler, max_size=100, workers=2):
+        self.handler = handler
+        self.max_size = max_size
+        self.workers = workers
+        self._heap = []
+        self._pending = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._stats = QueueStats()
+
+    # ── Producer side ──
+
+    def submit(self, anomaly, metrics):
+        """Queue an anomaly for investigation.
+
+        Returns "queued", "coalesced", "evicted" (queued by evicting a
+        lower-priority job) or "dropped".
+        """
+        with self._cond:
+            key = (anomaly.minion_id, anomaly.metric_name)
+            existing = self._pending.get(key)
+            if existing is not None:
+                self._stats.coalesced += 1
+                if SEVERITY_RANK.get(anomaly.severity, 99) < existing.priority[0]:
+                    # Escalated: re-push with the new rank, keep the original age
+                    existing.cancelled = True
+                    self._push(anomaly, metrics, existing.enqueued_at)
+                else:
+                    existing.anomaly, existing.metrics = anomaly, metrics
+                return "coalesced"
+
+            status = "queued"
+            if len(self._pending) >= self.max_size:
+                victim = max(self._pending.values(), key=lambda job: job.priority)
+                if SEVERITY_RANK.get(anomaly.severity, 99) >= victim.priority[0]:
+                    self._stats.dropped += 1
+                    logger.warning(
+                        "Investigation queue full, dropping %s on %s [%s]",
+                        anomaly.metric_name, anomaly.minion_id, anomaly.severity.value,
+                    )
+                    return "dropped"
+                victim.cancelled = True
+                del self._pending[victim.key]
+                self._stats.evicted += 1
+                logger.warning(
+                    "Investigation queue full, evicted %s on %s [%s]",
+                    victim.anomaly.metric_name, victim.anomaly.minion_id,
+                    victim.anomaly.severity.value,
+                )
+                status = "evicted"
+
+            self._push(anomaly, metrics, time.monotonic())
+            self._stats.enqueued += 1
+            self._cond.notify()
+            return status
+
+    def revise(self, key, anomaly, metrics=None):
+        """Replace or cancel a pending job without queuing a new one.
+
+        The job pending for `key` gets the new anomaly and metrics, or is
+        cancelled if `anomaly` is None. Returns False if no job is pending
+        for `key` (it has already started or was never queued).
+        """
+        with self._cond:
+            existing = self._pending.get(key)
+            if existing is None:
+                return False
+            if anomaly is None:
+                existing.cancelled = True
+                del self._pending[key]
+            else:
+                existing.anomaly, existing.metrics = anomaly, metrics
+            return True
+
+    def _push(self, anomaly, metrics, enqueued_at):
+        job = InvestigationJob(anomaly, metrics, enqueued_at, next(self._seq))
+        self._pending[job.key] = job
+        heapq.heappush(self._heap, (job.priority, job))
+
+    # ── Worker side ──
+
+    def _next_job(self):
+        """Block until a job is available; None once stopping."""
+        with self._cond:
+            while True:
+                while self._heap:
+                    _, job = heapq.heappop(self._heap)
+                    if job.cancelled:
+                        continue
+                    del self._pending[job.key]
+                    self._stats.in_flight += 1
+                    return job
+                if self._stopping:
+                    return None
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            wait = time.monotonic() - job.enqueued_at
+            ok = True
+            try:
+                self.handler(job.anomaly, job.metrics)
+            except Exception as e:
+                ok = False
+                logger.error(
+                    "Investigation of %s on %s failed: %s",
+                    job.anomaly.metric_name, job.anomaly.minion_id, e, exc_info=True,
+                )
+            with self._cond:
+                stats = self._stats
+                stats.in_flight -= 1
+                stats.completed += ok
+                stats.failed += not ok
+                stats.last_wait = wait
+                stats.max_wait = max(stats.max_wait, wait)
+                stats.total_wait += wait
+
+    def start(self):
+        """Start the worker threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"investigate_{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Let workers finish pending jobs, then stop them."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self):
+        """Return a point-in-time copy of the queue counters."""
+        with self._cond:
+            depth_by_severity = {}
+            for job in self._pending.values():
+                severity = job.anomaly.severity.value
+                depth_by_severity[severity] = depth_by_severity.get(severity, 0) + 1
+            return replace(
+                self._stats,
+                depth=len(self._pending),
+                depth_by_severity=depth_by_severity,
+            )
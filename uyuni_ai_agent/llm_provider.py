@@ -1,16 +1,19 @@
 import os
-from uyuni_ai_agent.config import load_config
+from uyuni_ai_agent.config import get_settings
 
 
-def get_llm():
+def get_llm(llm_cfg=None):
     """Return a configured LangChain chat LLM based on settings.yaml.
     Supports: huggingface, google_genai, openai.
     API key is read from the LLM_API_KEY environment variable.
+
+    Pass an LLMSettings to build from a specific snapshot of the config.
     """
-    config = load_config()
-    provider = config["llm"]["provider"]
-    model = config["llm"]["model"]
-    api_key = config["llm"].get("api_key", os.environ.get("LLM_API_KEY", ""))
+    if llm_cfg is None:
+        llm_cfg = get_settings().llm
+    provider = llm_cfg.provider
+    model = llm_cfg.model
+    api_key = llm_cfg.api_key or os.environ.get("LLM_API_KEY", "")
 
     if provider == "huggingface":
         from langchain_huggingface import HuggingFaceEndpoint, ChatHuggingFace
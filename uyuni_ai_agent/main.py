@@ -1,129 +1,552 @@
 import logging
-import time
 import argparse
+import datetime
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from uyuni_ai_agent.config import load_config
+from uyuni_ai_agent.config import config_manager, get_settings
 from uyuni_ai_agent.logging_config import setup_logging
-from uyuni_ai_agent.prometheus_client import get_all_metrics
-from uyuni_ai_agent.anomaly_detector import check_all_metrics
-from uyuni_ai_agent.react_agent import investigate
-from uyuni_ai_agent.alert_manager import send_to_alertmanager
+from uyuni_ai_agent.prometheus_client import get_fleet_snapshot
+from uyuni_ai_agent.baseline import detect_anomalies
+from uyuni_ai_agent.history_store import history_store
+from uyuni_ai_agent.forecast import forecast_anomalies
+from uyuni_ai_agent.llm_provider import get_llm
+from uyuni_ai_agent.react_agent import agent_runtime, investigate, investigate_incident
+from uyuni_ai_agent.alert_manager import alert_sender, send_to_alertmanager
+from uyuni_ai_agent.agent_budget import PartialAnalysis
+from uyuni_ai_agent.analysis_cache import CachedAnalysis
+from uyuni_ai_agent.salt_api import salt_client
+from uyuni_ai_agent.scheduler import TickScheduler
+from uyuni_ai_agent.triage import TriageAnalysis
+from uyuni_ai_agent.investigation_queue import InvestigationQueue
+from uyuni_ai_agent.alert_lifecycle import AlertTracker
+from uyuni_ai_agent.incidents import Correlator, Incident
+from uyuni_ai_agent.webhook import WebhookReceiver
+from uyuni_ai_agent import fixtures, telemetry
 
 logger = logging.getLogger(__name__)
 
 
-def run(dry_run=False):
+def handle_anomaly(anomaly, metrics, dry_run=False):
+    """Investigate one anomaly and report it. Runs on an investigation worker."""
+    # Step 3: INTELLIGENCE
+    logger.debug("Step 3: running ReAct agent...")
+    analysis = run_investigation(investigate, anomaly, metrics)
+
+    # Step 4: ACTION
+    with telemetry.stage_seconds.time(stage="action"):
+        report_anomaly(
+            anomaly, analysis, dry_run,
+            getattr(analysis, "cached_at", None), getattr(analysis, "rule", None),
+        )
+
+
+def run_investigation(investigator, *args):
+    """Run one investigation, timing it and turning failures into the analysis text."""
+    started = time.perf_counter()
+    try:
+        with fixtures.investigation(investigator.__name__, args):
+            analysis = investigator(*args)
+        logger.info("Analysis:\n%s", analysis)
+        if isinstance(analysis, TriageAnalysis):
+            outcome = "triaged"
+        elif isinstance(analysis, CachedAnalysis):
+            outcome = "cached"
+        elif isinstance(analysis, PartialAnalysis):
+            outcome = "partial"
+        else:
+            outcome = "ok"
+        telemetry.investigations_total.inc(outcome=outcome)
+    except Exception as e:
+        logger.error("ReAct agent failed: %s", e, exc_info=True)
+        analysis = f"Agent error: {e}"
+        telemetry.investigations_total.inc(outcome="error")
+        telemetry.stage_errors.inc(stage="intelligence")
+    telemetry.stage_seconds.observe(time.perf_counter() - started, stage="intelligence")
+    return analysis
+
+
+def handle_incident(incident, dry_run=False):
+    """Investigate correlated anomalies once and report each of them.
+
+    Every anomaly keeps its own alert (so it resolves on its own), all
+    carrying the incident's shared analysis.
+    """
+    logger.debug("Step 3: running ReAct agent for incident: %s", incident.description)
+    analysis = run_investigation(investigate_incident, incident)
+    cached_at = getattr(analysis, "cached_at", None)
+    triage_rule = getattr(analysis, "rule", None)
+
+    if len(incident.anomalies) > 1:
+        analysis = f"Correlated incident: {incident.description}\n\n{analysis}"
+    with telemetry.stage_seconds.time(stage="action"):
+        for anomaly in incident.anomalies:
+            report_anomaly(anomaly, analysis, dry_run, cached_at, triage_rule)
+
+
+def handle_job(item, metrics, dry_run=False):
+    """Investigation queue handler: an Incident or a single Anomaly."""
+    if isinstance(item, Incident):
+        handle_incident(item, dry_run)
+    else:
+        handle_anomaly(item, metrics, dry_run)
+
+
+def report_anomaly(anomaly, analysis, dry_run=False, cached_at=None, triage_rule=None):
+    """Send one anomaly with its analysis to AlertManager.
+
+    `cached_at` (unix time) marks an analysis reused from the analysis
+    cache: the alert says so and carries an analysis_cached_at annotation.
+    `triage_rule` names the triage rule that wrote the analysis; it is
+    sent as a triage_rule annotation.
+    """
+    if cached_at is not None:
+        cached_at = datetime.datetime.fromtimestamp(cached_at, datetime.timezone.utc)
+        analysis = (
+            f"Cached analysis from {cached_at:%Y-%m-%d %H:%M} UTC: the evidence "
+            f"matches an earlier investigation.\n\n{analysis}"
+        )
+    if dry_run:
+        logger.info("[DRY RUN] Would send alert: %s", anomaly.description)
+        logger.info("[DRY RUN] Analysis: %s", analysis)
+    else:
+        logger.debug("Step 4: sending to AlertManager...")
+        summary = f"{anomaly.metric_name} issue on {anomaly.minion_id}"
+        result = send_to_alertmanager(
+            summary=summary,
+            description=analysis,
+            severity=anomaly.severity.value,
+            minion_id=anomaly.minion_id,
+            metric_name=anomaly.metric_name,
+            cached_at=cached_at,
+            triage_rule=triage_rule,
+        )
+        logger.info("AlertManager: %s", result)
+
+
+def resolve_alert(state, dry_run=False):
+    """Tell AlertManager that a previously reported alert has cleared."""
+    resolve_anomaly(
+        state.anomaly,
+        datetime.datetime.fromtimestamp(state.first_seen, datetime.timezone.utc),
+        dry_run,
+    )
+
+
+def resolve_anomaly(anomaly, starts_at=None, dry_run=False):
+    """Send the resolved form of an anomaly's alert (same labels, endsAt now)."""
+    logger.info(
+        "RESOLVED: %s on %s [%s]",
+        anomaly.metric_name, anomaly.minion_id, anomaly.severity.value,
+    )
+    if dry_run:
+        logger.info("[DRY RUN] Would resolve alert: %s", anomaly.description)
+        return
+    result = send_to_alertmanager(
+        summary=f"{anomaly.metric_name} issue on {anomaly.minion_id}",
+        description=f"Resolved: {anomaly.description}",
+        severity=anomaly.severity.value,
+        minion_id=anomaly.minion_id,
+        metric_name=anomaly.metric_name,
+        starts_at=starts_at,
+        ends_at=datetime.datetime.now(datetime.timezone.utc),
+    )
+    logger.info("AlertManager: %s", result)
+
+
+def process_minion(minion, record, anomalies, to_investigate, queue):
+    """Log one minion's metrics and queue its anomalies for investigation.
+
+    Only anomalies selected by the alert lifecycle (`to_investigate`) are
+    queued; the rest are pending or unchanged since the last notification.
+    """
+    minion_id = minion.id
+    logger.info("--- Checking %s (%s) ---", minion_id, minion.instance)
+    metrics = record.as_dict()
+
+    logger.info(
+        "Metrics: mem=%.1f%%, cpu=%.1f%%, disk=%.1f%%",
+        record.memory_percent,
+        record.cpu_percent,
+        record.disk_percent,
+    )
+    if record.apache_busy_workers_percent is not None:
+        logger.info(
+            "Apache: busy_workers=%.1f%%, req/s=%.1f",
+            record.apache_busy_workers_percent,
+            record.apache_requests_per_sec,
+        )
+    if record.postgres_active_connections_percent is not None:
+        logger.info(
+            "PostgreSQL: connections=%.1f%%, deadlocks/min=%.1f",
+            record.postgres_active_connections_percent,
+            record.postgres_deadlocks_per_min,
+        )
+
+    if not anomalies:
+        logger.info("All metrics within normal range.")
+        return []
+
+    for anomaly in anomalies:
+        logger.warning(
+            "ANOMALY: %s [%s]", anomaly.description, anomaly.severity.value
+        )
+    queued = []
+    for anomaly in to_investigate:
+        status = queue.submit(anomaly, metrics)
+        logger.debug("Investigation %s: %s", status, anomaly.description)
+        if status != "dropped":
+            queued.append(anomaly)
+    return queued
+
+
+def queue_investigations(anomalies, snapshot, queue, correlator):
+    """Queue anomalies for investigation, grouped into incidents when
+    correlation is enabled.
+
+    Returns:
+        the anomalies whose investigation the queue accepted.
+    """
+    settings = get_settings()
+    metrics_by_minion = {}
+    for minion_id in {a.minion_id for a in anomalies}:
+        record = snapshot.get(minion_id)
+        if record is not None:
+            metrics_by_minion[minion_id] = record.as_dict()
+
+    queued = []
+    if not settings.correlation.enabled:
+        for anomaly in anomalies:
+            status = queue.submit(anomaly, metrics_by_minion.get(anomaly.minion_id, {}))
+            logger.debug("Investigation %s: %s", status, anomaly.description)
+            if status != "dropped":
+                queued.append(anomaly)
+        return queued
+
+    incidents, shrunk = correlator.correlate(anomalies, metrics_by_minion, settings.correlation)
+    # Members moved into a fleet incident aren't investigated on their own too
+    for key, incident in shrunk.items():
+        metrics = incident.metrics if incident is not None else None
+        if queue.revise(key, incident, metrics):
+            logger.info(
+                "Incident %s: members on %s moved to a fleet incident",
+                "revised" if incident is not None else "withdrawn", key[0],
+            )
+    members = set()
+    for incident in incidents:
+        status = queue.submit(incident, incident.metrics)
+        logger.info("Incident %s: %s", status, incident.description)
+        if status != "dropped":
+            members.update((a.minion_id, a.metric_name) for a in incident.anomalies)
+    logger.info("Correlation: %d anomalies -> %d incidents", len(anomalies), len(incidents))
+    return [a for a in anomalies if (a.minion_id, a.metric_name) in members]
+
+
+def ingest_alerts(anomalies, queue, correlator):
+    """Queue anomalies pushed by the webhook receiver for investigation.
+
+    Alertmanager has already applied its own `for` durations and grouping,
+    so they skip detection and the alert lifecycle. Current metrics for
+    the prompts come from one batched Prometheus query.
+    """
+    ids = {a.minion_id for a in anomalies}
+    minions = [m for m in get_settings().minions if m.id in ids]
+    try:
+        with telemetry.stage_seconds.time(stage="ingest"):
+            snapshot = get_fleet_snapshot(minions)
+    except Exception as e:
+        logger.error("Prometheus query failed, investigating without metrics: %s", e)
+        telemetry.stage_errors.inc(stage="ingest")
+        snapshot = {}
+    for anomaly in anomalies:
+        telemetry.anomalies_total.inc(metric=anomaly.metric_name, severity=anomaly.severity.value)
+        logger.warning(
+            "ALERT: %s on %s [%s]", anomaly.description, anomaly.minion_id, anomaly.severity.value
+        )
+    queue_investigations(anomalies, snapshot, queue, correlator)
+
+
+def resolve_webhook_alert(anomaly, starts_at, correlator, dry_run=False):
+    """Resolve an alert Alertmanager reported as resolved.
+
+    Like a resolved polled alert, it also leaves its incident, so a later
+    report of the incident does not fire it again.
+    """
+    resolve_anomaly(anomaly, starts_at, dry_run)
+    correlator.resolve(anomaly.minion_id, anomaly.metric_name)
+
+
+def run_tick(executor, queue, tracker, correlator, dry_run=False):
+    """Run one polling iteration, fanning work out on the executor.
+
+    Anomalies pass through the alert lifecycle tracker, are grouped into
+    incidents by the correlator and then handed to the investigation
+    queue, so the tick never waits on the LLM.
+    """
+    settings = get_settings()
+
+    # Step 1: INGEST -- batched fleet queries, run concurrently
+    logger.debug("Step 1: querying Prometheus...")
+    try:
+        with telemetry.stage_seconds.time(stage="ingest"):
+            snapshot = get_fleet_snapshot(settings.minions, executor=executor)
+    except Exception as e:
+        logger.error("Prometheus query failed: %s", e, exc_info=True)
+        telemetry.stage_errors.inc(stage="ingest")
+        return
+
+    # Local history: opened (and backfilled from Prometheus) on first use
+    # or when the minion list changes; then fed with every snapshot
+    if settings.history.enabled:
+        try:
+            history_store.sync(settings.history, settings.minions, executor=executor)
+        except Exception as e:
+            logger.error("History store unavailable: %s", e, exc_info=True)
+
+    # Step 2: DETECT -- evaluate every rule against the same snapshot
+    logger.debug("Step 2: checking thresholds...")
+    detect_started = time.perf_counter()
+    try:
+        anomalies = detect_anomalies(snapshot, settings)
+        logger.debug("Found %d anomalies", len(anomalies))
+    except Exception as e:
+        logger.error("Anomaly detection failed: %s", e, exc_info=True)
+        telemetry.stage_errors.inc(stage="detect")
+        return
+
+    # Recorded after scoring, so a spike isn't part of its own baseline
+    if settings.history.enabled and history_store.values is not None:
+        try:
+            history_store.record(snapshot)
+        except Exception as e:
+            logger.error("Recording history failed: %s", e, exc_info=True)
+
+    # Forecast disk/connection exhaustion from the history just recorded
+    if settings.forecast.enabled and history_store.values is not None:
+        try:
+            anomalies += forecast_anomalies(
+                history_store, settings.forecast,
+                active={(a.minion_id, a.metric_name) for a in anomalies},
+            )
+        except Exception as e:
+            logger.error("Forecasting failed: %s", e, exc_info=True)
+
+    # Fingerprint, for: durations, hysteresis and re-notify suppression
+    lifecycle = tracker.update(
+        anomalies, snapshot, settings.alerting,
+        minion_ids={minion.id for minion in settings.minions},
+    )
+    telemetry.stage_seconds.observe(time.perf_counter() - detect_started, stage="detect")
+    for anomaly in lifecycle.investigate:
+        telemetry.anomalies_total.inc(metric=anomaly.metric_name, severity=anomaly.severity.value)
+    for state in lifecycle.resolved:
+        resolve_alert(state, dry_run)
+        correlator.resolve(state.anomaly.minion_id, state.anomaly.metric_name)
+    if lifecycle.resolved:
+        alert_sender.flush_soon()
+
+    anomalies_by_minion = {}
+    for anomaly in anomalies:
+        anomalies_by_minion.setdefault(anomaly.minion_id, []).append(anomaly)
+    # With correlation on, anomalies are queued below as incidents instead
+    correlate = settings.correlation.enabled
+    investigate_by_minion = {}
+    for anomaly in [] if correlate else lifecycle.investigate:
+        investigate_by_minion.setdefault(anomaly.minion_id, []).append(anomaly)
+    logger.info(
+        "Alerts: %d to investigate, %d pending, %d unchanged, %d resolved",
+        len(lifecycle.investigate), lifecycle.pending,
+        lifecycle.suppressed, len(lifecycle.resolved),
+    )
+
+    # Log and enqueue per minion; steps 3-4 run on the investigation workers
+    futures = {}
+    for minion in settings.minions:
+        record = snapshot.get(minion.id)
+        if record is None:
+            logger.warning("No metrics collected for %s, skipping", minion.id)
+            continue
+        future = executor.submit(
+            process_minion, minion, record,
+            anomalies_by_minion.get(minion.id, []),
+            investigate_by_minion.get(minion.id, []), queue,
+        )
+        futures[future] = minion.id
+
+    queued = []
+    for future in as_completed(futures):
+        try:
+            queued += future.result()
+        except Exception as e:
+            logger.error("Processing %s failed: %s", futures[future], e, exc_info=True)
+
+    # One investigation per incident rather than per anomaly
+    if correlate and lifecycle.investigate:
+        queued += queue_investigations(lifecycle.investigate, snapshot, queue, correlator)
+    # Re-notify suppression starts only once an investigation is queued;
+    # a dropped one is selected again on the next tick
+    for anomaly in queued:
+        tracker.mark_notified(anomaly)
+
+    stats = queue.stats()
+    logger.info(
+        "Investigation queue: depth=%d %s, in_flight=%d, dropped=%d, "
+        "coalesced=%d, wait avg=%.1fs max=%.1fs",
+        stats.depth, stats.depth_by_severity, stats.in_flight, stats.dropped + stats.evicted,
+        stats.coalesced, stats.avg_wait, stats.max_wait,
+    )
+    cache = salt_client.cache.stats()
+    logger.info(
+        "Salt cache: hits=%d, misses=%d, coalesced=%d, evictions=%d, size=%d",
+        cache.hits, cache.misses, cache.coalesced, cache.evictions, cache.size,
+    )
+    logger.info(
+        "AlertManager: buffered=%d, sent=%d, spilled=%d, dropped=%d",
+        alert_sender.pending(), alert_sender.sent, alert_sender.spilled, alert_sender.dropped,
+    )
+
+
+def run(dry_run=False, max_ticks=None, mode="poll", record=None):
     """Main polling loop that executes all 4 steps each iteration:
     1. INGEST  -- query Prometheus for metrics
     2. DETECT  -- check thresholds for anomalies
     3. INTELLIGENCE -- ReAct agent investigates via Salt + LLM
     4. ACTION  -- push enriched alert to AlertManager
+
+    Ticks fire on fixed wall-clock boundaries of `polling.interval_seconds`;
+    work inside a tick runs on a thread pool capped at
+    `polling.max_concurrency`. Steps 3-4 run on a separate pool of
+    investigation workers fed by a bounded priority queue, so detection
+    keeps its cadence however slow the LLM is.
+
+    `mode` selects the ingest: "poll" (the loop above), "webhook" (an
+    HTTP receiver for Alertmanager notifications replaces steps 1-2) or
+    "both".
+
+    With `record` (a directory), every Prometheus response, Salt lowstate
+    exchange and LLM exchange is stored there for benchmarks/replay.py.
     """
-    logger.debug("run() called, dry_run=%s", dry_run)
+    logger.debug("run() called, dry_run=%s, mode=%s", dry_run, mode)
 
     try:
-        config = load_config()
+        settings = get_settings()
         logger.debug("config loaded successfully")
-        logger.debug("config keys: %s", list(config.keys()))
     except Exception as e:
         logger.error("Failed to load config: %s", e, exc_info=True)
         return
 
-    interval = config["polling"]["interval_seconds"]
+    config_manager.install_sighup_handler()
+
+    if record:
+        store = fixtures.open_store(record)
+        agent_runtime.llm_factory = fixtures.FixtureChatModel.factory(store, get_llm)
+        agent_runtime.reset()
+        logger.info("Recording Prometheus, Salt and LLM exchanges to %s", record)
 
-    logger.info("AI Monitoring Agent started. Polling every %ds.", interval)
+    if mode != "webhook":
+        logger.info(
+            "AI Monitoring Agent started. Polling every %ds, concurrency %d.",
+            settings.polling.interval_seconds, settings.polling.max_concurrency,
+        )
+    else:
+        logger.info("AI Monitoring Agent started in webhook mode.")
     if dry_run:
         logger.info("DRY RUN mode: alerts will be printed, not sent.")
 
-    while True:
-        for minion in config["minions"]:
-            instance = minion["instance"]
-            minion_id = minion["id"]
-            apache_instance = minion.get("apache_instance")
-            postgres_instance = minion.get("postgres_instance")
-
-            logger.info("--- Checking %s (%s) ---", minion_id, instance)
-
-            # Step 1: INGEST
-            logger.debug("Step 1: querying Prometheus...")
-            try:
-                metrics = get_all_metrics(
-                    instance,
-                    apache_instance=apache_instance,
-                    postgres_instance=postgres_instance,
-                )
-                logger.info(
-                    "Metrics: mem=%.1f%%, cpu=%.1f%%, disk=%.1f%%",
-                    metrics['memory_percent'],
-                    metrics['cpu_percent'],
-                    metrics['disk_percent'],
-                )
-                if apache_instance:
-                    logger.info(
-                        "Apache: busy_workers=%.1f%%, req/s=%.1f",
-                        metrics.get('apache_busy_workers_percent', 0),
-                        metrics.get('apache_requests_per_sec', 0),
-                    )
-                if postgres_instance:
-                    logger.info(
-                        "PostgreSQL: connections=%.1f%%, deadlocks/min=%.1f",
-                        metrics.get('postgres_active_connections_percent', 0),
-                        metrics.get('postgres_deadlocks_per_min', 0),
-                    )
-            except Exception as e:
-                logger.error("Prometheus query failed: %s", e, exc_info=True)
-                continue
-
-            # Step 2: DETECT
-            logger.debug("Step 2: checking thresholds...")
-            try:
-                anomalies = check_all_metrics(
-                    instance, minion_id,
-                    apache_instance=apache_instance,
-                    postgres_instance=postgres_instance,
-                )
-                logger.debug("Found %d anomalies", len(anomalies))
-            except Exception as e:
-                logger.error("Anomaly detection failed: %s", e, exc_info=True)
-                continue
-
-            if not anomalies:
-                logger.info("All metrics within normal range.")
-                continue
-
-            for anomaly in anomalies:
-                logger.warning(
-                    "ANOMALY: %s [%s]", anomaly.description, anomaly.severity.value
-                )
-
-                # Step 3: INTELLIGENCE
-                logger.debug("Step 3: running ReAct agent...")
-                try:
-                    analysis = investigate(anomaly, metrics)
-                    logger.info("Analysis:\n%s", analysis)
-                except Exception as e:
-                    logger.error("ReAct agent failed: %s", e, exc_info=True)
-                    analysis = f"Agent error: {e}"
-
-                # Step 4: ACTION
-                if dry_run:
-                    logger.info("[DRY RUN] Would send alert: %s", anomaly.description)
-                    logger.info("[DRY RUN] Analysis: %s", analysis)
-                else:
-                    logger.debug("Step 4: sending to AlertManager...")
-                    summary = f"{anomaly.metric_name} issue on {anomaly.minion_id}"
-                    result = send_to_alertmanager(
-                        summary=summary,
-                        description=analysis,
-                        severity=anomaly.severity.value,
-                        minion_id=anomaly.minion_id,
-                        metric_name=anomaly.metric_name,
-                    )
-                    logger.info("AlertManager: %s", result)
-
-        logger.info("Sleeping %ds...", interval)
-        time.sleep(interval)
+    queue = InvestigationQueue(
+        lambda item, metrics: handle_job(item, metrics, dry_run),
+        max_size=settings.investigation.max_queue_size,
+        workers=settings.investigation.workers,
+    )
+    queue.start()
+    if not dry_run:
+        # Alerts from investigation workers are batched and sent in the background
+        alert_sender.start()
+    tracker = AlertTracker()
+    correlator = Correlator()
+    pool = {"size": None, "executor": None}
+
+    def tick():
+        # Pick up settings.yaml edits (or SIGHUP) once per tick; everything
+        # downstream reads the cached settings without touching the file.
+        config_manager.refresh()
+
+        # Resize the pool if polling.max_concurrency was changed on reload
+        size = get_settings().polling.max_concurrency
+        if pool["size"] != size:
+            if pool["executor"] is not None:
+                pool["executor"].shutdown(wait=False)
+            pool["executor"] = ThreadPoolExecutor(
+                max_workers=size, thread_name_prefix="poll"
+            )
+            pool["size"] = size
+        with telemetry.tick_seconds.time():
+            run_tick(pool["executor"], queue, tracker, correlator, dry_run=dry_run)
+
+    receiver = None
+    if mode in ("webhook", "both"):
+        receiver = WebhookReceiver(
+            lambda anomalies: ingest_alerts(anomalies, queue, correlator),
+            lambda anomaly, starts_at: resolve_webhook_alert(
+                anomaly, starts_at, correlator, dry_run
+            ),
+        )
+
+    scheduler = TickScheduler(lambda: get_settings().polling.interval_seconds)
+
+    def collect():
+        # Mirror component state into the /metrics registry at scrape time
+        stats = queue.stats()
+        for severity in ("critical", "warning", "info"):
+            telemetry.queue_depth.set(stats.depth_by_severity.get(severity, 0), severity=severity)
+        telemetry.queue_in_flight.set(stats.in_flight)
+        telemetry.queue_wait_max.set(stats.max_wait)
+        for event in ("enqueued", "coalesced", "dropped", "evicted", "completed", "failed"):
+            telemetry.queue_jobs.set_total(getattr(stats, event), event=event)
+        cache = salt_client.cache.stats()
+        for outcome in ("hits", "misses", "coalesced", "evictions"):
+            telemetry.salt_cache.set_total(getattr(cache, outcome), outcome=outcome)
+        telemetry.salt_jobs_pending.set(salt_client.jobs.pending())
+        for outcome in ("sent", "spilled", "dropped"):
+            telemetry.alerts_total.set_total(getattr(alert_sender, outcome), outcome=outcome)
+        telemetry.alerts_buffered.set(alert_sender.pending())
+        telemetry.ticks_total.set_total(scheduler.stats.ticks)
+        telemetry.ticks_skipped.set_total(scheduler.stats.skipped)
+        telemetry.tick_lag.set(scheduler.stats.last_lag)
+
+    telemetry.registry.on_collect(collect)
+    metrics_server = None
+    if settings.telemetry.enabled:
+        metrics_server = telemetry.TelemetryServer()
+        try:
+            metrics_server.start(settings.telemetry.host, settings.telemetry.port)
+        except OSError as e:
+            logger.error("telemetry: cannot listen on port %d: %s", settings.telemetry.port, e)
+            metrics_server = None
+
+    try:
+        if receiver is not None:
+            receiver.start()
+        if mode == "webhook":
+            receiver.wait()
+        else:
+            scheduler.run(tick, max_ticks=max_ticks)
+    finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+        telemetry.registry.remove_collector(collect)
+        if receiver is not None:
+            receiver.stop()
+        if pool["executor"] is not None:
+            pool["executor"].shutdown(wait=True)
+        queue.stop()
+        if not dry_run:
+            alert_sender.stop()
+        salt_client.jobs.stop()
+        if record:
+            fixtures.close_store()
+    return scheduler.stats
 
 
 if __name__ == "__main__":
@@ -132,8 +555,7 @@ if __name__ == "__main__":
     setup_logging(level=default_level)
 
     try:
-        config = load_config()
-        config_level = config.get("logging", {}).get("level", None)
+        config_level = get_settings().log_level
         if config_level and config_level.upper() != default_level.upper():
             setup_logging(level=config_level)
             logger.debug("Reconfigured logging to %s from settings.yaml", config_level)
@@ -149,9 +571,20 @@ if __name__ == "__main__":
         action="store_true",
         help="Print alerts instead of sending to AlertManager"
     )
+    parser.add_argument(
+        "--mode",
+        choices=("poll", "webhook", "both"),
+        default="poll",
+        help="Ingest by polling Prometheus, by receiving Alertmanager webhooks, or both"
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="Record Prometheus, Salt and LLM exchanges into DIR for offline replay"
+    )
     args = parser.parse_args()
-    logger.debug("args parsed: dry_run=%s", args.dry_run)
+    logger.debug("args parsed: dry_run=%s, mode=%s", args.dry_run, args.mode)
     try:
-        run(dry_run=args.dry_run)
+        run(dry_run=args.dry_run, mode=args.mode, record=args.record)
     except Exception as e:
         logger.critical("Unhandled exception", exc_info=True)
@@ -0,0 +1,80 @@
+import time
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+
+@dataclass(frozen=True, slots=True)
+class MinionMetrics:
+    """Immutable metrics record for one minion at one point in time.
+
+    Node exporter metrics are always present. Apache and PostgreSQL
+    metrics are None when the minion has no such exporter configured.
+    """
+    minion_id: str
+    instance: str
+    memory_percent: float = 0.0
+    cpu_percent: float = 0.0
+    disk_percent: float = 0.0
+    apache_busy_workers_percent: Optional[float] = None
+    apache_requests_per_sec: Optional[float] = None
+    postgres_active_connections_percent: Optional[float] = None
+    postgres_deadlocks_per_min: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, minion_id, instance, metrics):
+        """Build a record from a get_all_metrics()-style dict."""
+        values = {
+            f.name: float(metrics[f.name])
+            for f in fields(cls)
+            if f.name in metrics
+        }
+        return cls(minion_id=minion_id, instance=instance, **values)
+
+    def as_dict(self):
+        """Return the metrics as a plain dict, omitting absent exporters.
+
+        Same shape as get_all_metrics(), used for logging and prompts.
+        """
+        return {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if f.name not in ("minion_id", "instance")
+            and getattr(self, f.name) is not None
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class MetricsSnapshot:
+    """Immutable view of the whole fleet's metrics for a single tick.
+
+    Detection, logging and investigation all read from the same snapshot,
+    so the values that get thresholded are the values that get reported.
+    """
+    minions: Mapping[str, MinionMetrics]
+    timestamp: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_fleet_metrics(cls, minions, fleet_metrics, timestamp=None):
+        """Build a snapshot from MinionSettings and get_fleet_metrics() output."""
+        records = {}
+        for minion in minions:
+            metrics = fleet_metrics.get(minion.id)
+            if metrics is None:
+                continue
+            records[minion.id] = MinionMetrics.from_dict(
+                minion.id, minion.instance, metrics
+            )
+        return cls(
+            minions=MappingProxyType(records),
+            timestamp=time.time() if timestamp is None else timestamp,
+        )
+
+    def get(self, minion_id):
+        return self.minions.get(minion_id)
+
+    def __iter__(self):
+        return iter(self.minions.values())
+
+    def __len__(self):
+        return len(self.minions)
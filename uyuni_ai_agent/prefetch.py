@@ -0,0 +1,113 @@
+import logging
+import re
+
+from uyuni_ai_agent.salt_api import salt_client
+from uyuni_ai_agent.telemetry import tool_calls
+from uyuni_ai_agent.tools.compaction import compact_output
+from uyuni_ai_agent.tools.process_tools import top_memory_command, top_cpu_command
+from uyuni_ai_agent.tools.disk_tools import large_files_command
+from uyuni_ai_agent.tools.network_tools import LISTENING_PORTS_COMMAND
+from uyuni_ai_agent.tools.apache_tools import (
+    APACHE_STATUS_COMMAND, APACHE_CONFIG_CHECK_COMMAND,
+    apache_error_log_command, apache_access_log_command,
+)
+from uyuni_ai_agent.tools.postgres_tools import (
+    ACTIVE_QUERIES_SQL, LOCKS_SQL, CONNECTIONS_SQL,
+    psql_command, postgres_log_command,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tools that only need a minion_id, mapped to the Salt (fun, arg) they run
+# with their default arguments. Tools needing more input (a service name,
+# a ping target) are left to the agent.
+PREFETCHABLE_TOOLS = {
+    "get_top_memory_processes": ("cmd.run", [top_memory_command()]),
+    "get_top_cpu_processes": ("cmd.run", [top_cpu_command()]),
+    "get_disk_usage": ("disk.usage", None),
+    "find_large_files": ("cmd.run", [large_files_command()]),
+    "get_listening_ports": ("cmd.run", [LISTENING_PORTS_COMMAND]),
+    "get_apache_status": ("cmd.run", [APACHE_STATUS_COMMAND]),
+    "get_apache_error_log": ("cmd.run", [apache_error_log_command()]),
+    "get_apache_access_log": ("cmd.run", [apache_access_log_command()]),
+    "get_apache_config_check": ("cmd.run", [APACHE_CONFIG_CHECK_COMMAND]),
+    "get_postgres_active_queries": ("cmd.run", [psql_command(ACTIVE_QUERIES_SQL)]),
+    "get_postgres_locks": ("cmd.run", [psql_command(LOCKS_SQL)]),
+    "get_postgres_connections": ("cmd.run", [psql_command(CONNECTIONS_SQL)]),
+    "get_postgres_log": ("cmd.run", [postgres_log_command()]),
+}
+
+# Unconditional steps in prompts/*.md start with "CALL <tool> with ...";
+# conditional ones start with "If" or "Then" and are left to the agent.
+_MANDATORY_CALL = re.compile(r"^CALL (\w+) with minion_id=", re.MULTILINE)
+
+
+def mandatory_tool_calls(template):
+    """Return the prefetchable mandatory tool names listed in a scenario prompt."""
+    names = []
+    for name in _MANDATORY_CALL.findall(template):
+        if name in PREFETCHABLE_TOOLS and name not in names:
+            names.append(name)
+    return names
+
+
+def prefetch_evidence(minion_id, tool_names):
+    """Run the given tools' Salt commands on a minion in one POST.
+
+    Returns a list of (tool_name, output) pairs in the same order, with
+    each output compacted the same way the tool itself would.
+    """
+    if not tool_names:
+        return []
+    calls = [PREFETCHABLE_TOOLS[name] for name in tool_names]
+    logger.debug("prefetching %s on %s", tool_names, minion_id)
+    results = salt_client.call_many(minion_id, calls)
+    for name in tool_names:
+        tool_calls.inc(tool=name, source="prefetch")
+    return [
+        (name, compact_output(name, result))
+        for name, result in zip(tool_names, results)
+    ]
+
+
+def prefetch_fleet_evidence(minion_ids, tool_names):
+    """Run the given tools on many minions with a single list-targeted POST.
+
+    Returns a dict of minion_id -> list of (tool_name, output) pairs.
+    """
+    minion_ids = list(minion_ids)
+    if not tool_names or not minion_ids:
+        return {minion_id: [] for minion_id in minion_ids}
+    calls = [PREFETCHABLE_TOOLS[name] for name in tool_names]
+    logger.debug("prefetching %s on %d minions", tool_names, len(minion_ids))
+    per_call = salt_client.sweep(minion_ids, calls)
+    for name in tool_names:
+        tool_calls.inc(len(minion_ids), tool=name, source="prefetch")
+    evidence = {minion_id: [] for minion_id in minion_ids}
+    for name, results in zip(tool_names, per_call):
+        for minion_id in minion_ids:
+            result = results.get(minion_id, "")
+            evidence[minion_id].append((name, compact_output(name, result)))
+    return evidence
+
+
+def format_evidence(minion_id, evidence):
+    """Render prefetched outputs as a prompt section."""
+    return format_fleet_evidence({minion_id: evidence})
+
+
+def format_fleet_evidence(evidence_by_minion):
+    """Render prefetched outputs from one or more minions as a prompt section."""
+    minion_ids = ", ".join(evidence_by_minion)
+    parts = [
+        "## Prefetched Evidence",
+        "",
+        "The mandatory tool calls above were already run on "
+        f'{minion_ids} and their outputs are below. Do not call them again; '
+        "start your analysis from this evidence and call further tools only "
+        "if it is not enough.",
+    ]
+    for minion_id, evidence in evidence_by_minion.items():
+        for name, output in evidence:
+            parts += ["", f'### {name}(minion_id="{minion_id}")', "```", output.strip(), "```"]
+    return "\n".join(parts)
@@ -1,37 +1,63 @@
 import logging
+import math
+import re
+import time
 import requests
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 
-from uyuni_ai_agent.config import load_config
+from uyuni_ai_agent import fixtures
+from uyuni_ai_agent.config import get_settings
+from uyuni_ai_agent.metrics_snapshot import MetricsSnapshot
+from uyuni_ai_agent.telemetry import promql_errors, promql_seconds
 
 logger = logging.getLogger(__name__)
 
 
-def query_prometheus(prom_ql):
-    """Execute an instant PromQL query and return the results."""
-    config = load_config()
-    URL = f"{config['prometheus']['url']}/api/v1/query"
-    logger.debug("querying prometheus: %s query=%s", URL, prom_ql[:80])
+def _fetch(URL, params):
+    response = requests.get(URL, params=params, timeout=10)
+    if response.status_code == 200:
+        return response.json()['data']['result']
+    return f"Error: {response.status_code} - {response.text}"
 
-    params = {
-        'query': prom_ql
-    }
 
+def _get_result(URL, params, name, kind):
+    """GET a Prometheus query endpoint, recording its latency and failures."""
+    # Fixtures match on the query alone; the window moves with the clock
+    request = {
+        "path": urlsplit(URL).path,
+        "params": {k: v for k, v in params.items() if k not in fixtures.VOLATILE_PARAMS},
+    }
+    started = time.perf_counter()
     try:
-        response = requests.get(URL, params=params, timeout=10)
-        if response.status_code == 200:
-            results = response.json()['data']['result']
-            return results
-        else:
-            return f"Error: {response.status_code} - {response.text}"
+        result = fixtures.exchange("prometheus", request, lambda: _fetch(URL, params))
     except Exception as e:
+        promql_errors.inc(query=name, kind=kind)
         return f"Connection Failed: {str(e)}"
+    finally:
+        promql_seconds.observe(time.perf_counter() - started, query=name, kind=kind)
+    if not isinstance(result, list):
+        promql_errors.inc(query=name, kind=kind)
+    return result
+
+
+def query_prometheus(prom_ql, name="adhoc"):
+    """Execute an instant PromQL query and return the results.
+
+    `name` labels the query in the agent's own metrics.
+    """
+    URL = f"{get_settings().prometheus.url}/api/v1/query"
+    logger.debug("querying prometheus: %s query=%s", URL, prom_ql[:80])
+
+    params = {
+        'query': prom_ql
+    }
+    return _get_result(URL, params, name, "instant")
 
 
-def query_prometheus_range(prom_ql, start, end, step="1m"):
+def query_prometheus_range(prom_ql, start, end, step="1m", name="adhoc"):
     """Execute a range PromQL query over a time window."""
-    config = load_config()
-    URL = f"{config['prometheus']['url']}/api/v1/query_range"
+    URL = f"{get_settings().prometheus.url}/api/v1/query_range"
 
     params = {
         'query': prom_ql,
@@ -39,15 +65,7 @@ def query_prometheus_range(prom_ql, start, end, step="1m"):
         'end': end.isoformat(),
         'step': step
     }
-
-    try:
-        response = requests.get(URL, params=params, timeout=10)
-        if response.status_code == 200:
-            return response.json()['data']['result']
-        else:
-            return f"Error: {response.status_code} - {response.text}"
-    except Exception as e:
-        return f"Connection Failed: {str(e)}"
+    return _get_result(URL, params, name, "range")
 
 
 # ── Node Exporter Metrics ──
@@ -198,3 +216,232 @@ def get_all_metrics(instance, apache_instance=None, postgres_instance=None):
         metrics["postgres_deadlocks_per_min"] = get_postgres_deadlocks_per_min(postgres_instance)
 
     return metrics
+
+
+# ── Fleet-wide Batched Metrics ──
+
+# Upper bound for the `instance=~"..."` alternation in a single query.
+# Queries go out as GET parameters and some templates repeat the matcher,
+# so after URL-encoding this keeps the request line well below the 8KB
+# limit enforced by Prometheus and most reverse proxies.
+MAX_INSTANCE_MATCHER_LENGTH = 1500
+
+# metric name -> (minion config key holding the exporter instance, PromQL).
+# "$instances" is replaced by a regex alternation of every instance in the
+# chunk; every query aggregates `by (instance)` so the result vector holds
+# one sample per exporter that can be mapped back to its minion.
+FLEET_QUERIES = {
+    "memory_percent": (
+        "instance",
+        '100 - (sum by (instance) (node_memory_MemAvailable_bytes{instance=~"$instances"}) '
+        '/ sum by (instance) (node_memory_MemTotal_bytes{instance=~"$instances"}) * 100)',
+    ),
+    "cpu_percent": (
+        "instance",
+        '100 - (avg by (instance) (irate(node_cpu_seconds_total'
+        '{instance=~"$instances",mode="idle"}[5m])) * 100)',
+    ),
+    "disk_percent": (
+        "instance",
+        '100 - (sum by (instance) (node_filesystem_avail_bytes'
+        '{instance=~"$instances",mountpoint="/"}) '
+        '/ sum by (instance) (node_filesystem_size_bytes'
+        '{instance=~"$instances",mountpoint="/"}) * 100)',
+    ),
+    "apache_busy_workers_percent": (
+        "apache_instance",
+        'sum by (instance) (apache_workers{instance=~"$instances",state="busy"}) '
+        '/ sum by (instance) (apache_workers{instance=~"$instances",state=~"busy|idle"}) * 100',
+    ),
+    "apache_requests_per_sec": (
+        "apache_instance",
+        'sum by (instance) (rate(apache_accesses_total{instance=~"$instances"}[5m]))',
+    ),
+    "postgres_active_connections_percent": (
+        "postgres_instance",
+        'sum by (instance) (pg_stat_database_numbackends{instance=~"$instances"}) '
+        '/ max by (instance) (pg_settings_max_connections{instance=~"$instances"}) * 100',
+    ),
+    "postgres_deadlocks_per_min": (
+        "postgres_instance",
+        'sum by (instance) (rate(pg_stat_database_deadlocks{instance=~"$instances"}[5m])) * 60',
+    ),
+}
+
+
+def _instance_matcher(instances):
+    """Build the regex alternation for an `instance=~` matcher.
+
+    Instances are regex-escaped, then backslashes are doubled because the
+    regex is embedded in a double-quoted PromQL string literal.
+    """
+    return "|".join(re.escape(i) for i in instances).replace("\\", "\\\\")
+
+
+def _chunk_instances(instances, max_length=MAX_INSTANCE_MATCHER_LENGTH):
+    """Split instances into groups whose matcher stays under max_length."""
+    chunk, length = [], 0
+    for instance in instances:
+        size = len(_instance_matcher([instance])) + 1
+        if chunk and length + size > max_length:
+            yield chunk
+            chunk, length = [], 0
+        chunk.append(instance)
+        length += size
+    if chunk:
+        yield chunk
+
+
+def _sample_value(sample):
+    """Return a result sample's value as a float, mapping NaN/Inf to 0.0."""
+    return _finite(sample["value"][1])
+
+
+def _finite(raw):
+    value = float(raw)
+    if math.isnan(value) or math.isinf(value):
+        return 0.0
+    return value
+
+
+def _query_fleet_chunk(metric_name, chunk):
+    """Run a metric's fleet query for one chunk of instances.
+
+    Returns a dict of instance -> value for every instance that reported.
+    """
+    _, template = FLEET_QUERIES[metric_name]
+    result = query_prometheus(
+        template.replace("$instances", _instance_matcher(chunk)), name=metric_name
+    )
+    if not isinstance(result, list):
+        logger.warning("fleet query for %s failed: %s", metric_name, result)
+        return {}
+    values = {}
+    for sample in result:
+        instance = sample.get("metric", {}).get("instance")
+        if instance is not None:
+            values[instance] = _sample_value(sample)
+    return values
+
+
+def _query_fleet_range_chunk(metric_name, chunk, start, end, step_seconds):
+    """Range variant of _query_fleet_chunk.
+
+    Returns a dict of instance -> list of (unix timestamp, value).
+    """
+    _, template = FLEET_QUERIES[metric_name]
+    result = query_prometheus_range(
+        template.replace("$instances", _instance_matcher(chunk)),
+        start, end, step=f"{int(step_seconds)}s", name=metric_name,
+    )
+    if not isinstance(result, list):
+        logger.warning("fleet range query for %s failed: %s", metric_name, result)
+        return {}
+    series = {}
+    for sample in result:
+        instance = sample.get("metric", {}).get("instance")
+        if instance is not None:
+            series[instance] = [
+                (float(ts), _finite(value)) for ts, value in sample.get("values", [])
+            ]
+    return series
+
+
+def query_fleet_metric(metric_name, instances):
+    """Run one vectorized query for a metric across many exporter instances.
+
+    Returns a dict of instance -> value for every instance that reported.
+    Instances missing from the result vector are simply absent.
+    """
+    values = {}
+    for chunk in _chunk_instances(sorted(set(instances))):
+        values.update(_query_fleet_chunk(metric_name, chunk))
+    return values
+
+
+def _fleet_jobs(minions):
+    """Plan the batched queries for a fleet.
+
+    Returns a list of (metric_name, instance -> [minion_id], chunk).
+    """
+    jobs = []
+    for metric_name, (instance_key, _) in FLEET_QUERIES.items():
+        owners = {}
+        for minion in minions:
+            instance = getattr(minion, instance_key)
+            if instance:
+                owners.setdefault(instance, []).append(minion.id)
+        for chunk in _chunk_instances(sorted(owners)):
+            jobs.append((metric_name, owners, chunk))
+    return jobs
+
+
+def get_fleet_metrics(minions, executor=None):
+    """Get all key metrics for every configured minion in one batched pass.
+
+    Issues one query per metric (per URL-sized chunk of instances) instead
+    of one per metric per minion, then demultiplexes the result vectors.
+    `minions` is a sequence of MinionSettings. When an executor is given,
+    the metric/chunk queries run concurrently on it. Returns a dict of
+    minion_id -> metrics dict, shaped like get_all_metrics().
+    """
+    fleet = {}
+    for minion in minions:
+        metrics = {"memory_percent": 0.0, "cpu_percent": 0.0, "disk_percent": 0.0}
+        if minion.apache_instance:
+            metrics["apache_busy_workers_percent"] = 0.0
+            metrics["apache_requests_per_sec"] = 0.0
+        if minion.postgres_instance:
+            metrics["postgres_active_connections_percent"] = 0.0
+            metrics["postgres_deadlocks_per_min"] = 0.0
+        fleet[minion.id] = metrics
+
+    jobs = _fleet_jobs(minions)
+    run = executor.map if executor is not None else map
+    results = run(lambda job: _query_fleet_chunk(job[0], job[2]), jobs)
+    for (metric_name, owners, _), values in zip(jobs, results):
+        for instance, value in values.items():
+            for minion_id in owners.get(instance, ()):
+                fleet[minion_id][metric_name] = value
+
+    logger.debug(
+        "fleet metrics collected for %d minions in %d queries", len(fleet), len(jobs)
+    )
+    return fleet
+
+
+def get_fleet_snapshot(minions, executor=None):
+    """Collect an immutable MetricsSnapshot for every configured minion."""
+    return MetricsSnapshot.from_fleet_metrics(
+        minions, get_fleet_metrics(minions, executor=executor)
+    )
+
+
+def get_fleet_range(minions, start, end, step_seconds, executor=None):
+    """Collect range data for every metric of every minion, batched like
+    get_fleet_metrics().
+
+    Args:
+        minions: sequence of MinionSettings
+        start, end: timezone-aware datetimes bounding the window
+        step_seconds: resolution of the returned series
+
+    Returns:
+        dict of metric_name -> {minion_id: [(unix timestamp, value), ...]}
+    """
+    jobs = _fleet_jobs(minions)
+    run = executor.map if executor is not None else map
+    results = run(
+        lambda job: _query_fleet_range_chunk(job[0], job[2], start, end, step_seconds),
+        jobs,
+    )
+    fleet = {metric_name: {} for metric_name in FLEET_QUERIES}
+    for (metric_name, owners, _), series in zip(jobs, results):
+        for instance, points in series.items():
+            for minion_id in owners.get(instance, ()):
+                fleet[metric_name][minion_id] = points
+
+    logger.debug(
+        "fleet range collected for %d minions in %d queries", len(minions), len(jobs)
+    )
+    return fleet
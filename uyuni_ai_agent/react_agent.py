@@ -1,8 +1,25 @@
 import os
+import logging
+import threading
+from functools import lru_cache
+
 from langgraph.prebuilt import create_react_agent
 from langchain_core.messages import SystemMessage
 
+from uyuni_ai_agent.agent_budget import (
+    PartialAnalysis, compaction_hook, message_text, partial_analysis, run_bounded,
+)
+from uyuni_ai_agent.analysis_cache import analysis_cache, evidence_key
+from uyuni_ai_agent.config import get_settings
 from uyuni_ai_agent.llm_provider import get_llm
+from uyuni_ai_agent.forecast import FORECAST_STEPS
+from uyuni_ai_agent.telemetry import record_agent_messages
+from uyuni_ai_agent.tool_runner import build_tool_node
+from uyuni_ai_agent.triage import triage
+from uyuni_ai_agent.prefetch import (
+    mandatory_tool_calls, prefetch_evidence, prefetch_fleet_evidence,
+    format_evidence, format_fleet_evidence,
+)
 from uyuni_ai_agent.tools.process_tools import get_top_memory_processes, get_top_cpu_processes
 from uyuni_ai_agent.tools.disk_tools import get_disk_usage, find_large_files
 from uyuni_ai_agent.tools.service_tools import get_service_status, get_service_logs
@@ -15,6 +32,8 @@ from uyuni_ai_agent.tools.postgres_tools import (
     get_postgres_connections, get_postgres_log,
 )
 
+logger = logging.getLogger(__name__)
+
 
 # All Salt inspection tools available to the agent
 ALL_TOOLS = [
@@ -40,30 +59,105 @@ ALL_TOOLS = [
 ]
 
 
+PROMPTS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "prompts"
+)
+
+
+@lru_cache(maxsize=None)
+def read_template(template_name):
+    """Read a prompt template from the prompts/ directory (cached)."""
+    with open(os.path.join(PROMPTS_DIR, template_name), "r") as f:
+        return f.read()
+
+
 def load_prompt(template_name, **kwargs):
     """Load a prompt template from the prompts/ directory and fill in variables."""
-    prompts_dir = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        "prompts"
-    )
-    template_path = os.path.join(prompts_dir, template_name)
-    with open(template_path, "r") as f:
-        template = f.read()
-    return template.format(**kwargs)
+    return read_template(template_name).format(**kwargs)
+
+
+class AgentRuntime:
+    """Long-lived chat model and compiled ReAct graph shared by all workers.
+
+    The graph is built once per (provider, model, api key, toolset) and
+    rebuilt only when the llm settings change. Compiled LangGraph graphs
+    hold no per-run state, so concurrent investigate() calls can share one.
+
+    Args:
+        tools: the Salt tools bound to the agent
+        llm_factory: callable(LLMSettings) returning the chat model;
+            get_llm by default
+    """
+
+    def __init__(self, tools, llm_factory=get_llm):
+        self.tools = list(tools)
+        self.llm_factory = llm_factory
+        self._lock = threading.Lock()
+        self._state = (None, None)  # (key, compiled agent), swapped atomically
+
+    def _key_for(self, llm_cfg):
+        return (
+            llm_cfg.provider,
+            llm_cfg.model,
+            llm_cfg.api_key,
+            tuple(t.name for t in self.tools),
+        )
+
+    def get_agent(self):
+        """Return the compiled agent, (re)building it if the config changed."""
+        llm_cfg = get_settings().llm
+        key = self._key_for(llm_cfg)
+        built_key, agent = self._state
+        if agent is not None and built_key == key:
+            return agent
+
+        with self._lock:
+            built_key, agent = self._state
+            if agent is None or built_key != key:
+                logger.info(
+                    "Building ReAct agent: provider=%s model=%s tools=%d",
+                    llm_cfg.provider, llm_cfg.model, len(self.tools),
+                )
+                # Prompt edits are picked up together with config changes
+                read_template.cache_clear()
+                llm = self.llm_factory(llm_cfg)
+                # v1: each turn's tool calls reach one ToolNode run, which
+                # executes them concurrently and returns them in order
+                agent = create_react_agent(
+                    llm, build_tool_node(self.tools),
+                    pre_model_hook=compaction_hook, version="v1",
+                )
+                self._state = (key, agent)
+            return agent
+
+    def reset(self):
+        """Drop the cached agent so the next call rebuilds it."""
+        with self._lock:
+            self._state = (None, None)
+
+
+# Anomaly metric name -> scenario prompt template
+TEMPLATE_MAP = {
+    "memory": "high_ram.md",
+    "cpu": "high_cpu.md",
+    "disk": "disk_full.md",
+    "apache_busy_workers": "apache_overload.md",
+    "apache_requests": "apache_overload.md",
+    "postgres_connections": "postgres_issues.md",
+    "postgres_deadlocks": "postgres_issues.md",
+    "disk_forecast": "capacity_forecast.md",
+    "postgres_connections_forecast": "capacity_forecast.md",
+}
+
+
+def template_for_anomaly(anomaly):
+    return TEMPLATE_MAP.get(anomaly.metric_name, "high_ram.md")
 
 
 def get_prompt_for_anomaly(anomaly, metrics):
     """Pick the right prompt template based on the anomaly type."""
-    template_map = {
-        "memory": "high_ram.md",
-        "cpu": "high_cpu.md",
-        "disk": "disk_full.md",
-        "apache_busy_workers": "apache_overload.md",
-        "apache_requests": "apache_overload.md",
-        "postgres_connections": "postgres_issues.md",
-        "postgres_deadlocks": "postgres_issues.md",
-    }
-    template_name = template_map.get(anomaly.metric_name, "high_ram.md")
+    template_name = template_for_anomaly(anomaly)
     return load_prompt(
         template_name,
         minion_id=anomaly.minion_id,
@@ -73,9 +167,86 @@ def get_prompt_for_anomaly(anomaly, metrics):
         threshold=f"{anomaly.threshold:.1f}",
         severity=anomaly.severity.value,
         metrics=str(metrics),
+        description=anomaly.description,
+        forecast_steps=FORECAST_STEPS.get(anomaly.metric_name, "").format(
+            minion_id=anomaly.minion_id
+        ),
+    )
+
+
+def _scenario_section(prompt):
+    """Nest a rendered scenario prompt under the incident prompt's Scenarios
+    heading, dropping its metrics section (the incident lists them once).
+    """
+    title, _, body = prompt.partition("\n")
+    lines, skipping = [f"### {title.strip()}"], False
+    for line in body.splitlines():
+        if line.startswith("## "):
+            skipping = line[3:].strip() == "Current Prometheus Metrics"
+            if not skipping:
+                lines.append("##" + line)
+        elif not skipping:
+            lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def _evidence_minions(incident, limit):
+    """The incident's minions, most urgent first, capped at `limit`."""
+    return list(dict.fromkeys(a.minion_id for a in incident.ranked))[:limit]
+
+
+def get_prompt_for_incident(incident):
+    """Merge the scenario prompts of an incident's anomalies into one prompt.
+
+    Each distinct template is rendered once, for the most severe anomaly
+    that uses it, so steps shared between anomalies aren't repeated.
+    """
+    limit = get_settings().correlation.fleet_max_minions
+    shown = set(_evidence_minions(incident, limit)) if incident.fleet else set(incident.minion_ids)
+
+    ranked = incident.ranked
+    anomalies = [
+        f"- {a.minion_id}: {a.metric_name} at {a.current_value:.1f} "
+        f"(threshold {a.threshold:.1f}) [{a.severity.value}] — {a.description}"
+        for a in ranked if a.minion_id in shown
+    ]
+    hidden = len(incident.anomalies) - len(anomalies)
+    if hidden:
+        anomalies.append(f"- ... and {hidden} more minions with the same anomaly")
+
+    scenarios = {}
+    for anomaly in ranked:
+        template_name = template_for_anomaly(anomaly)
+        if template_name not in scenarios:
+            metrics = incident.metrics.get(anomaly.minion_id, {})
+            scenarios[template_name] = _scenario_section(get_prompt_for_anomaly(anomaly, metrics))
+
+    if incident.fleet:
+        scope = (
+            f"\n\nThe same symptom is alerting on {len(incident.minion_ids)} minions at once, "
+            "so look first for what they have in common: a shared dependency, a "
+            "fleet-wide job or a recent rollout. The steps below are written for "
+            f"{incident.lead.minion_id}; call the same tools on the other listed "
+            "minions where their evidence is needed."
+        )
+    else:
+        scope = ""
+    return load_prompt(
+        "incident.md",
+        summary=incident.description,
+        scope=scope,
+        anomalies="\n".join(anomalies),
+        metrics="\n".join(
+            f"- {minion_id}: {metrics}"
+            for minion_id, metrics in incident.metrics.items() if minion_id in shown
+        ),
+        scenarios="\n\n".join(scenarios.values()),
     )
 
 
+agent_runtime = AgentRuntime(ALL_TOOLS)
+
+
 def investigate(anomaly, metrics):
     """Run the ReAct agent to investigate an anomaly.
     The agent uses Salt tools to gather context and the LLM to reason
@@ -86,39 +257,140 @@ def investigate(anomaly, metrics):
         metrics: dict of current Prometheus metrics
 
     Returns:
-        str: the AI-generated root cause analysis
+        str: the AI-generated root cause analysis; a TriageAnalysis when
+        a triage rule matched the evidence, a CachedAnalysis when the same
+        evidence was analysed before
     """
-    llm = get_llm()
-
-    # Load system prompt
-    system_prompt = load_prompt("system_prompt.md")
+    settings = get_settings()
 
     # Load scenario-specific prompt
     scenario_prompt = get_prompt_for_anomaly(anomaly, metrics)
 
-    # Create the ReAct agent with all Salt tools
-    agent = create_react_agent(llm, ALL_TOOLS)
+    # Run the scenario's mandatory Salt commands up front in one request,
+    # saving the agent one LLM turn + one Salt round-trip per command
+    evidence = []
+    if settings.investigation.prefetch or settings.triage.enabled:
+        tool_names = mandatory_tool_calls(scenario_prompt)
+        evidence = prefetch_evidence(anomaly.minion_id, tool_names)
+
+    # Routine incidents are answered by a rule without calling the LLM
+    analysis = triage(
+        settings.triage, [anomaly.metric_name], anomaly.minion_id,
+        anomaly.severity.value, anomaly.current_value, evidence,
+    )
+    if analysis is not None:
+        return analysis
+
+    if evidence and settings.investigation.prefetch:
+        scenario_prompt += "\n\n" + format_evidence(anomaly.minion_id, evidence)
+
+    # Shared chat model + compiled graph with all Salt tools
+    agent = agent_runtime.get_agent()
+    return _run_cached(
+        agent, scenario_prompt, anomaly.metric_name, anomaly.severity.value,
+        anomaly.minion_id, evidence,
+    )
+
+
+def investigate_incident(incident):
+    """Run one ReAct investigation for a group of correlated anomalies.
+
+    A single-anomaly incident is investigated exactly like the anomaly.
+    Triage rules apply to single-minion incidents only; fleet incidents
+    always go to the agent.
+
+    Args:
+        incident: an Incident from incidents.Correlator
+
+    Returns:
+        str: the AI-generated root cause analysis covering every anomaly
+    """
+    if len(incident.anomalies) == 1:
+        anomaly = incident.anomalies[0]
+        return investigate(anomaly, incident.metrics.get(anomaly.minion_id, {}))
+
+    settings = get_settings()
+    scenario_prompt = get_prompt_for_incident(incident)
+    metric_names = sorted({a.metric_name for a in incident.anomalies})
+
+    evidence = []
+    if incident.fleet:
+        if settings.investigation.prefetch:
+            # One list-targeted request for the same tools on every minion
+            evidence = prefetch_fleet_evidence(
+                _evidence_minions(incident, settings.correlation.fleet_max_minions),
+                mandatory_tool_calls(scenario_prompt),
+            )
+            if any(evidence.values()):
+                scenario_prompt += "\n\n" + format_fleet_evidence(evidence)
+    elif settings.investigation.prefetch or settings.triage.enabled:
+        evidence = prefetch_evidence(incident.minion_id, mandatory_tool_calls(scenario_prompt))
+        analysis = triage(
+            settings.triage, metric_names, incident.minion_id,
+            incident.severity.value, None, evidence,
+        )
+        if analysis is not None:
+            return analysis
+        if evidence and settings.investigation.prefetch:
+            scenario_prompt += "\n\n" + format_evidence(incident.minion_id, evidence)
+
+    agent = agent_runtime.get_agent()
+    kind = ",".join(metric_names)
+    return _run_cached(
+        agent, scenario_prompt, kind, incident.severity.value, incident.minion_id, evidence,
+    )
+
+
+def _run_cached(agent, scenario_prompt, kind, severity, minion_id, evidence):
+    """_run_agent(), unless the same evidence was analysed before.
+
+    The analysis cache is keyed by anomaly kind, severity, minion and the
+    normalized prefetched evidence; a hit returns a CachedAnalysis
+    without calling the LLM.
+    """
+    cfg = get_settings().analysis_cache
+    key = evidence_key(kind, severity, minion_id, evidence) if cfg.enabled else None
+    if key is not None:
+        try:
+            cached = analysis_cache.get(key, cfg)
+        except Exception as e:
+            logger.error("Analysis cache lookup failed: %s", e)
+            cached = None
+        if cached is not None:
+            logger.info("Analysis cache hit for %s on %s", kind, minion_id)
+            return cached
+
+    analysis = _run_agent(agent, scenario_prompt)
+    # A partial analysis reflects the budget, not the evidence: don't keep it
+    if key is not None and analysis and not isinstance(analysis, PartialAnalysis):
+        try:
+            analysis_cache.put(key, kind, minion_id, analysis, cfg)
+        except Exception as e:
+            logger.error("Analysis cache store failed: %s", e)
+    return analysis
+
+
+def _run_agent(agent, scenario_prompt):
+    """Invoke the agent on a scenario prompt and return its final text.
+
+    The run is bounded by the investigation budgets; if one runs out, a
+    PartialAnalysis built from the evidence gathered so far is returned.
+    """
+    # Load system prompt
+    system_prompt = load_prompt("system_prompt.md")
 
     # Run the agent
-    result = agent.invoke({
+    settings = get_settings()
+    messages, reason = run_bounded(agent, {
         "messages": [
             SystemMessage(content=system_prompt),
             ("human", scenario_prompt),
         ]
-    })
-
-    # Extract the final response.
-    # Some LLMs (Gemini) return content as a list of blocks
-    final_message = result["messages"][-1]
-    content = final_message.content
-
-    if isinstance(content, list):
-        text_parts = []
-        for block in content:
-            if isinstance(block, dict) and "text" in block:
-                text_parts.append(block["text"])
-            elif isinstance(block, str):
-                text_parts.append(block)
-        return "\n".join(text_parts)
-
-    return content
+    }, settings.investigation, settings.tools.max_parallel_calls)
+
+    record_agent_messages(messages)
+
+    if reason is not None:
+        logger.warning("Investigation stopped after %s; sending a partial analysis", reason)
+        return partial_analysis(messages, reason)
+    return message_text(messages[-1])
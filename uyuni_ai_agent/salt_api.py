@@ -1,14 +1,30 @@
 import logging
+import time
+from contextlib import contextmanager
+
 import requests
 import urllib3
 
-from uyuni_ai_agent.config import load_config
+from uyuni_ai_agent import fixtures
+from uyuni_ai_agent.config import get_settings
+from uyuni_ai_agent.salt_cache import ResultCache
+from uyuni_ai_agent.salt_jobs import SaltJobManager
+from uyuni_ai_agent.telemetry import salt_errors, salt_seconds
 
 # Suppress SSL warnings for self-signed certs
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 logger = logging.getLogger(__name__)
 
+NO_RESPONSE = "No response from minion"
+
+
+class JobTimeout(str):
+    """Result of a minion that did not return before its job was killed.
+
+    Reported to the agent like a failed call, but never cached.
+    """
+
 
 class SaltAPIClient:
     """Client for the Salt REST API (rest_cherrypy) inside the Uyuni container.
@@ -19,46 +35,50 @@ class SaltAPIClient:
     """
 
     def __init__(self):
-        config = load_config()
-        api_cfg = config["salt_api"]
-        self.url = api_cfg["url"]
-        self.username = api_cfg["username"]
-        self.password = api_cfg.get("password", "")
-        self.eauth = api_cfg.get("eauth", "file")
         self.session = requests.Session()
         self.session.verify = False
         self.logged_in = False
+        self._api_cfg = None
+        self.cache = ResultCache()
+        self.jobs = SaltJobManager(self, lambda: get_settings().salt_api)
+
+    @property
+    def url(self):
+        return get_settings().salt_api.url
 
     def login(self):
         """Authenticate via /login. Session cookies are stored automatically."""
-        logger.debug("salt_api: logging in to %s", self.url)
+        api_cfg = get_settings().salt_api
+        logger.debug("salt_api: logging in to %s", api_cfg.url)
         resp = self.session.post(
-            f"{self.url}/login",
+            f"{api_cfg.url}/login",
             data={
-                "username": self.username,
-                "password": self.password,
-                "eauth": self.eauth,
+                "username": api_cfg.username,
+                "password": api_cfg.password,
+                "eauth": api_cfg.eauth,
             },
             timeout=15,
         )
         resp.raise_for_status()
         self.logged_in = True
+        self._api_cfg = api_cfg
         token = resp.json()["return"][0]["token"]
         logger.debug("salt_api: login successful, token=%s...", token[:12])
 
     def _ensure_login(self):
-        """Login if we haven't yet."""
-        if not self.logged_in:
+        """Login if we haven't yet, or if the salt_api credentials were reloaded."""
+        api_cfg = get_settings().salt_api
+        if not self.logged_in or self._credentials(self._api_cfg) != self._credentials(api_cfg):
             self.login()
 
-    def _call(self, tgt, fun, arg=None):
-        """Make a Salt API call via POST /. Uses session cookies for auth.
-
-        Body is a JSON array of lowstate dicts as per the docs.
-        Re-authenticates once on 401.
-        """
-        self._ensure_login()
+    @staticmethod
+    def _credentials(api_cfg):
+        if api_cfg is None:
+            return None
+        return (api_cfg.url, api_cfg.username, api_cfg.password, api_cfg.eauth)
 
+    @staticmethod
+    def _lowstate(tgt, fun, arg=None, tgt_type="glob"):
         lowstate = {
             "client": "local",
             "tgt": tgt,
@@ -66,10 +86,21 @@ class SaltAPIClient:
         }
         if arg:
             lowstate["arg"] = arg
+        if tgt_type != "glob":
+            lowstate["tgt_type"] = tgt_type
+        return lowstate
+
+    def _post(self, lowstates):
+        """POST a JSON array of lowstate dicts to /. Uses session cookies for auth.
+
+        Returns the "return" list, one entry per lowstate, in order.
+        Re-authenticates once on 401.
+        """
+        self._ensure_login()
 
         resp = self.session.post(
             self.url,
-            json=[lowstate],
+            json=lowstates,
             timeout=60,
         )
 
@@ -80,20 +111,260 @@ class SaltAPIClient:
             self.login()
             resp = self.session.post(
                 self.url,
-                json=[lowstate],
+                json=lowstates,
                 timeout=60,
             )
 
         resp.raise_for_status()
-        data = resp.json()
-        result = data.get("return", [{}])[0]
-        return result.get(tgt, "No response from minion")
+        return resp.json().get("return", [])
+
+    def _get(self, path):
+        """GET a rest_cherrypy endpoint such as /jobs/<jid>; returns its "return" list."""
+        self._ensure_login()
+        resp = self.session.get(f"{self.url}{path}", timeout=30)
+        if resp.status_code == 401:
+            logger.warning("salt_api: session expired, re-authenticating...")
+            self.logged_in = False
+            self.login()
+            resp = self.session.get(f"{self.url}{path}", timeout=30)
+        resp.raise_for_status()
+        return resp.json().get("return", [])
+
+    @staticmethod
+    @contextmanager
+    def _timed(funs):
+        """Record latency (and failure) of one Salt request for each function in it.
+
+        `request` is "batch" for a request carrying several lowstates
+        (call_many, sweep), whose latency every function in it shares.
+        """
+        request = "batch" if len(funs) > 1 else "single"
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            for fun in set(funs):
+                salt_errors.inc(function=fun, request=request)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            for fun in set(funs):
+                salt_seconds.observe(elapsed, function=fun, request=request)
+
+    def _call(self, tgt, fun, arg=None):
+        """Make a single Salt API call and return the minion's result.
+
+        With salt_api.async_jobs the call is submitted through local_async
+        and waited on under the per-job deadline (the job is killed on the
+        minion if it runs over); otherwise it is a synchronous POST /.
+        """
+        lowstates = [self._lowstate(tgt, fun, arg)]
+        with self._timed([fun]):
+            if get_settings().salt_api.async_jobs:
+                returns = self._exchange(lowstates, lambda: [self._run_job(tgt, fun, arg)])
+            else:
+                returns = self._exchange(lowstates, lambda: self._post(lowstates))
+        result = returns[0] if returns else {}
+        return result.get(tgt, NO_RESPONSE)
+
+    def _run_job(self, tgt, fun, arg=None):
+        """Run one local_async job to completion; returns minion_id -> result."""
+        job = self.jobs.submit(tgt, fun, arg)
+        returns = job.result()
+        if tgt not in returns and job.timed_out:
+            raise TimeoutError(
+                f"{fun} on {tgt} timed out (jid {job.jid}) and was killed"
+            )
+        return returns
+
+    def _run_jobs(self, lowstates):
+        """Run lowstates as local_async jobs submitted in one POST.
+
+        Each job has its own deadline and is killed on the minions still
+        running it when that passes; those minions map to a JobTimeout.
+
+        Returns:
+            list (one per lowstate) of dicts minion_id -> result.
+        """
+        jobs = self.jobs.submit_many([
+            (ls["tgt"], ls["fun"], ls.get("arg"), ls.get("tgt_type", "glob"))
+            for ls in lowstates
+        ])
+        results = []
+        for job in jobs:
+            returns = job.result()
+            if job.timed_out:
+                for minion_id in job.missing:
+                    returns[minion_id] = JobTimeout(
+                        f"Salt API call failed: {job.fun} on {minion_id} timed out "
+                        f"(jid {job.jid}) and was killed"
+                    )
+            results.append(returns)
+        return results
+
+    def _send(self, lowstates):
+        """Send lowstates as async jobs with salt_api.async_jobs, else as one POST /."""
+        if get_settings().salt_api.async_jobs:
+            return self._exchange(lowstates, lambda: self._run_jobs(lowstates))
+        return self._exchange(lowstates, lambda: self._post(lowstates))
+
+    @staticmethod
+    def _cacheable(value):
+        return value != NO_RESPONSE and not isinstance(value, JobTimeout)
+
+    @staticmethod
+    def _exchange(lowstates, send):
+        """Run send() for a lowstate request, through the fixture store if one is active.
+
+        Async jobs are recorded as the returns of their lowstate, so a
+        replay serves them without the /events or /jobs round-trips.
+        """
+        return fixtures.exchange("salt", lowstates, send)
+
+    def call_targets(self, tgt, fun, arg=None, tgt_type="glob"):
+        """Run one Salt function on every minion matched by a target.
+
+        Args:
+            tgt: target expression; a list of minion IDs for tgt_type "list"
+            fun: Salt execution function, e.g. "cmd.run"
+            arg: optional list of positional arguments
+            tgt_type: glob, list, grain, pcre, compound, nodegroup, ...
+
+        Returns:
+            dict of minion_id -> result for every minion that returned.
+        """
+        logger.debug("salt_api: %s tgt=%s tgt_type=%s", fun, tgt, tgt_type)
+        lowstates = [self._lowstate(tgt, fun, arg, tgt_type)]
+        with self._timed([fun]):
+            returns = self._send(lowstates)
+        return returns[0] if returns else {}
+
+    def sweep(self, minion_ids, calls):
+        """Run several Salt functions across many minions in one POST.
+
+        Each call becomes one list-targeted lowstate, so gathering the
+        same diagnostics from N minions costs one round-trip, not N.
+        With salt_api.async_jobs each lowstate is a job with its own
+        deadline; minions that overrun it map to a JobTimeout.
+
+        Args:
+            minion_ids: minion IDs to target
+            calls: list of (fun, arg) tuples; arg may be None
+
+        Returns:
+            list (one per call) of dicts minion_id -> result. Minions that
+            did not return map to NO_RESPONSE; a failed request maps every
+            minion to the failure message.
+        """
+        minion_ids = list(minion_ids)
+        if not minion_ids or not calls:
+            return [{} for _ in calls]
+        logger.debug(
+            "salt_api: sweep of %d calls over %d minions", len(calls), len(minion_ids)
+        )
+        self._sync_cache_settings()
+        try:
+            lowstates = [self._lowstate(minion_ids, fun, arg, "list") for fun, arg in calls]
+            with self._timed([fun for fun, _ in calls]):
+                returns = self._send(lowstates)
+        except Exception as e:
+            failure = f"Salt API call failed: {str(e)}"
+            return [dict.fromkeys(minion_ids, failure) for _ in calls]
+
+        results = []
+        for i, (fun, arg) in enumerate(calls):
+            returned = returns[i] if i < len(returns) else {}
+            per_minion = {}
+            for minion_id in minion_ids:
+                value = returned.get(minion_id, NO_RESPONSE)
+                per_minion[minion_id] = value
+                if self._cacheable(value):
+                    self.cache.put(self._cache_key(minion_id, fun, arg), value)
+            results.append(per_minion)
+        return results
+
+    def sweep_command(self, minion_ids, cmd):
+        """Run one shell command on many minions in one request.
+
+        Returns a dict of minion_id -> output.
+        """
+        return self.sweep(minion_ids, [("cmd.run", [cmd])])[0]
+
+    def _sync_cache_settings(self):
+        api_cfg = get_settings().salt_api
+        self.cache.ttl = api_cfg.cache_ttl_seconds
+        self.cache.max_entries = api_cfg.cache_max_entries
+
+    @staticmethod
+    def _cache_key(tgt, fun, arg=None):
+        return (tgt, fun, tuple(arg or ()))
+
+    def _cached_call(self, tgt, fun, arg=None):
+        """_call() through the result cache, keyed by (minion, function, args).
+
+        Identical concurrent calls collapse into one in-flight POST.
+        """
+        self._sync_cache_settings()
+        return self.cache.get_or_call(
+            self._cache_key(tgt, fun, arg),
+            lambda: self._call(tgt, fun, arg),
+            cacheable=lambda result: result != NO_RESPONSE,
+        )
+
+    def call_many(self, minion_id, calls):
+        """Run several Salt functions on one minion in a single POST.
+
+        The Salt REST API accepts an array of lowstates per request and
+        returns one result per lowstate, so N commands cost one round-trip.
+        With salt_api.async_jobs they are submitted together as jobs that
+        are each killed at their own deadline, so one slow command only
+        fails its own entry.
+
+        Args:
+            minion_id: the Salt minion ID
+            calls: list of (fun, arg) tuples; arg may be None
+
+        Returns:
+            list of per-call results in the same order. If the whole
+            request fails, every uncached entry is the failure message.
+
+        Calls already in the result cache are served from it, and fresh
+        results are stored so later tool calls for them are cache hits.
+        """
+        self._sync_cache_settings()
+        results = [None] * len(calls)
+        pending = []
+        for i, (fun, arg) in enumerate(calls):
+            found, value = self.cache.get(self._cache_key(minion_id, fun, arg))
+            if found:
+                results[i] = value
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        logger.debug("salt_api: batch of %d calls minion=%s", len(pending), minion_id)
+        try:
+            lowstates = [self._lowstate(minion_id, *calls[i]) for i in pending]
+            with self._timed([calls[i][0] for i in pending]):
+                returns = self._send(lowstates)
+        except Exception as e:
+            for i in pending:
+                results[i] = f"Salt API call failed: {str(e)}"
+            return results
+        for n, i in enumerate(pending):
+            result = returns[n] if n < len(returns) else {}
+            value = result.get(minion_id, NO_RESPONSE)
+            results[i] = value
+            if self._cacheable(value):
+                self.cache.put(self._cache_key(minion_id, *calls[i]), value)
+        return results
 
     def run_command(self, minion_id, cmd):
         """Run a shell command on a minion via cmd.run."""
         logger.debug("salt_api: cmd.run minion=%s cmd=%s", minion_id, cmd[:60])
         try:
-            return self._call(minion_id, "cmd.run", [cmd])
+            return self._cached_call(minion_id, "cmd.run", [cmd])
         except Exception as e:
             return f"Salt API call failed: {str(e)}"
 
@@ -101,7 +372,7 @@ class SaltAPIClient:
         """Get disk usage for a minion via disk.usage."""
         logger.debug("salt_api: disk.usage minion=%s", minion_id)
         try:
-            return str(self._call(minion_id, "disk.usage"))
+            return str(self._cached_call(minion_id, "disk.usage"))
         except Exception as e:
             return f"Salt API call failed: {str(e)}"
 
@@ -109,7 +380,7 @@ class SaltAPIClient:
         """Check if a service is running on a minion."""
         logger.debug("salt_api: service.status minion=%s service=%s", minion_id, service)
         try:
-            return self._call(minion_id, "service.status", [service])
+            return self._cached_call(minion_id, "service.status", [service])
         except Exception as e:
             return f"Salt API call failed: {str(e)}"
 
@@ -118,7 +389,7 @@ class SaltAPIClient:
         logger.debug("salt_api: service_logs minion=%s service=%s", minion_id, service)
         cmd = f"journalctl -u {service} -n {lines} --no-pager"
         try:
-            return self._call(minion_id, "cmd.run", [cmd])
+            return self._cached_call(minion_id, "cmd.run", [cmd])
         except Exception as e:
             return f"Salt API call failed: {str(e)}"
 
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass
+class CacheStats:
+    """Counters for the Salt result cache."""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    size: int = 0
+
+
+class _Flight:
+    """A Salt call in progress that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """TTL + LRU cache with single-flight deduplication.
+
+    Concurrent get_or_call() calls for the same key share one execution of
+    the underlying function: the first caller runs it, the rest wait for
+    its result. Only successful results are cached; an exception is
+    re-raised to every waiter and nothing is stored.
+
+    Args:
+        ttl: seconds a result stays fresh; 0 disables caching (in-flight
+            calls are still deduplicated)
+        max_entries: LRU bound on stored results
+    """
+
+    def __init__(self, ttl=30.0, max_entries=512, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+        self._stats = CacheStats()
+
+    def _lookup(self, key):
+        """Return (True, value) for a fresh entry. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key):
+        """Return (True, value) if a fresh result is cached, else (False, None)."""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._stats.hits += 1
+            return found, value
+
+    def put(self, key, value):
+        """Store a result, evicting least-recently-used entries if needed."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    def get_or_call(self, key, fn, cacheable=None):
+        """Return the cached result for key, or run fn() once to produce it.
+
+        `cacheable(value)` can veto storing a result (e.g. "no response").
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._stats.hits += 1
+                return value
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self._stats.coalesced += 1
+                leader = False
+            else:
+                self._stats.misses += 1
+                flight = self._inflight[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fn()
+            # Store before releasing the flight so no caller slips in between
+            if cacheable is None or cacheable(flight.value):
+                self.put(key, flight.value)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+        return flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return a point-in-time copy of the counters."""
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                coalesced=self._stats.coalesced,
+                evictions=self._stats.evictions,
+                size=len(self._entries),
+            )
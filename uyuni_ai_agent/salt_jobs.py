@@ -0,0 +1,309 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# How long result() waits past a job's deadline for the watcher to end it
+RESULT_GRACE_SECONDS = 10
+
+# Returns for jids we have not registered yet (the event can beat the
+# local_async response); bounded so unrelated jobs don't pile up.
+MAX_EARLY_RETURNS = 256
+
+
+class SaltJob:
+    """A Salt job submitted through local_async.
+
+    Returns arrive from the /events stream or /jobs polling and are
+    collected per minion. The job is done once every targeted minion has
+    returned, its deadline passes, or it is cancelled.
+    """
+
+    def __init__(self, jid, tgt, fun, minions, deadline, manager):
+        self.jid = jid
+        self.tgt = tgt
+        self.fun = fun
+        self.minions = set(minions)
+        self.deadline = deadline
+        self.returns = {}
+        self.timed_out = False
+        self.cancelled = False
+        self._done = threading.Event()
+        self._manager = manager
+        if not self.minions:
+            self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def missing(self):
+        return self.minions - set(self.returns)
+
+    def wait(self, timeout=None):
+        """Block until the job is done. Returns False if `timeout` ran out first."""
+        return self._done.wait(timeout)
+
+    def result(self):
+        """Wait for the job and return a dict of minion_id -> return.
+
+        Minions that did not return before the deadline are absent. The
+        wait is bounded by the deadline plus RESULT_GRACE_SECONDS, so a
+        caller is not stuck if the watcher thread is gone.
+        """
+        remaining = self.deadline - time.monotonic() + RESULT_GRACE_SECONDS
+        if not self._done.wait(max(0.0, remaining)):
+            logger.warning(
+                "salt_jobs: job %s (%s) was not finished by its deadline", self.jid, self.fun
+            )
+            self.timed_out = True
+            self._finish()
+        return dict(self.returns)
+
+    def cancel(self):
+        """Kill the job on its minions and stop waiting for it."""
+        self._manager.cancel(self)
+
+    def _add_return(self, minion_id, value):
+        if self.done:
+            return
+        self.returns[minion_id] = value
+        if not self.missing:
+            self._done.set()
+
+    def _finish(self):
+        self._done.set()
+
+
+def _iter_sse(lines):
+    """Yield (tag, data) pairs from a rest_cherrypy server-sent event stream."""
+    tag, data = None, []
+    for line in lines:
+        if not line:
+            if data:
+                try:
+                    yield tag, json.loads("\n".join(data))
+                except ValueError:
+                    logger.debug("salt_jobs: unparseable event data for %s", tag)
+            tag, data = None, []
+        elif line.startswith("tag:"):
+            tag = line[4:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+class SaltJobManager:
+    """Tracks local_async jobs so many slow commands can be in flight at once.
+
+    submit() returns as soon as Salt has accepted the job. One listener
+    thread follows the /events stream and completes jobs as their returns
+    arrive; while the stream is unavailable, one watcher thread polls
+    /jobs/<jid> instead. The watcher also enforces per-job deadlines,
+    killing overdue jobs on their minions with saltutil.kill_job.
+
+    Args:
+        client: SaltAPIClient used for auth and requests
+        get_settings: callable returning the current SaltAPISettings
+    """
+
+    def __init__(self, client, get_settings):
+        self.client = client
+        self.get_settings = get_settings
+        self.events_connected = False
+        self._jobs = {}
+        self._early = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._resync = threading.Event()
+        self._threads = []
+
+    # ── Submission ──
+
+    def submit(self, tgt, fun, arg=None, tgt_type="glob", timeout=None):
+        """Start a Salt job without waiting for it.
+
+        Args:
+            tgt: target expression; a list of minion IDs for tgt_type "list"
+            fun: Salt execution function, e.g. "cmd.run"
+            arg: optional list of positional arguments
+            tgt_type: glob, list, grain, pcre, compound, nodegroup, ...
+            timeout: seconds before the job is killed; defaults to
+                salt_api.job_timeout_seconds
+
+        Returns:
+            SaltJob to wait on.
+        """
+        return self.submit_many([(tgt, fun, arg, tgt_type)], timeout)[0]
+
+    def submit_many(self, calls, timeout=None):
+        """Start several Salt jobs with one POST, without waiting for them.
+
+        Args:
+            calls: list of (tgt, fun, arg, tgt_type) tuples, as for submit()
+            timeout: seconds before each job is killed; defaults to
+                salt_api.job_timeout_seconds
+
+        Returns:
+            list of SaltJob, one per call, in order.
+        """
+        self.start()
+        cfg = self.get_settings()
+        timeout = cfg.job_timeout_seconds if timeout is None else timeout
+        lowstates = []
+        for tgt, fun, arg, tgt_type in calls:
+            lowstate = self.client._lowstate(tgt, fun, arg, tgt_type)
+            lowstate["client"] = "local_async"
+            lowstates.append(lowstate)
+        returns = self.client._post(lowstates)
+        deadline = time.monotonic() + timeout
+        jobs = []
+        for i, (tgt, fun, _, _) in enumerate(calls):
+            accepted = returns[i] if i < len(returns) else {}
+            jid = accepted.get("jid") if isinstance(accepted, dict) else None
+            minions = accepted.get("minions", []) if jid else []
+            job = SaltJob(jid, tgt, fun, minions, deadline, self)
+            logger.debug(
+                "salt_jobs: %s submitted jid=%s minions=%d timeout=%ss",
+                fun, jid, len(job.minions), timeout,
+            )
+            jobs.append(job)
+            if job.done:
+                continue
+            with self._lock:
+                self._jobs[jid] = job
+                for minion_id, value in self._early.pop(jid, {}).items():
+                    job._add_return(minion_id, value)
+                if job.done:
+                    del self._jobs[jid]
+        return jobs
+
+    def cancel(self, job):
+        """Kill a job on its outstanding minions and mark it cancelled."""
+        with self._lock:
+            self._jobs.pop(job.jid, None)
+        if job.done:
+            return
+        job.cancelled = True
+        job._finish()
+        self._kill(job)
+
+    def _kill(self, job):
+        missing = sorted(job.missing)
+        if not missing:
+            return
+        logger.warning(
+            "salt_jobs: killing jid=%s (%s) on %s", job.jid, job.fun, ", ".join(missing)
+        )
+        try:
+            lowstate = self.client._lowstate(missing, "saltutil.kill_job", [job.jid], "list")
+            lowstate["client"] = "local_async"
+            self.client._post([lowstate])
+        except Exception as e:
+            logger.error("salt_jobs: could not kill jid=%s: %s", job.jid, e)
+
+    def _on_return(self, jid, minion_id, value):
+        with self._lock:
+            job = self._jobs.get(jid)
+            if job is None:
+                early = self._early.setdefault(jid, {})
+                early[minion_id] = value
+                while len(self._early) > MAX_EARLY_RETURNS:
+                    self._early.popitem(last=False)
+                return
+            job._add_return(minion_id, value)
+            if job.done:
+                del self._jobs[jid]
+
+    # ── /events listener ──
+
+    def _listen(self):
+        while not self._stop.is_set():
+            cfg = self.get_settings()
+            if not cfg.use_events:
+                self._stop.wait(cfg.job_poll_interval_seconds)
+                continue
+            try:
+                self.client._ensure_login()
+                with self.client.session.get(
+                    f"{cfg.url}/events",
+                    headers={"Accept": "text/event-stream"},
+                    stream=True,
+                    timeout=(15, max(cfg.job_timeout_seconds, 60)),
+                ) as resp:
+                    resp.raise_for_status()
+                    self.events_connected = True
+                    # Returns may have been missed while disconnected
+                    self._resync.set()
+                    logger.debug("salt_jobs: connected to %s/events", cfg.url)
+                    for tag, event in _iter_sse(resp.iter_lines(decode_unicode=True)):
+                        if self._stop.is_set():
+                            break
+                        self._on_event(tag, event)
+            except Exception as e:
+                logger.debug("salt_jobs: event stream unavailable: %s", e)
+            finally:
+                self.events_connected = False
+            self._stop.wait(cfg.job_poll_interval_seconds)
+
+    def _on_event(self, tag, event):
+        # salt/job/<jid>/ret/<minion_id>
+        parts = (tag or event.get("tag", "")).split("/")
+        if len(parts) < 5 or parts[:2] != ["salt", "job"] or parts[3] != "ret":
+            return
+        data = event.get("data", {})
+        self._on_return(parts[2], data.get("id", parts[4]), data.get("return"))
+
+    # ── Deadlines and /jobs polling ──
+
+    def _poll(self, job):
+        try:
+            returns = self.client._get(f"/jobs/{job.jid}")
+        except Exception as e:
+            logger.debug("salt_jobs: polling jid=%s failed: %s", job.jid, e)
+            return
+        returned = returns[0] if returns and isinstance(returns[0], dict) else {}
+        for minion_id, value in returned.items():
+            self._on_return(job.jid, minion_id, value)
+
+    def _watch(self):
+        while not self._stop.wait(self.get_settings().job_poll_interval_seconds):
+            resync = self._resync.is_set()
+            self._resync.clear()
+            now = time.monotonic()
+            with self._lock:
+                jobs = list(self._jobs.values())
+            for job in jobs:
+                if now >= job.deadline:
+                    with self._lock:
+                        self._jobs.pop(job.jid, None)
+                    job.timed_out = True
+                    job._finish()
+                    self._kill(job)
+                elif resync or not self.events_connected:
+                    self._poll(job)
+
+    def start(self):
+        """Start the listener and watcher threads (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for name, target in (("salt-events", self._listen), ("salt-jobs", self._watch)):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        """Stop the background threads; outstanding jobs are left running."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def pending(self):
+        with self._lock:
+            return len(self._jobs)
@@ -0,0 +1,93 @@
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TickStats:
+    """Running counters for the polling scheduler."""
+    ticks: int = 0
+    skipped: int = 0
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+    last_duration: float = 0.0
+
+
+class TickScheduler:
+    """Fire a tick function on fixed wall-clock boundaries.
+
+    Boundaries are multiples of the interval since the epoch, so the
+    period does not drift with the time spent inside each tick. When a
+    tick runs past one or more boundaries, those ticks are skipped and
+    counted instead of being run back to back to catch up.
+
+    Args:
+        get_interval: callable returning the current interval in seconds;
+            re-read every tick so config reloads take effect
+        clock: wall-clock source, time.time by default
+    """
+
+    def __init__(self, get_interval, clock=time.time):
+        self.get_interval = get_interval
+        self.clock = clock
+        self.stats = TickStats()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def next_boundary(now, interval):
+        """Return the first interval boundary strictly after `now`."""
+        return (math.floor(now / interval) + 1) * interval
+
+    def stop(self):
+        """Stop after the current tick finishes."""
+        self._stop.set()
+
+    def run(self, tick, max_ticks=None):
+        """Call tick() on every boundary until stop() or max_ticks.
+
+        The first tick runs immediately; later ticks are aligned to
+        interval boundaries.
+        """
+        boundary = self.clock()
+
+        while not self._stop.is_set():
+            delay = boundary - self.clock()
+            if delay > 0 and self._stop.wait(delay):
+                break
+
+            started = self.clock()
+            lag = max(0.0, started - boundary)
+            try:
+                tick()
+            except Exception as e:
+                logger.error("Tick failed: %s", e, exc_info=True)
+            finished = self.clock()
+
+            stats = self.stats
+            stats.ticks += 1
+            stats.last_lag = lag
+            stats.max_lag = max(stats.max_lag, lag)
+            stats.last_duration = finished - started
+
+            interval = self.get_interval()
+            next_boundary = self.next_boundary(finished, interval)
+            # Boundaries that passed while the tick was running
+            missed = max(0, math.ceil((next_boundary - boundary) / interval - 1e-9) - 1)
+            stats.skipped += missed
+
+            logger.info(
+                "Tick %d done in %.2fs (lag %.3fs, skipped %d this tick, %d total)",
+                stats.ticks, stats.last_duration, lag, missed, stats.skipped,
+            )
+            if missed:
+                logger.warning(
+                    "Tick overran the %.0fs interval, skipped %d tick(s)", interval, missed
+                )
+
+            boundary = next_boundary
+            if max_ticks is not None and stats.ticks >= max_ticks:
+                break
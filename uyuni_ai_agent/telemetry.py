@@ -0,0 +1,341 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a PromQL query (ms) to a full LLM investigation (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> value
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, key, value, *extra in self._samples():
+            labels = _format_labels(self.label_names, key, extra[0] if extra else ())
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """Mirror a counter that is kept elsewhere (e.g. the Salt cache's hits)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; observe() is one bisect and three adds."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            states = [(key, list(counts), count, total) for key, (counts, count, total) in self._values.items()]
+        samples = []
+        for key, counts, count, total in states:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                samples.append(("_bucket", key, cumulative, (("le", _format_value(bound)),)))
+            samples.append(("_count", key, count))
+            samples.append(("_sum", key, total))
+        return samples
+
+
+class Registry:
+    """The agent's own metrics, rendered in the Prometheus text format.
+
+    Collectors registered with on_collect() run at scrape time, so gauges
+    mirroring other components' state (queue depth, cache counters) cost
+    nothing between scrapes.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def on_collect(self, collector):
+        """Run `collector()` before every render; returns it for removal."""
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def remove_collector(self, collector):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def render(self):
+        with self._lock:
+            collectors, metrics = list(self._collectors), list(self._metrics)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.debug("telemetry: collector failed: %s", e)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ── Pipeline ──
+
+stage_seconds = registry.histogram(
+    "uyuni_agent_stage_duration_seconds",
+    "Time spent per pipeline stage (ingest, detect, intelligence, action).",
+    ("stage",),
+)
+stage_errors = registry.counter(
+    "uyuni_agent_stage_errors_total", "Pipeline stage failures.", ("stage",),
+)
+tick_seconds = registry.histogram(
+    "uyuni_agent_tick_duration_seconds", "Duration of a whole polling tick.",
+)
+tick_lag = registry.gauge(
+    "uyuni_agent_tick_lag_seconds", "How late the last tick started after its boundary.",
+)
+ticks_total = registry.counter("uyuni_agent_ticks_total", "Polling ticks run.")
+ticks_skipped = registry.counter(
+    "uyuni_agent_ticks_skipped_total", "Tick boundaries skipped because a tick overran.",
+)
+anomalies_total = registry.counter(
+    "uyuni_agent_anomalies_total", "Anomalies handed to investigation, per metric and severity.",
+    ("metric", "severity"),
+)
+
+# ── Prometheus and Salt ──
+
+promql_seconds = registry.histogram(
+    "uyuni_agent_promql_duration_seconds", "PromQL query latency.", ("query", "kind"),
+)
+promql_errors = registry.counter(
+    "uyuni_agent_promql_errors_total", "Failed PromQL queries.", ("query", "kind"),
+)
+salt_seconds = registry.histogram(
+    "uyuni_agent_salt_duration_seconds",
+    "Salt API request latency per function; a batched request counts for each of its functions.",
+    ("function", "request"),
+)
+salt_errors = registry.counter(
+    "uyuni_agent_salt_errors_total",
+    "Failed Salt API requests per function; a batched request counts for each of its functions.",
+    ("function", "request"),
+)
+
+# ── LLM ──
+
+llm_turns = registry.histogram(
+    "uyuni_agent_llm_turns", "LLM turns (model responses) per investigation.",
+    buckets=COUNT_BUCKETS,
+)
+llm_tokens = registry.counter(
+    "uyuni_agent_llm_tokens_total", "LLM tokens used, as reported by the provider.",
+    ("direction",),
+)
+investigations_total = registry.counter(
+    "uyuni_agent_investigations_total", "Investigations run, by outcome.", ("outcome",),
+)
+tool_calls = registry.counter(
+    "uyuni_agent_tool_calls_total",
+    "Tool calls, made by the agent or prefetched before it ran.", ("tool", "source"),
+)
+tool_timeouts = registry.counter(
+    "uyuni_agent_tool_timeouts_total",
+    "Agent tool calls abandoned at their per-tool timeout.", ("tool",),
+)
+
+# ── Mirrored component state (filled in at scrape time) ──
+
+queue_depth = registry.gauge(
+    "uyuni_agent_queue_depth", "Pending investigations by severity.", ("severity",),
+)
+queue_in_flight = registry.gauge(
+    "uyuni_agent_queue_in_flight", "Investigations currently running.",
+)
+queue_jobs = registry.counter(
+    "uyuni_agent_queue_jobs_total",
+    "Investigation queue events (enqueued, coalesced, dropped, evicted, completed, failed).",
+    ("event",),
+)
+queue_wait_max = registry.gauge(
+    "uyuni_agent_queue_wait_max_seconds", "Longest time a job waited in the queue.",
+)
+salt_cache = registry.counter(
+    "uyuni_agent_salt_cache_total", "Salt result cache lookups by outcome.", ("outcome",),
+)
+salt_jobs_pending = registry.gauge(
+    "uyuni_agent_salt_jobs_pending", "Async Salt jobs waiting for returns.",
+)
+alerts_total = registry.counter(
+    "uyuni_agent_alerts_total", "Alerts handed to AlertManager, by outcome.", ("outcome",),
+)
+alerts_buffered = registry.gauge(
+    "uyuni_agent_alerts_buffered", "Alerts waiting for the next AlertManager batch.",
+)
+
+
+def record_agent_messages(messages):
+    """Count LLM turns, tokens and tool calls from one agent run's messages."""
+    turns = 0
+    for message in messages:
+        if getattr(message, "type", None) != "ai":
+            continue
+        turns += 1
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage.get("input_tokens"):
+            llm_tokens.inc(usage["input_tokens"], direction="input")
+        if usage.get("output_tokens"):
+            llm_tokens.inc(usage["output_tokens"], direction="output")
+        for call in getattr(message, "tool_calls", None) or []:
+            tool_calls.inc(tool=call.get("name", ""), source="agent")
+    llm_turns.observe(turns)
+
+
+class TelemetryServer:
+    """Serves registry.render() on GET /metrics from a background thread."""
+
+    def __init__(self, registry=registry):
+        self.registry = registry
+        self._server = None
+        self._thread = None
+
+    def _handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, host, port):
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="telemetry", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            "telemetry: serving http://%s:%d/metrics", host, self._server.server_address[1]
+        )
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
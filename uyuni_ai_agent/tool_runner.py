@@ -0,0 +1,117 @@
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager, nullcontext
+
+from langchain_core.messages import ToolMessage
+from langgraph.prebuilt import ToolNode
+
+from uyuni_ai_agent.config import get_settings
+from uyuni_ai_agent.telemetry import tool_timeouts
+
+logger = logging.getLogger(__name__)
+
+
+class MinionLimiter:
+    """Caps how many agent tool calls run at once on each minion.
+
+    Shared by every investigation, so two incidents on the same minion
+    together stay within the limit. The limit is read per call; after a
+    reload that changes it, new calls use a fresh semaphore.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._semaphores = {}  # minion_id -> (limit, semaphore)
+
+    def _semaphore(self, minion_id, limit):
+        with self._lock:
+            current = self._semaphores.get(minion_id)
+            if current is None or current[0] != limit:
+                current = (limit, threading.BoundedSemaphore(limit))
+                self._semaphores[minion_id] = current
+            return current[1]
+
+    @contextmanager
+    def slot(self, minion_id, limit):
+        """Hold one of the minion's `limit` slots for the duration of the block."""
+        semaphore = self._semaphore(minion_id, limit)
+        with semaphore:
+            yield
+
+
+# Shared instance used by the agent's tool node
+minion_limiter = MinionLimiter()
+
+
+def _timed_out(call, minion_id, timeout):
+    name = call["name"]
+    tool_timeouts.inc(tool=name)
+    logger.warning("Tool %s on %s timed out after %gs", name, minion_id, timeout)
+    return ToolMessage(
+        content=(
+            f"{name} timed out after {timeout:g}s; the command may still be running "
+            "on the minion. Continue with the evidence you have."
+        ),
+        name=name,
+        tool_call_id=call["id"],
+        status="error",
+    )
+
+
+def limited_tool_call(request, execute):
+    """wrap_tool_call interceptor: per-minion limit and per-tool timeout.
+
+    The call runs on its own thread so the agent gets a timeout message
+    back after `tools.call_timeouts[name]` (or `tools.call_timeout_seconds`)
+    even while Salt is still working; time spent waiting for a minion
+    slot counts towards the timeout, and a call that times out before
+    it gets a slot is not started.
+    """
+    cfg = get_settings().tools
+    call = request.tool_call
+    minion_id = (call.get("args") or {}).get("minion_id")
+    timeout = cfg.call_timeouts.get(call["name"], cfg.call_timeout_seconds)
+
+    def slot():
+        if minion_id is None:
+            return nullcontext()
+        return minion_limiter.slot(minion_id, cfg.per_minion_concurrency)
+
+    if not timeout:
+        with slot():
+            return execute(request)
+
+    future = Future()
+    abandoned = threading.Event()
+
+    def work():
+        with slot():
+            if abandoned.is_set():
+                return
+            try:
+                future.set_result(execute(request))
+            except BaseException as e:
+                future.set_exception(e)
+
+    # Copy the context so per-investigation state (fixtures) follows the call
+    context = contextvars.copy_context()
+    threading.Thread(
+        target=context.run, args=(work,), name=f"tool-{call['name']}", daemon=True
+    ).start()
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        abandoned.set()
+        return _timed_out(call, minion_id, timeout)
+
+
+def build_tool_node(tools):
+    """The agent's ToolNode, running every call through limited_tool_call.
+
+    A turn's tool calls run concurrently, up to the graph run's
+    max_concurrency (`tools.max_parallel_calls`), and their results come
+    back in the order the model asked for them.
+    """
+    return ToolNode(tools, wrap_tool_call=limited_tool_call)
@@ -1,5 +1,22 @@
 from langchain_core.tools import tool
 from uyuni_ai_agent.salt_api import salt_client
+from uyuni_ai_agent.tools.compaction import compact_output
+
+APACHE_STATUS_COMMAND = "curl -s http://localhost/server-status?auto"
+
+APACHE_CONFIG_CHECK_COMMAND = (
+    "apachectl -t 2>&1 && apachectl -V | grep -i mpm && "
+    "grep -rh 'MaxRequestWorkers\\|ServerLimit\\|MaxConnectionsPerChild' "
+    "/etc/apache2/ 2>/dev/null || echo 'Using defaults'"
+)
+
+
+def apache_error_log_command(lines=50):
+    return f"tail -n {lines} /var/log/apache2/error.log"
+
+
+def apache_access_log_command(lines=50):
+    return f"tail -n {lines} /var/log/apache2/access.log"
 
 
 @tool
@@ -12,10 +29,8 @@ def get_apache_status(minion_id: str) -> str:
     - Requests per second and bytes per request
     - Scoreboard showing worker states
     """
-    return salt_client.run_command(
-        minion_id,
-        "curl -s http://localhost/server-status?auto"
-    )
+    output = salt_client.run_command(minion_id, APACHE_STATUS_COMMAND)
+    return compact_output("get_apache_status", output)
 
 
 @tool
@@ -25,10 +40,8 @@ def get_apache_error_log(minion_id: str, lines: int = 50) -> str:
     Returns the last N lines from /var/log/apache2/error.log.
     Look for [error] and [crit] entries, module errors, and segfaults.
     """
-    return salt_client.run_command(
-        minion_id,
-        f"tail -n {lines} /var/log/apache2/error.log"
-    )
+    output = salt_client.run_command(minion_id, apache_error_log_command(lines))
+    return compact_output("get_apache_error_log", output)
 
 
 @tool
@@ -38,10 +51,8 @@ def get_apache_access_log(minion_id: str, lines: int = 50) -> str:
     Returns the last N lines from /var/log/apache2/access.log.
     Useful for identifying traffic spikes, suspicious IPs, or slow requests.
     """
-    return salt_client.run_command(
-        minion_id,
-        f"tail -n {lines} /var/log/apache2/access.log"
-    )
+    output = salt_client.run_command(minion_id, apache_access_log_command(lines))
+    return compact_output("get_apache_access_log", output)
 
 
 @tool
@@ -51,9 +62,5 @@ def get_apache_config_check(minion_id: str) -> str:
     Returns the output of apachectl -t (config test) and the current
     MPM configuration (MaxRequestWorkers, ServerLimit, etc.).
     """
-    return salt_client.run_command(
-        minion_id,
-        "apachectl -t 2>&1 && apachectl -V | grep -i mpm && "
-        "grep -rh 'MaxRequestWorkers\\|ServerLimit\\|MaxConnectionsPerChild' "
-        "/etc/apache2/ 2>/dev/null || echo 'Using defaults'"
-    )
+    output = salt_client.run_command(minion_id, APACHE_CONFIG_CHECK_COMMAND)
+    return compact_output("get_apache_config_check", output)
@@ -0,0 +1,275 @@
+import ast
+import logging
+import re
+
+from uyuni_ai_agent.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token for English text and shell output
+CHARS_PER_TOKEN = 4
+MAX_CELL = 100
+
+# Outputs that are errors from our own client are passed through untouched
+_PASSTHROUGH_PREFIXES = ("Salt API call failed", "No response from minion")
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _cell(value, width=MAX_CELL):
+    value = " ".join(str(value).split())
+    return value if len(value) <= width else value[:width - 3] + "..."
+
+
+# ── Tables ──
+
+def compact_ps(text):
+    """ps aux -> PID USER %CPU %MEM RSS STAT COMMAND, RSS in MB."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].split()[:2] == ["USER", "PID"]:
+        return text
+    rows = ["PID USER %CPU %MEM RSS_MB STAT COMMAND"]
+    for line in lines[1:]:
+        parts = line.split(None, 10)
+        if len(parts) < 11:
+            continue
+        user, pid, cpu, mem, _vsz, rss, _tty, stat, _start, _time, command = parts
+        rss_mb = f"{int(rss) / 1024:.0f}" if rss.isdigit() else rss
+        rows.append(f"{pid} {user} {cpu} {mem} {rss_mb} {stat} {_cell(command)}")
+    return "\n".join(rows)
+
+
+_SS_PROCESS = re.compile(r'\("([^"]+)",pid=(\d+)')
+
+
+def compact_ss(text):
+    """ss -tlnp -> one line per listening socket: address, queue, process."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith("State"):
+        return text
+    rows = ["LOCAL RECV-Q/SEND-Q PROCESS"]
+    seen = set()
+    for line in lines[1:]:
+        parts = line.split(None, 5)
+        if len(parts) < 5:
+            continue
+        recv_q, send_q, local = parts[1], parts[2], parts[3]
+        process = parts[5] if len(parts) > 5 else ""
+        procs = sorted({f"{name}/{pid}" for name, pid in _SS_PROCESS.findall(process)})
+        row = f"{local} {recv_q}/{send_q} {','.join(procs) or '-'}"
+        if row not in seen:
+            seen.add(row)
+            rows.append(row)
+    return "\n".join(rows)
+
+
+def compact_disk_usage(text):
+    """disk.usage dict -> MOUNT USE% USED/SIZE FILESYSTEM, fullest first."""
+    try:
+        usage = ast.literal_eval(text) if isinstance(text, str) else text
+    except (ValueError, SyntaxError):
+        return text
+    if not isinstance(usage, dict):
+        return text
+    mounts = []
+    for mount, info in usage.items():
+        if not isinstance(info, dict):
+            continue
+        try:
+            size_gb = int(info.get("1K-blocks", 0)) / 1024 ** 2
+            used_gb = int(info.get("used", 0)) / 1024 ** 2
+        except (TypeError, ValueError):
+            continue
+        if size_gb == 0:
+            continue  # pseudo filesystems
+        capacity = str(info.get("capacity", "")).rstrip("%") or "0"
+        mounts.append((int(capacity) if capacity.isdigit() else 0, mount, used_gb, size_gb,
+                       info.get("filesystem", "")))
+    if not mounts:
+        return text
+    mounts.sort(reverse=True)
+    rows = ["MOUNT USE% USED/SIZE(GB) FILESYSTEM"]
+    for capacity, mount, used_gb, size_gb, filesystem in mounts:
+        rows.append(f"{mount} {capacity}% {used_gb:.1f}/{size_gb:.1f} {filesystem}")
+    return "\n".join(rows)
+
+
+_PSQL_RULE = re.compile(r"^-+(\+-+)*$")
+
+
+def compact_psql(text):
+    """psql aligned table -> pipe-separated rows, empty columns dropped."""
+    lines = text.splitlines()
+    rule = next((i for i, line in enumerate(lines) if _PSQL_RULE.match(line.strip())), None)
+    if rule is None or rule == 0:
+        return text
+    header = [h.strip() for h in lines[rule - 1].split("|")]
+    rows, footer = [], ""
+    for line in lines[rule + 1:]:
+        if re.match(r"^\(\d+ rows?\)$", line.strip()):
+            footer = line.strip()
+            break
+        if not line.strip():
+            continue
+        cells = [c.strip() for c in line.split("|")]
+        extra = len(cells) - len(header)
+        if extra > 0:
+            # A "|" inside a value: fold the extra cells back into the
+            # query text column (or the last one)
+            at = next((i for i, h in enumerate(header) if "query" in h), len(header) - 1)
+            cells = cells[:at] + [" | ".join(cells[at:at + extra + 1])] + cells[at + extra + 1:]
+        rows.append(cells + [""] * (len(header) - len(cells)))
+    keep = [i for i in range(len(header)) if any(row[i] for row in rows)] or list(range(len(header)))
+    out = [" | ".join(header[i] for i in keep)]
+    out += [" | ".join(_cell(row[i]) for i in keep) for row in rows]
+    if footer:
+        out.append(footer)
+    return "\n".join(out)
+
+
+def compact_apache_status(text):
+    """mod_status ?auto -> same keys, with the Scoreboard summarised as counts."""
+    out = []
+    for line in text.splitlines():
+        if line.startswith("Scoreboard:"):
+            board = line.split(":", 1)[1].strip()
+            counts = {}
+            for slot in board:
+                counts[slot] = counts.get(slot, 0) + 1
+            summary = ", ".join(f"'{slot}'={n}" for slot, n in sorted(counts.items()))
+            out.append(f"Scoreboard: {len(board)} slots: {summary}")
+        else:
+            out.append(line)
+    return "\n".join(out)
+
+
+# ── Logs ──
+
+_LOG_VARIABLES = [
+    # ISO 8601 / PostgreSQL timestamps
+    (re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?: ?(?:[+-]\d{2}:?\d{2}|Z|[A-Z]{2,5}))?"), "<ts>"),
+    # Apache error log: [Mon Oct 18 10:00:00.123456 2026]
+    (re.compile(r"\[\w{3} \w{3} +\d{1,2} [\d:.]+ \d{4}\]"), "<ts>"),
+    # Access log: [18/Oct/2026:10:00:00 +0000]
+    (re.compile(r"\[\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2} [+-]\d{4}\]"), "<ts>"),
+    # syslog / journal: Oct 18 10:00:00
+    (re.compile(r"\b\w{3} +\d{1,2} \d{2}:\d{2}:\d{2}\b"), "<ts>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b|\b[0-9a-f]{12,}\b"), "<hex>"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "<n>"),
+]
+
+
+def log_template(line):
+    """Replace the variable parts of a log line (times, IPs, numbers) with placeholders."""
+    for pattern, placeholder in _LOG_VARIABLES:
+        line = pattern.sub(placeholder, line)
+    return line
+
+
+def collapse_log(text):
+    """Collapse repeated log lines into counted templates, in first-seen order.
+
+    A line seen once is kept as is; a repeated template becomes
+    "[xN] <most recent occurrence>".
+    """
+    groups = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        template = log_template(line)
+        count, _ = groups.get(template, (0, None))
+        groups[template] = (count + 1, line)
+    if not groups:
+        return text
+    return "\n".join(
+        line if count == 1 else f"[x{count}] {line}"
+        for count, line in groups.values()
+    )
+
+
+# ── Budget ──
+
+def truncate_to_budget(text, max_tokens):
+    """Keep the head and tail of `text` within roughly `max_tokens` tokens.
+
+    The cut is marked so the agent knows output was omitted.
+    """
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens * CHARS_PER_TOKEN
+    head_budget, tail_budget = budget * 2 // 3, budget // 3
+    lines = text.splitlines()
+
+    head, used = [], 0
+    for line in lines:
+        if used + len(line) + 1 > head_budget:
+            break
+        head.append(line)
+        used += len(line) + 1
+    tail, used = [], 0
+    for line in reversed(lines[len(head):]):
+        if used + len(line) + 1 > tail_budget:
+            break
+        tail.insert(0, line)
+        used += len(line) + 1
+    if not head and not tail:
+        # One huge line
+        return f"{text[:head_budget]}\n... [~{estimate_tokens(text) - max_tokens} tokens omitted] ..."
+
+    omitted = lines[len(head):len(lines) - len(tail)]
+    omitted_tokens = estimate_tokens("\n".join(omitted))
+    marker = f"... [{len(omitted)} lines, ~{omitted_tokens} tokens omitted] ..."
+    return "\n".join(head + [marker] + tail)
+
+
+# Tool name -> parser that re-renders its raw output compactly
+COMPACTORS = {
+    "get_top_memory_processes": compact_ps,
+    "get_top_cpu_processes": compact_ps,
+    "get_disk_usage": compact_disk_usage,
+    "get_listening_ports": compact_ss,
+    "get_apache_status": compact_apache_status,
+    "get_apache_error_log": collapse_log,
+    "get_apache_access_log": collapse_log,
+    "get_postgres_log": collapse_log,
+    "get_service_logs": collapse_log,
+    "get_postgres_active_queries": compact_psql,
+    "get_postgres_locks": compact_psql,
+    "get_postgres_connections": compact_psql,
+}
+
+
+def compact_output(tool_name, output):
+    """Compact one tool's raw output and hold it to the tool's token budget.
+
+    Tables (ps, ss, disk.usage, psql) keep only the columns the agent
+    reasons about, logs are collapsed into counted templates, and the
+    result is cut to `tools.token_budget` with a head/tail marker.
+
+    Args:
+        tool_name: name of the tool that produced the output
+        output: raw Salt return (usually a string)
+
+    Returns:
+        the text to hand to the LLM.
+    """
+    cfg = get_settings().tools
+    text = output if isinstance(output, str) else str(output)
+    if not cfg.compaction or text.startswith(_PASSTHROUGH_PREFIXES):
+        return text
+    compactor = COMPACTORS.get(tool_name)
+    compacted = text
+    if compactor is not None:
+        try:
+            compacted = compactor(text)
+        except Exception as e:
+            logger.debug("compaction: %s parser failed, using raw output: %s", tool_name, e)
+    compacted = truncate_to_budget(compacted, cfg.token_budgets.get(tool_name, cfg.token_budget))
+    logger.debug(
+        "compaction: %s ~%d -> ~%d tokens",
+        tool_name, estimate_tokens(text), estimate_tokens(compacted),
+    )
+    return compacted
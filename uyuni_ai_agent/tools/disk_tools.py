@@ -1,6 +1,11 @@
 from langchain_core.tools import tool
 
 from uyuni_ai_agent.salt_api import salt_client
+from uyuni_ai_agent.tools.compaction import compact_output
+
+
+def large_files_command(path="/", min_size="100M"):
+    return f"find {path} -type f -size +{min_size} 2>/dev/null | head -20"
 
 
 @tool
@@ -9,7 +14,8 @@ def get_disk_usage(minion_id: str) -> str:
     Use this when you detect high disk usage and need to see which
     partitions are filling up.
     """
-    return salt_client.disk_usage(minion_id)
+    output = salt_client.disk_usage(minion_id)
+    return compact_output("get_disk_usage", output)
 
 
 @tool
@@ -21,5 +27,5 @@ def find_large_files(minion_id: str, path: str = "/", min_size: str = "100M") ->
         path: directory to search in (default: /)
         min_size: minimum file size to report (default: 100M)
     """
-    cmd = f"find {path} -type f -size +{min_size} 2>/dev/null | head -20"
-    return salt_client.run_command(minion_id, cmd)
+    output = salt_client.run_command(minion_id, large_files_command(path, min_size))
+    return compact_output("find_large_files", output)
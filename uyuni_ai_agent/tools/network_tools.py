@@ -1,6 +1,9 @@
 from langchain_core.tools import tool
 
 from uyuni_ai_agent.salt_api import salt_client
+from uyuni_ai_agent.tools.compaction import compact_output
+
+LISTENING_PORTS_COMMAND = "ss -tlnp"
 
 
 @tool
@@ -9,7 +12,8 @@ def check_connectivity(minion_id: str, target: str) -> str:
     Use this when you suspect network issues are causing service problems.
     """
     cmd = f"ping -c 3 {target}"
-    return salt_client.run_command(minion_id, cmd)
+    output = salt_client.run_command(minion_id, cmd)
+    return compact_output("check_connectivity", output)
 
 
 @tool
@@ -17,4 +21,5 @@ def get_listening_ports(minion_id: str) -> str:
     """Get all listening TCP ports on a minion.
     Use this to verify which services have their ports open and listening.
     """
-    return salt_client.run_command(minion_id, "ss -tlnp")
+    output = salt_client.run_command(minion_id, LISTENING_PORTS_COMMAND)
+    return compact_output("get_listening_ports", output)
@@ -1,6 +1,15 @@
 from langchain_core.tools import tool
 
 from uyuni_ai_agent.salt_api import salt_client
+from uyuni_ai_agent.tools.compaction import compact_output
+
+
+def top_memory_command(top_n=10):
+    return f"ps aux --sort=-%mem | head -n {top_n + 1}"
+
+
+def top_cpu_command(top_n=10):
+    return f"ps aux --sort=-%cpu | head -n {top_n + 1}"
 
 
 @tool
@@ -9,8 +18,8 @@ def get_top_memory_processes(minion_id: str, top_n: int = 10) -> str:
     Use this when you detect high memory usage and need to find which
     processes are consuming the most RAM.
     """
-    cmd = f"ps aux --sort=-%mem | head -n {top_n + 1}"
-    return salt_client.run_command(minion_id, cmd)
+    output = salt_client.run_command(minion_id, top_memory_command(top_n))
+    return compact_output("get_top_memory_processes", output)
 
 
 @tool
@@ -19,5 +28,5 @@ def get_top_cpu_processes(minion_id: str, top_n: int = 10) -> str:
     Use this when you detect high CPU usage and need to find which
     processes are consuming the most CPU.
     """
-    cmd = f"ps aux --sort=-%cpu | head -n {top_n + 1}"
-    return salt_client.run_command(minion_id, cmd)
+    output = salt_client.run_command(minion_id, top_cpu_command(top_n))
+    return compact_output("get_top_cpu_processes", output)
@@ -1,6 +1,7 @@
 from langchain_core.tools import tool
 
 from uyuni_ai_agent.salt_api import salt_client
+from uyuni_ai_agent.tools.compaction import compact_output
 
 
 @tool
@@ -24,4 +25,5 @@ def get_service_logs(minion_id: str, service: str, lines: int = 50) -> str:
     Use this when a service is down or misbehaving and you need to
     check the logs for errors.
     """
-    return salt_client.service_logs(minion_id, service, lines)
+    output = salt_client.service_logs(minion_id, service, lines)
+    return compact_output("get_service_logs", output)
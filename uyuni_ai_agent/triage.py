@@ -0,0 +1,113 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TriageAnalysis(str):
+    """An analysis written by a triage rule; `rule` is the rule's name."""
+
+    def __new__(cls, text, rule):
+        analysis = super().__new__(cls, text)
+        analysis.rule = rule
+        return analysis
+
+
+class _Fields(dict):
+    """Template values; a named group that did not take part renders as '?'."""
+
+    def __missing__(self, key):
+        return "?"
+
+
+def _line_at(text, position):
+    start = text.rfind("\n", 0, position) + 1
+    end = text.find("\n", position)
+    return text[start:] if end == -1 else text[start:end]
+
+
+def match_rule(rule, metrics, evidence):
+    """Match one rule against a minion's evidence.
+
+    Every condition must find at least `min_matches` matches of its
+    pattern in the named tool's output. A rule limited to `metrics`
+    applies only if it covers every metric under investigation.
+
+    Args:
+        rule: a TriageRule
+        metrics: the anomaly metric names being investigated
+        evidence: list of (tool_name, output) pairs
+
+    Returns:
+        (fields, lines) for the template, or None if the rule does not match.
+        `fields` holds the named groups of each condition's first match
+        and `count`, the first condition's number of matches; `lines`
+        holds one "tool: line" per condition, quoting its first match.
+    """
+    if rule.metrics and not set(metrics) <= set(rule.metrics):
+        return None
+    outputs = dict(evidence)
+    fields, lines = {}, []
+    for condition in rule.conditions:
+        output = outputs.get(condition.tool)
+        if output is None:
+            return None
+        output = str(output)
+        matches = list(condition.pattern.finditer(output))
+        if len(matches) < condition.min_matches:
+            return None
+        first = matches[0]
+        for key, value in first.groupdict().items():
+            if value is not None:
+                fields.setdefault(key, value)
+        fields.setdefault("count", len(matches))
+        # Quote the line the match ends on (a pattern may anchor on a header)
+        line = _line_at(output, max(first.start(), first.end() - 1))
+        lines.append(f"{condition.tool}: {line.strip()}")
+    return fields, lines
+
+
+def render(rule, fields, lines):
+    """Fill a matched rule's templates in the system prompt's response format."""
+    fields = _Fields(fields)
+    evidence = [t.format_map(fields) for t in rule.evidence] or lines
+    parts = [f"**Root Cause:** {rule.root_cause.format_map(fields)}", "", "**Key Evidence:**"]
+    parts += [f"- {line}" for line in evidence]
+    parts += ["", "**Remediation:**"]
+    parts += [f"{i}. {step.format_map(fields)}" for i, step in enumerate(rule.remediation, 1)]
+    parts += ["", f"**Urgency:** {rule.urgency}"]
+    return "\n".join(parts)
+
+
+def triage(cfg, metrics, minion_id, severity, value, evidence):
+    """Answer an investigation from its prefetched evidence, if a rule matches.
+
+    Rules are tried in configuration order and the first match wins.
+
+    Args:
+        cfg: TriageSettings
+        metrics: the anomaly metric names being investigated
+        minion_id: the investigated minion
+        severity: severity value
+        value: the anomaly's current value, or None for an incident
+        evidence: list of (tool_name, output) pairs from that minion
+
+    Returns:
+        a TriageAnalysis, or None when the LLM has to investigate.
+    """
+    if not cfg.enabled or not cfg.rules or not evidence:
+        return None
+    for rule in cfg.rules:
+        matched = match_rule(rule, metrics, evidence)
+        if matched is None:
+            continue
+        fields, lines = matched
+        fields = dict(
+            fields,
+            minion_id=minion_id,
+            metric=", ".join(metrics),
+            severity=severity,
+            value="?" if value is None else f"{value:.1f}",
+        )
+        logger.info("Triage rule '%s' matched on %s", rule.name, minion_id)
+        return TriageAnalysis(render(rule, fields, lines), rule.name)
+    return None
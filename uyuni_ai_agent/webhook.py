@@ -0,0 +1,291 @@
+import datetime
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from uyuni_ai_agent.alert_manager import ALERT_SOURCE
+from uyuni_ai_agent.anomaly_detector import RULES, AlertSeverity, Anomaly, _resolve_thresholds
+from uyuni_ai_agent.config import config_manager, get_settings
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = {severity.value: severity for severity in AlertSeverity}
+
+# Labels that may name the affected host, in lookup order
+MINION_LABELS = ("minion", "minion_id", "instance", "host", "hostname", "nodename")
+
+# Anomaly metric name -> path into the `thresholds` config
+THRESHOLD_PATHS = {metric_name: path for _, path, metric_name, _, _ in RULES}
+
+# Fingerprints Alertmanager has not re-sent for this long are forgotten
+# (it re-sends firing alerts every repeat_interval, typically hours)
+FORGET_SECONDS = 86400
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_time(value):
+    """Parse an Alertmanager RFC 3339 timestamp; None if absent or zero."""
+    if not value or value.startswith("0001-"):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def minion_index(minions):
+    """Map every name a minion may appear under in alert labels to it.
+
+    Covers the minion ID, its exporter instances ("host:port") and the
+    bare host part of each instance.
+    """
+    index = {}
+    for minion in minions:
+        for name in (minion.id, minion.instance, minion.apache_instance, minion.postgres_instance):
+            if name:
+                index.setdefault(name, minion)
+                index.setdefault(name.rsplit(":", 1)[0], minion)
+    return index
+
+
+def alert_fingerprint(alert):
+    """Alertmanager's fingerprint, or a hash of the labels if it sent none."""
+    if alert.get("fingerprint"):
+        return alert["fingerprint"]
+    labels = json.dumps(alert.get("labels") or {}, sort_keys=True)
+    return hashlib.sha1(labels.encode()).hexdigest()[:16]
+
+
+def alert_to_anomaly(alert, minions, cfg, thresholds=None):
+    """Map one webhook alert onto an Anomaly for a configured minion.
+
+    Args:
+        alert: one entry of the webhook payload's "alerts" list
+        minions: minion_index() of the configured minions
+        cfg: WebhookSettings
+        thresholds: the `thresholds` config, for alerts without a
+            "threshold" annotation on a metric the agent knows
+
+    Returns:
+        Anomaly, or None for alerts the agent sent itself and alerts
+        whose labels name no configured minion.
+    """
+    labels = alert.get("labels") or {}
+    annotations = alert.get("annotations") or {}
+    if labels.get("source") == ALERT_SOURCE:
+        return None
+    minion = next(
+        (minions[labels[label]] for label in MINION_LABELS if labels.get(label) in minions),
+        None,
+    )
+    if minion is None:
+        logger.debug("webhook: no configured minion in labels %s", labels)
+        return None
+
+    alertname = labels.get("alertname", "")
+    metric_name = labels.get("metric") or cfg.alertname_metrics.get(alertname) or alertname
+    severity = SEVERITIES.get(str(labels.get("severity", "")).lower(), AlertSeverity.WARNING)
+    threshold = _float(annotations.get("threshold"))
+    if threshold is None and metric_name in THRESHOLD_PATHS:
+        configured = _resolve_thresholds(thresholds or {}, THRESHOLD_PATHS[metric_name])
+        threshold = _float(configured.get(severity.value))
+    return Anomaly(
+        minion_id=minion.id,
+        metric_name=metric_name,
+        current_value=_float(annotations.get("value")) or 0.0,
+        threshold=threshold or 0.0,
+        severity=severity,
+        description=annotations.get("description") or annotations.get("summary") or alertname,
+    )
+
+
+@dataclass
+class WebhookStats:
+    """Counters for the webhook receiver."""
+    payloads: int = 0
+    rejected: int = 0
+    firing: int = 0
+    duplicates: int = 0
+    resolved: int = 0
+    ignored: int = 0
+
+
+class WebhookReceiver:
+    """HTTP endpoint for Alertmanager webhook notifications.
+
+    The request thread only parses the JSON body and buffers it, then
+    answers 202 Accepted; when `max_pending` payloads are already
+    buffered it answers 503 so Alertmanager retries later. One
+    dispatcher thread maps the alerts onto Anomaly objects and hands
+    them to the investigation stage.
+
+    Alertmanager re-sends firing alerts on every group_interval and
+    repeat_interval. A firing alert whose fingerprint was already handed
+    on, at the same severity, within `dedupe_seconds` is dropped.
+
+    Args:
+        on_firing: callable(list of Anomaly) run on the dispatcher thread
+        on_resolved: callable(anomaly, starts_at) for alerts that cleared
+            after being handed on
+    """
+
+    def __init__(self, on_firing, on_resolved, clock=time.time):
+        self.on_firing = on_firing
+        self.on_resolved = on_resolved
+        self.clock = clock
+        self.stats = WebhookStats()
+        self._payloads = None
+        self._seen = {}  # fingerprint -> (severity, handed on at, last received)
+        self._server = None
+        self._threads = []
+        self._stopped = threading.Event()
+
+    # ── HTTP side ──
+
+    def accept(self, payload):
+        """Buffer one webhook payload. Returns False if the buffer is full."""
+        try:
+            self._payloads.put_nowait(payload)
+        except queue.Full:
+            self.stats.rejected += 1
+            return False
+        self.stats.payloads += 1
+        return True
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body=b""):
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if self.path.split("?", 1)[0] != get_settings().webhook.path:
+                    self._reply(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._reply(400, b"invalid JSON\n")
+                    return
+                if not isinstance(payload, dict):
+                    self._reply(400, b"expected a JSON object\n")
+                    return
+                if receiver.accept(payload):
+                    self._reply(202)
+                else:
+                    self._reply(503, b"busy\n")
+
+            def do_GET(self):
+                if self.path == "/healthz":
+                    self._reply(200, b"ok\n")
+                else:
+                    self._reply(404)
+
+            def log_message(self, format, *args):
+                logger.debug("webhook: %s %s", self.address_string(), format % args)
+
+        return Handler
+
+    # ── Dispatcher side ──
+
+    def process(self, payload):
+        """Map a payload's alerts, drop duplicates and hand the rest on."""
+        config_manager.refresh()
+        settings = get_settings()
+        cfg = settings.webhook
+        now = self.clock()
+        self._seen = {
+            fp: seen for fp, seen in self._seen.items() if now - seen[2] < FORGET_SECONDS
+        }
+
+        minions = minion_index(settings.minions)
+        firing = []
+        for alert in payload.get("alerts") or []:
+            anomaly = alert_to_anomaly(alert, minions, cfg, settings.thresholds)
+            if anomaly is None:
+                self.stats.ignored += 1
+                continue
+            fp = alert_fingerprint(alert)
+            if alert.get("status", payload.get("status")) == "resolved":
+                if self._seen.pop(fp, None) is not None:
+                    self.stats.resolved += 1
+                    self.on_resolved(anomaly, _parse_time(alert.get("startsAt")))
+                continue
+            seen = self._seen.get(fp)
+            if (
+                seen is not None and seen[0] == anomaly.severity
+                and now - seen[1] < cfg.dedupe_seconds
+            ):
+                self._seen[fp] = (seen[0], seen[1], now)
+                self.stats.duplicates += 1
+                continue
+            self._seen[fp] = (anomaly.severity, now, now)
+            firing.append(anomaly)
+
+        if firing:
+            self.stats.firing += len(firing)
+            logger.info(
+                "webhook: %d firing alerts from %s",
+                len(firing), payload.get("receiver", "alertmanager"),
+            )
+            self.on_firing(firing)
+
+    def _dispatch(self):
+        while not self._stopped.is_set():
+            try:
+                payload = self._payloads.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self.process(payload)
+            except Exception as e:
+                logger.error("webhook: processing payload failed: %s", e, exc_info=True)
+
+    # ── Lifecycle ──
+
+    def start(self):
+        """Bind the listener and start the server and dispatcher threads."""
+        cfg = get_settings().webhook
+        self._payloads = queue.Queue(maxsize=cfg.max_pending)
+        self._stopped.clear()
+        self._server = ThreadingHTTPServer((cfg.host, cfg.port), self._handler())
+        self._server.daemon_threads = True
+        for name, target in (("webhook-http", self._server.serve_forever),
+                             ("webhook-dispatch", self._dispatch)):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(
+            "webhook: listening on http://%s:%d%s",
+            cfg.host, self._server.server_address[1], cfg.path,
+        )
+
+    def wait(self):
+        """Block until stop() is called."""
+        self._stopped.wait()
+
+    def stop(self, timeout=5):
+        """Stop accepting requests; payloads still buffered are dropped."""
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []